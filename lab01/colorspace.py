@@ -0,0 +1,253 @@
+import colorsys
+
+import numpy as np
+
+# Перевод цветов между моделями RGB, HLS и CMYK без Tk.
+#
+# Единицы те же, что в приложении (main.py): R, G, B - 0..255, H - градусы
+# 0..360, L, S, C, M, Y, K - проценты 0..100. Функции *_color переводят один
+# цвет (их вызывает ColorConverterApp), остальные - массивы NumPy формы
+# (..., 3) или (..., 4) целиком, по тем же формулам, что и colorsys.
+#
+# Массив обрабатывается блоками по BLOCK_PIXELS цветов: промежуточные
+# массивы блока помещаются в кэш процессора и не занимают память размером
+# с изображение. Результат пишется в out, в том числе в сам входной массив,
+# если у него подходящие форма и тип. RGB на выходе - uint8 (дробная часть
+# отбрасывается, как int() в приложении) или float32/float64 без округления;
+# HLS и CMYK - float32 (по умолчанию) или float64. Вычисления идут в float32,
+# если результат float32, иначе в float64 - тогда они совпадают с
+# colorsys до бита.
+
+BLOCK_PIXELS = 1 << 16
+
+MODELS = {'rgb': 3, 'hls': 3, 'cmyk': 4}
+
+
+# Один цвет
+
+def rgb_to_hls_color(r, g, b):
+    h, l, s = colorsys.rgb_to_hls(r / 255.0, g / 255.0, b / 255.0)
+    return h * 360, l * 100, s * 100
+
+
+def hls_to_rgb_color(h, l, s):
+    r, g, b = colorsys.hls_to_rgb(h / 360.0, l / 100.0, s / 100.0)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+def rgb_to_cmyk_color(r, g, b):
+    if r == 0 and g == 0 and b == 0:
+        return 0, 0, 0, 100
+
+    r_prime, g_prime, b_prime = r / 255.0, g / 255.0, b / 255.0
+
+    k = 1.0 - max(r_prime, g_prime, b_prime)
+
+    if k == 1.0:
+        return 0, 0, 0, 100
+
+    c = (1.0 - r_prime - k) / (1.0 - k)
+    m = (1.0 - g_prime - k) / (1.0 - k)
+    y = (1.0 - b_prime - k) / (1.0 - k)
+
+    return c * 100, m * 100, y * 100, k * 100
+
+
+def cmyk_to_rgb_color(c, m, y, k):
+    r = 255 * (1 - c / 100) * (1 - k / 100)
+    g = 255 * (1 - m / 100) * (1 - k / 100)
+    b = 255 * (1 - y / 100) * (1 - k / 100)
+    return int(r), int(g), int(b)
+
+
+# Блоки (n, каналы) -> список каналов результата в рабочем типе work
+
+def _rgb_to_hls_block(rgb, work):
+    r, g, b = (rgb[:, i].astype(work) / work(255) for i in range(3))
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2
+    gray = rangec == 0
+    # Для серых цветов H = S = 0; деление на ноль ниже для них не важно
+    rangec[gray] = 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = rangec / np.where(l <= 0.5, sumc, 2 - maxc - minc)
+    rc = (maxc - r) / rangec
+    gc = (maxc - g) / rangec
+    bc = (maxc - b) / rangec
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2 + rc - bc, 4 + gc - rc))
+    h = np.mod(h / 6, 1)
+    h[gray] = 0
+    s[gray] = 0
+    return [h * 360, l * 100, s * 100]
+
+
+def _hls_to_rgb_block(hls, work):
+    h = hls[:, 0].astype(work) / work(360)
+    l = hls[:, 1].astype(work) / work(100)
+    s = hls[:, 2].astype(work) / work(100)
+    m2 = np.where(l <= 0.5, l * (1 + s), l + s - l * s)
+    m1 = 2 * l - m2
+    gray = s == 0
+    channels = []
+    for shift in (1.0 / 3.0, 0.0, -1.0 / 3.0):
+        hue = np.mod(h + work(shift), 1)
+        v = np.where(hue < 1.0 / 6.0, m1 + (m2 - m1) * hue * 6,
+                     np.where(hue < 0.5, m2,
+                              np.where(hue < 2.0 / 3.0, m1 + (m2 - m1) * (2.0 / 3.0 - hue) * 6, m1)))
+        v[gray] = l[gray]
+        channels.append(v * 255)
+    return channels
+
+
+def _rgb_to_cmyk_block(rgb, work):
+    r, g, b = (rgb[:, i].astype(work) / work(255) for i in range(3))
+    k = 1 - np.maximum(np.maximum(r, g), b)
+    black = k == 1
+    denom = np.where(black, 1, 1 - k)
+    channels = []
+    for v in (r, g, b):
+        v = (1 - v - k) / denom
+        v[black] = 0
+        channels.append(v * 100)
+    k[black] = 1
+    return channels + [k * 100]
+
+
+def _cmyk_to_rgb_block(cmyk, work):
+    k = 1 - cmyk[:, 3].astype(work) / work(100)
+    return [255 * (1 - cmyk[:, i].astype(work) / work(100)) * k for i in range(3)]
+
+
+def _output(out, shape, dtype):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != shape:
+        raise ValueError(f"out: ожидалась форма {shape}, получена {out.shape}")
+    if not out.flags.c_contiguous:
+        raise ValueError("out должен быть непрерывным массивом")
+    return out
+
+
+def _convert(block, colors, channels_in, channels_out, out, dtype):
+    colors = np.asarray(colors)
+    if colors.shape[-1:] != (channels_in,):
+        raise ValueError(f"ожидался массив формы (..., {channels_in}), получен {colors.shape}")
+    out = _output(out, colors.shape[:-1] + (channels_out,), dtype)
+    work = np.float32 if out.dtype == np.float32 else np.float64
+    integer = np.issubdtype(out.dtype, np.integer)
+    src = colors.reshape(-1, channels_in)
+    dst = out.reshape(-1, channels_out)
+    for start in range(0, len(src), BLOCK_PIXELS):
+        # Блок результата считается целиком до записи, поэтому out может быть colors
+        channels = block(src[start:start + BLOCK_PIXELS], work)
+        for i, values in enumerate(channels):
+            if integer:
+                # Приведение к uint8 отбрасывает дробную часть, как int()
+                np.clip(values, 0, 255, out=values)
+            dst[start:start + BLOCK_PIXELS, i] = values
+    return out
+
+
+def rgb_to_hls(rgb, out=None, dtype=np.float32):
+    return _convert(_rgb_to_hls_block, rgb, 3, 3, out, dtype)
+
+
+def hls_to_rgb(hls, out=None, dtype=np.uint8):
+    return _convert(_hls_to_rgb_block, hls, 3, 3, out, dtype)
+
+
+def rgb_to_cmyk(rgb, out=None, dtype=np.float32):
+    return _convert(_rgb_to_cmyk_block, rgb, 3, 4, out, dtype)
+
+
+def cmyk_to_rgb(cmyk, out=None, dtype=np.uint8):
+    return _convert(_cmyk_to_rgb_block, cmyk, 4, 3, out, dtype)
+
+
+_CONVERSIONS = {
+    ('rgb', 'hls'): rgb_to_hls,
+    ('hls', 'rgb'): hls_to_rgb,
+    ('rgb', 'cmyk'): rgb_to_cmyk,
+    ('cmyk', 'rgb'): cmyk_to_rgb,
+}
+
+
+def convert(colors, source, target, out=None, dtype=None):
+    # Перевод между любыми моделями из MODELS. Как и в приложении, HLS и
+    # CMYK переводятся друг в друга через целый RGB
+    if source not in MODELS or target not in MODELS:
+        raise ValueError(f"неизвестная модель: {source if source not in MODELS else target}")
+    if dtype is None:
+        dtype = np.uint8 if target == 'rgb' else np.float32
+    if source == target:
+        colors = np.asarray(colors)
+        result = _output(out, colors.shape, dtype)
+        result[...] = colors
+        return result
+    if source != 'rgb' and target != 'rgb':
+        colors = _CONVERSIONS[(source, 'rgb')](colors)
+        source = 'rgb'
+    return _CONVERSIONS[(source, target)](colors, out=out, dtype=dtype)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+
+    # Совпадение со скалярными функциями: случайные цвета и все оттенки серого
+    rgb = np.concatenate([rng.integers(0, 256, (200000, 3)), np.repeat(np.arange(256), 3).reshape(-1, 3)])
+    rgb = rgb.astype(np.uint8)
+    hls = np.round(np.column_stack([rng.uniform(0, 360, 200000), rng.uniform(0, 100, (200000, 2))]), 2)
+    cmyk = np.round(rng.uniform(0, 100, (200000, 4)), 2)
+
+    checks = [
+        ("RGB -> HLS", rgb_to_hls_color, rgb, rgb_to_hls),
+        ("HLS -> RGB", hls_to_rgb_color, hls, hls_to_rgb),
+        ("RGB -> CMYK", rgb_to_cmyk_color, rgb, rgb_to_cmyk),
+        ("CMYK -> RGB", cmyk_to_rgb_color, cmyk, cmyk_to_rgb),
+    ]
+    for name, scalar, colors, vector in checks:
+        expected = np.array([scalar(*color) for color in colors.tolist()])
+        integer = vector in (hls_to_rgb, cmyk_to_rgb)
+        exact = vector(colors) if integer else vector(colors, dtype=np.float64)
+        fast = vector(colors, dtype=np.float32)
+        if integer:
+            fast = np.floor(fast)
+        print(f"{name:12s} расхождение: float64 {np.abs(exact - expected).max():.2e}, "
+              f"float32 {np.abs(fast - expected).max():.2e}")
+
+    # Производительность: массив из миллиона цветов против цикла с colorsys
+    count = 1000000
+    big = {'rgb': rng.integers(0, 256, (count, 3)).astype(np.uint8)}
+    big['hls'] = rgb_to_hls(big['rgb'])
+    big['cmyk'] = rgb_to_cmyk(big['rgb'])
+    loops = 100000
+    for name, scalar, source, vector in (
+        ("RGB -> HLS", rgb_to_hls_color, 'rgb', rgb_to_hls),
+        ("HLS -> RGB", hls_to_rgb_color, 'hls', hls_to_rgb),
+        ("RGB -> CMYK", rgb_to_cmyk_color, 'rgb', rgb_to_cmyk),
+        ("CMYK -> RGB", cmyk_to_rgb_color, 'cmyk', cmyk_to_rgb),
+    ):
+        colors = big[source]
+        out = vector(colors)
+        start_time = time.perf_counter()
+        vector(colors, out=out)
+        vector_rate = count / (time.perf_counter() - start_time)
+
+        part = colors[:loops].tolist()
+        start_time = time.perf_counter()
+        for color in part:
+            scalar(*color)
+        scalar_rate = loops / (time.perf_counter() - start_time)
+        print(f"{name:12s} массив {vector_rate / 1e6:6.1f} млн цветов/с, "
+              f"цикл {scalar_rate / 1e6:5.2f} млн цветов/с (x{vector_rate / scalar_rate:.0f})")
+
+    # На месте: HLS в том же массиве float32, что и RGB
+    image = rng.integers(0, 256, (1080, 1920, 3)).astype(np.float32)
+    expected = rgb_to_hls(image)
+    rgb_to_hls(image, out=image)
+    print(f"На месте совпадает: {np.array_equal(image, expected)}")
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from colorspace import BLOCK_PIXELS, rgb_to_hls
+
+# Перевод изображений uint8 из RGB в HLS и CMYK по таблицам.
+#
+# Цветов RGB с целыми компонентами всего 256**3, поэтому результат можно
+# посчитать заранее и для каждого пикселя только читать из таблицы. Чтобы
+# таблицы были небольшими, используется то, от чего зависит каждая
+# компонента:
+#   L, S        только от max и min из R, G, B - таблицы 256 x 256
+#   C, M, Y     только от своей компоненты и max - таблица 256 x 256
+#   K           только от max - таблица 256
+#   H           от всех трёх - полная таблица 256**3, но квантованная:
+#               uint16 в сотых долях градуса (32 МБ вместо 192 МБ float64)
+# Двумерные таблицы считаются по тем же формулам, что и colorsys, и
+# совпадают с colorspace.py (float64, затем float32) до бита; H отличается
+# не больше чем на 0.005 градуса - приложение и так округляет до сотых.
+#
+# Таблицы строятся при первом обращении. Таблица H сохраняется в файл .npy
+# в каталоге directory и в следующий раз не строится, а отображается в
+# память (np.load с mmap_mode) - в память читаются только страницы с
+# встречающимися цветами.
+#
+# Для HLS таблицы примерно вдвое быстрее вычислений в colorspace.py (там
+# ветвления и деления на каждый пиксель). Для CMYK вычисления и так
+# простые, и три чтения из таблицы не быстрее трёх делений - `python lut.py`
+# показывает оба замера.
+
+HUE_SCALE = 100
+HUE_FILE = 'hue_u16_v1.npy'
+
+
+def default_directory():
+    return os.path.join(os.path.expanduser('~'), '.cache', 'lab01_lut')
+
+
+def _max_min_tables():
+    # Плоские таблицы по индексу max * 256 + min: L и S в процентах
+    maxc, minc = np.divmod(np.arange(65536), 256)
+    maxc, minc = maxc / 255.0, minc / 255.0
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(l <= 0.5, rangec / sumc, rangec / (2.0 - maxc - minc))
+    s[rangec <= 0] = 0.0
+    return (l * 100).astype(np.float32), (s * 100).astype(np.float32)
+
+
+def _cmyk_tables():
+    # Плоская таблица C (M, Y) по индексу max * 256 + компонента и таблица K по max
+    maxc, v = np.divmod(np.arange(65536), 256)
+    k = 1.0 - maxc / 255.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cmy = (1.0 - v / 255.0 - k) / (1.0 - k)
+    cmy[maxc == 0] = 0.0
+    key = 1.0 - np.arange(256) / 255.0
+    return (cmy * 100).astype(np.float32), (key * 100).astype(np.float32)
+
+
+def _build_hue(path):
+    # Таблица H по индексу (R << 16) | (G << 8) | B, пишется в файл по блокам
+    tmp = path + '.tmp'
+    table = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint16, shape=(1 << 24,))
+    rows = np.arange(BLOCK_PIXELS * 4, dtype=np.uint32)
+    for start in range(0, 1 << 24, len(rows)):
+        index = rows + start
+        rgb = np.column_stack([index >> 16, (index >> 8) & 255, index & 255]).astype(np.uint8)
+        hue = rgb_to_hls(rgb, dtype=np.float64)[:, 0]
+        table[start:start + len(rows)] = np.rint(hue * HUE_SCALE)
+    table.flush()
+    del table
+    os.replace(tmp, path)
+
+
+class LUTConverter:
+    # Таблицы общие для всех вызовов и потоков; строятся один раз под замком
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_directory()
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.build_seconds = {}
+
+    def _table(self, name):
+        table = self.tables.get(name)
+        if table is not None:
+            return table
+        with self.lock:
+            if name in self.tables:
+                return self.tables[name]
+            start_time = time.perf_counter()
+            if name in ('lightness', 'saturation'):
+                self.tables['lightness'], self.tables['saturation'] = _max_min_tables()
+            elif name in ('cmy', 'key'):
+                self.tables['cmy'], self.tables['key'] = _cmyk_tables()
+            elif name == 'hue':
+                path = os.path.join(self.directory, HUE_FILE)
+                if not os.path.exists(path):
+                    os.makedirs(self.directory, exist_ok=True)
+                    _build_hue(path)
+                self.tables['hue'] = np.load(path, mmap_mode='r')
+            # Таблицы, построенные вместе, получают общее время
+            for built in self.tables.keys() - self.build_seconds.keys():
+                self.build_seconds[built] = time.perf_counter() - start_time
+            return self.tables[name]
+
+    def stats(self):
+        # Память таблиц (для H - размер файла, в памяти только прочитанные
+        # страницы) и время построения или загрузки каждой
+        return {
+            name: {'bytes': table.nbytes, 'mapped': isinstance(table, np.memmap),
+                   'seconds': self.build_seconds.get(name, 0.0)}
+            for name, table in self.tables.items()
+        }
+
+    def _convert(self, rgb, out, channels, block):
+        rgb = np.asarray(rgb)
+        if rgb.dtype != np.uint8 or rgb.shape[-1:] != (3,):
+            raise ValueError(f"ожидался массив uint8 формы (..., 3), получен {rgb.dtype} {rgb.shape}")
+        shape = rgb.shape[:-1] + (channels,)
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        elif out.shape != shape or not out.flags.c_contiguous:
+            raise ValueError(f"out должен быть непрерывным массивом формы {shape}")
+        src = rgb.reshape(-1, 3)
+        dst = out.reshape(-1, channels)
+        for start in range(0, len(src), BLOCK_PIXELS):
+            block(src[start:start + BLOCK_PIXELS], dst[start:start + BLOCK_PIXELS])
+        return out
+
+    def rgb_to_hls(self, rgb, out=None):
+        hue, lightness, saturation = self._table('hue'), self._table('lightness'), self._table('saturation')
+
+        def block(src, dst):
+            r, g, b = src[:, 0], src[:, 1], src[:, 2]
+            # max и min - на uint8, в индексы переводится только результат
+            max_min = np.maximum(np.maximum(r, g), b).astype(np.intp) << 8
+            max_min |= np.minimum(np.minimum(r, g), b)
+            index = r.astype(np.intp) << 16
+            index |= g.astype(np.intp) << 8
+            index |= b
+            np.multiply(hue.take(index), np.float32(1 / HUE_SCALE), out=dst[:, 0])
+            dst[:, 1] = lightness.take(max_min)
+            dst[:, 2] = saturation.take(max_min)
+
+        return self._convert(rgb, out, 3, block)
+
+    def rgb_to_cmyk(self, rgb, out=None):
+        cmy, key = self._table('cmy'), self._table('key')
+
+        def block(src, dst):
+            maxc = np.maximum(np.maximum(src[:, 0], src[:, 1]), src[:, 2])
+            high = maxc.astype(np.intp) << 8
+            for i in range(3):
+                dst[:, i] = cmy.take(high | src[:, i])
+            dst[:, 3] = key.take(maxc)
+
+        return self._convert(rgb, out, 4, block)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from colorspace import rgb_to_cmyk
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        # Первый запуск строит таблицу H в файл, второй только отображает её
+        for attempt in ("построение", "загрузка"):
+            converter = LUTConverter(directory)
+            converter.rgb_to_hls(np.zeros((1, 3), dtype=np.uint8))
+            converter.rgb_to_cmyk(np.zeros((1, 3), dtype=np.uint8))
+            print(f"Таблицы ({attempt}):")
+            for name, info in converter.stats().items():
+                print(f"  {name:10s} {info['bytes'] / 2**20:7.2f} МБ"
+                      f"{' (файл в памяти)' if info['mapped'] else '':17s} {info['seconds'] * 1000:8.1f} мс")
+
+        # Совпадение с colorspace.py на всех 256**3 цветах
+        everything = np.arange(1 << 24, dtype=np.uint32)
+        everything = np.column_stack([everything >> 16, (everything >> 8) & 255, everything & 255]).astype(np.uint8)
+        exact = rgb_to_hls(everything, dtype=np.float64).astype(np.float32)
+        table = converter.rgb_to_hls(everything)
+        print(f"HLS: расхождение H {np.abs(table[:, 0] - exact[:, 0]).max():.4f} градуса, "
+              f"L и S совпадают: {np.array_equal(table[:, 1:], exact[:, 1:])}")
+        exact = rgb_to_cmyk(everything, dtype=np.float64).astype(np.float32)
+        print(f"CMYK совпадает: {np.array_equal(converter.rgb_to_cmyk(everything), exact)}")
+        del everything, exact, table
+
+        # Скорость на кадре 1920x1080: случайные цвета и плавный градиент
+        yy, xx = np.mgrid[0:1080, 0:1920]
+        images = {
+            'случайные цвета': rng.integers(0, 256, (1080, 1920, 3)).astype(np.uint8),
+            'градиент': np.dstack([xx * 255 // 1919, yy * 255 // 1079, (xx + yy) * 255 // 2998]).astype(np.uint8),
+        }
+        for name, image in images.items():
+            for model, vector, lookup in (("HLS", rgb_to_hls, converter.rgb_to_hls),
+                                          ("CMYK", rgb_to_cmyk, converter.rgb_to_cmyk)):
+                out = lookup(image)
+                times = []
+                for function in (vector, lookup) * 3:
+                    start_time = time.perf_counter()
+                    function(image, out=out)
+                    times.append(time.perf_counter() - start_time)
+                vector_time, lookup_time = min(times[0::2]), min(times[1::2])
+                print(f"{model:4s} {name:16s} вычисление {vector_time * 1000:6.1f} мс, "
+                      f"таблицы {lookup_time * 1000:6.1f} мс (x{vector_time / lookup_time:.1f})")
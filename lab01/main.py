@@ -1,7 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, colorchooser
-import colorsys
+import collections
 import math
+import time
+
+from colorspace import cmyk_to_rgb_color, hls_to_rgb_color, rgb_to_cmyk_color, rgb_to_hls_color
+
+# Обновление по ползункам не чаще одного раза за кадр (мс) и период
+# обновления строки со счётчиками
+FRAME_MS = 16
+STATS_MS = 500
 
 class ColorConverterApp(tk.Tk):
     def __init__(self):
@@ -12,6 +20,16 @@ class ColorConverterApp(tk.Tk):
 
         self._is_updating = False
 
+        # Отложенное обновление: последнее событие ползунка ждёт ближайшего
+        # кадра, остальные сливаются с ним
+        self._pending_update = None
+        self._update_job = None
+        self._last_flush = 0.0
+        # Последние значения переменных Tk, чтобы не вызывать set без изменений
+        self._shown = {}
+        self._preview_color = None
+        self.update_stats = collections.Counter()
+
         self.rgb_vars = {comp: tk.IntVar(value=0) for comp in "RGB"}
         self.hls_vars = {comp: tk.DoubleVar(value=0.0) for comp in "HLS"}
         self.cmyk_vars = {comp: tk.DoubleVar(value=0.0) for comp in "CMYK"}
@@ -19,37 +37,19 @@ class ColorConverterApp(tk.Tk):
         self._create_widgets()
 
         self.update_from_rgb()
+        self._refresh_stats()
 
     def _rgb_to_hls(self, r, g, b):
-        h, l, s = colorsys.rgb_to_hls(r / 255.0, g / 255.0, b / 255.0)
-        return h * 360, l * 100, s * 100
+        return rgb_to_hls_color(r, g, b)
 
     def _hls_to_rgb(self, h, l, s):
-        r, g, b = colorsys.hls_to_rgb(h / 360.0, l / 100.0, s / 100.0)
-        return int(r * 255), int(g * 255), int(b * 255)
+        return hls_to_rgb_color(h, l, s)
 
     def _rgb_to_cmyk(self, r, g, b):
-        if r == 0 and g == 0 and b == 0:
-            return 0, 0, 0, 100
-
-        r_prime, g_prime, b_prime = r / 255.0, g / 255.0, b / 255.0
-
-        k = 1.0 - max(r_prime, g_prime, b_prime)
-
-        if k == 1.0:
-            return 0, 0, 0, 100
-
-        c = (1.0 - r_prime - k) / (1.0 - k)
-        m = (1.0 - g_prime - k) / (1.0 - k)
-        y = (1.0 - b_prime - k) / (1.0 - k)
-
-        return c * 100, m * 100, y * 100, k * 100
+        return rgb_to_cmyk_color(r, g, b)
 
     def _cmyk_to_rgb(self, c, m, y, k):
-        r = 255 * (1 - c / 100) * (1 - k / 100)
-        g = 255 * (1 - m / 100) * (1 - k / 100)
-        b = 255 * (1 - y / 100) * (1 - k / 100)
-        return int(r), int(g), int(b)
+        return cmyk_to_rgb_color(c, m, y, k)
 
     def _create_widgets(self):
         top_frame = ttk.Frame(self, padding=10)
@@ -72,6 +72,9 @@ class ColorConverterApp(tk.Tk):
         self.hls_frame.pack(pady=5, fill=tk.X)
         self.cmyk_frame.pack(pady=5, fill=tk.X)
 
+        self.stats_label = ttk.Label(self, text="", foreground="gray")
+        self.stats_label.pack(side=tk.BOTTOM, anchor='w', padx=10, pady=5)
+
     def _create_model_frame(self, parent, name, components, max_values, var_dict, update_cmd):
         frame = ttk.LabelFrame(parent, text=name, padding=10)
 
@@ -82,11 +85,13 @@ class ColorConverterApp(tk.Tk):
             label = ttk.Label(frame, text=f"{comp}:")
             label.grid(row=i, column=0, sticky='w', padx=5, pady=5)
 
-            scale = ttk.Scale(frame, from_=0, to=max_values[i], orient=tk.HORIZONTAL, variable=var_dict[comp], command=lambda e, cmd=update_cmd: cmd())
+            scale = ttk.Scale(frame, from_=0, to=max_values[i], orient=tk.HORIZONTAL, variable=var_dict[comp], command=lambda e, cmd=update_cmd: self.schedule_update(cmd))
             scale.grid(row=i, column=1, sticky='we', padx=5, pady=5)
 
             entry = ttk.Entry(frame, width=5, textvariable=var_dict[comp])
             entry.grid(row=i, column=2, sticky='e', padx=5, pady=5)
+            # Введённый текст меняет переменную в обход _shown
+            entry.bind("<Key>", lambda e, var=var_dict[comp]: self._shown.pop(str(var), None))
             entry.bind("<Return>", lambda e, cmd=update_cmd: cmd())
             entry.bind("<FocusOut>", lambda e, cmd=update_cmd: cmd())
 
@@ -110,26 +115,59 @@ class ColorConverterApp(tk.Tk):
 
             self.update_from_rgb()
 
+    def schedule_update(self, update):
+        # Событие ползунка: если обновление уже запланировано, событие
+        # сливается с ним (пересчёт будет по последним значениям); новое
+        # обновление - сразу после обработки событий, но не раньше чем через
+        # кадр после предыдущего
+        self.update_stats['requested'] += 1
+        if self._pending_update is not None:
+            self.update_stats['coalesced'] += 1
+        self._pending_update = update
+        if self._update_job is None:
+            wait = FRAME_MS - (time.perf_counter() - self._last_flush) * 1000
+            if wait > 0:
+                self._update_job = self.after(int(wait) + 1, self._flush_update)
+            else:
+                self._update_job = self.after_idle(self._flush_update)
+
+    def _flush_update(self):
+        update = self._pending_update
+        self._pending_update = self._update_job = None
+        self._last_flush = time.perf_counter()
+        self.update_stats['flushed'] += 1
+        update()
+
+    def _read(self, var_dict):
+        # Значения модели, которую меняет пользователь. Ползунок пишет в
+        # переменную дробное значение, поэтому для _set её значение неизвестно
+        values = []
+        for var in var_dict.values():
+            self._shown.pop(str(var), None)
+            values.append(var.get())
+        return values
+
+    def _set(self, var_dict, values):
+        for var, value in zip(var_dict.values(), values):
+            self.update_stats['sets'] += 1
+            if self._shown.get(str(var)) == value:
+                self.update_stats['sets_skipped'] += 1
+                continue
+            var.set(value)
+            self._shown[str(var)] = value
+
     def update_from_rgb(self, event=None):
         if self._is_updating:
             return
         self._is_updating = True
 
-        r = self.rgb_vars['R'].get()
-        g = self.rgb_vars['G'].get()
-        b = self.rgb_vars['B'].get()
+        r, g, b = self._read(self.rgb_vars)
 
         h, l, s = self._rgb_to_hls(r, g, b)
         c, m, y, k = self._rgb_to_cmyk(r, g, b)
 
-        self.hls_vars['H'].set(round(h, 2))
-        self.hls_vars['L'].set(round(l, 2))
-        self.hls_vars['S'].set(round(s, 2))
-
-        self.cmyk_vars['C'].set(round(c, 2))
-        self.cmyk_vars['M'].set(round(m, 2))
-        self.cmyk_vars['Y'].set(round(y, 2))
-        self.cmyk_vars['K'].set(round(k, 2))
+        self._set(self.hls_vars, (round(h, 2), round(l, 2), round(s, 2)))
+        self._set(self.cmyk_vars, (round(c, 2), round(m, 2), round(y, 2), round(k, 2)))
 
         self._update_color_preview(r, g, b)
         self._is_updating = False
@@ -139,21 +177,13 @@ class ColorConverterApp(tk.Tk):
             return
         self._is_updating = True
 
-        h = self.hls_vars['H'].get()
-        l = self.hls_vars['L'].get()
-        s = self.hls_vars['S'].get()
+        h, l, s = self._read(self.hls_vars)
 
         r, g, b = self._hls_to_rgb(h, l, s)
         c, m, y, k = self._rgb_to_cmyk(r, g, b)
 
-        self.rgb_vars['R'].set(r)
-        self.rgb_vars['G'].set(g)
-        self.rgb_vars['B'].set(b)
-
-        self.cmyk_vars['C'].set(round(c, 2))
-        self.cmyk_vars['M'].set(round(m, 2))
-        self.cmyk_vars['Y'].set(round(y, 2))
-        self.cmyk_vars['K'].set(round(k, 2))
+        self._set(self.rgb_vars, (r, g, b))
+        self._set(self.cmyk_vars, (round(c, 2), round(m, 2), round(y, 2), round(k, 2)))
 
         self._update_color_preview(r, g, b)
         self._is_updating = False
@@ -163,29 +193,34 @@ class ColorConverterApp(tk.Tk):
             return
         self._is_updating = True
 
-        c = self.cmyk_vars['C'].get()
-        m = self.cmyk_vars['M'].get()
-        y = self.cmyk_vars['Y'].get()
-        k = self.cmyk_vars['K'].get()
+        c, m, y, k = self._read(self.cmyk_vars)
 
         r, g, b = self._cmyk_to_rgb(c, m, y, k)
         h, l, s = self._rgb_to_hls(r, g, b)
 
-        self.rgb_vars['R'].set(r)
-        self.rgb_vars['G'].set(g)
-        self.rgb_vars['B'].set(b)
-
-        self.hls_vars['H'].set(round(h, 2))
-        self.hls_vars['L'].set(round(l, 2))
-        self.hls_vars['S'].set(round(s, 2))
+        self._set(self.rgb_vars, (r, g, b))
+        self._set(self.hls_vars, (round(h, 2), round(l, 2), round(s, 2)))
 
         self._update_color_preview(r, g, b)
         self._is_updating = False
 
     def _update_color_preview(self, r, g, b):
         hex_color = f"#{r:02x}{g:02x}{b:02x}"
+        if hex_color == self._preview_color:
+            return
+        self._preview_color = hex_color
+        self.update_stats['renders'] += 1
         self.color_preview.config(bg=hex_color)
 
+    def _refresh_stats(self):
+        stats = self.update_stats
+        text = (f"Событий ползунков: {stats['requested']}, слито: {stats['coalesced']}, "
+                f"обновлений: {stats['flushed']}, set пропущено: {stats['sets_skipped']} из {stats['sets']}, "
+                f"перерисовок: {stats['renders']}")
+        if text != self.stats_label['text']:
+            self.stats_label.config(text=text)
+        self.after(STATS_MS, self._refresh_stats)
+
 if __name__ == "__main__":
     app = ColorConverterApp()
     app.mainloop()
@@ -0,0 +1,442 @@
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from colorspace import MODELS, convert
+
+# Сервис перевода цветов без окна Tk: HTTP на localhost или JSON-строки
+# через stdin/stdout.
+#
+# Запрос - JSON {"from": "rgb", "to": "hls", "colors": [[255, 0, 0], ...]}
+# (модели rgb, hls, cmyk, hex; цвета hex - строки "#rrggbb"), необязательное
+# поле "id" возвращается в ответе. Ответ - {"colors": [...]} в единицах
+# приложения: RGB - целые, HLS и CMYK - округлённые до сотых, как в окне.
+#
+#   POST /convert   перевод
+#   GET  /metrics   задержки p50/p99, пропускная способность, размеры пачек
+#
+# Запросы, пришедшие почти одновременно (от разных клиентов или подряд по
+# одному соединению), собираются в пачки: за BATCH_WAIT секунд, но не больше
+# BATCH_COLORS цветов. Пачка переводится одним вызовом colorspace.convert на
+# каждую пару моделей в отдельном потоке, а тем временем копится следующая.
+# По одному соединению можно слать запросы, не дожидаясь ответов: они
+# обрабатываются параллельно, ответы приходят по порядку.
+#
+#   python service.py --port 8765
+#   python service.py --stdio < requests.jsonl
+#   python service.py --bench            # нагрузка на localhost и отчёт
+
+BATCH_WAIT = 0.002
+BATCH_COLORS = 65536
+PIPELINE_DEPTH = 64
+LATENCY_WINDOW = 10000
+
+# Допустимые значения компонент, как у ползунков приложения
+MAX_VALUES = {'rgb': (255, 255, 255), 'hls': (360, 100, 100), 'cmyk': (100, 100, 100, 100)}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+def hex_to_rgb(strings):
+    if not all(isinstance(s, str) for s in strings):
+        raise ValueError("цвет hex должен быть строкой вида #rrggbb")
+    digits = ''.join(s[1:] if s.startswith('#') else s for s in strings)
+    if len(digits) != 6 * len(strings):
+        raise ValueError("цвет hex должен быть вида #rrggbb")
+    try:
+        data = bytes.fromhex(digits)
+    except ValueError:
+        raise ValueError("цвет hex должен быть вида #rrggbb") from None
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+
+
+def rgb_to_hex(rgb):
+    digits = np.ascontiguousarray(rgb, dtype=np.uint8).tobytes().hex()
+    return ['#' + digits[i:i + 6] for i in range(0, len(digits), 6)]
+
+
+def parse_request(request):
+    # JSON запроса -> (массив цветов, модель источника, модель результата, результат в hex)
+    source, target = request.get('from'), request.get('to')
+    for model in (source, target):
+        if model != 'hex' and model not in MODELS:
+            raise ValueError(f"неизвестная модель: {model}")
+    colors = request.get('colors')
+    if not isinstance(colors, list):
+        raise ValueError("colors должен быть списком цветов")
+    if source == 'hex':
+        array, source = hex_to_rgb(colors), 'rgb'
+    else:
+        channels = MODELS[source]
+        try:
+            array = np.asarray(colors, dtype=np.float64).reshape(len(colors), channels)
+        except ValueError:
+            raise ValueError(f"цвет модели {source} - список из {channels} чисел") from None
+        bad = ~(np.isfinite(array) & (array >= 0) & (array <= MAX_VALUES[source])).all(axis=1)
+        if bad.any():
+            i = int(np.argmax(bad))
+            limits = ', '.join(f"0..{m}" for m in MAX_VALUES[source])
+            raise ValueError(f"цвет {i}: компоненты {source} должны быть в пределах {limits}, получено {colors[i]}")
+    as_hex = target == 'hex'
+    return array, source, 'rgb' if as_hex else target, as_hex
+
+
+def format_colors(array, target, as_hex):
+    if as_hex:
+        return rgb_to_hex(array)
+    if target == 'rgb':
+        return array.tolist()
+    # round() Python, а не np.round: на половинках они иногда расходятся
+    return [[round(v, 2) for v in color] for color in array.tolist()]
+
+
+def convert_colors(array, source, target):
+    # Для HLS и CMYK - float64, чтобы значения совпадали с окном приложения
+    return convert(array, source, target, dtype=np.uint8 if target == 'rgb' else np.float64)
+
+
+class Metrics:
+    # Задержки последних LATENCY_WINDOW запросов и счётчики с момента запуска
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.recent = collections.deque(maxlen=LATENCY_WINDOW)
+        self.counts = collections.Counter()
+
+    def record(self, started, colors, error=False):
+        finished = time.perf_counter()
+        self.recent.append((finished, finished - started))
+        self.counts['requests'] += 1
+        self.counts['colors'] += colors
+        self.counts['errors'] += error
+
+    def record_batch(self, requests, colors):
+        self.counts['batches'] += 1
+        self.counts['batched_requests'] += requests
+        self.counts['batched_colors'] += colors
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        counts = self.counts
+        result = {
+            'uptime_seconds': uptime,
+            'requests': counts['requests'], 'colors': counts['colors'], 'errors': counts['errors'],
+            'batches': counts['batches'],
+            'requests_per_batch': counts['batched_requests'] / max(counts['batches'], 1),
+            'colors_per_batch': counts['batched_colors'] / max(counts['batches'], 1),
+            'requests_per_second': counts['requests'] / uptime,
+            'colors_per_second': counts['colors'] / uptime,
+        }
+        if self.recent:
+            finished, latency = zip(*self.recent)
+            p50, p99 = np.percentile(latency, [50, 99])
+            result['latency_p50_ms'] = p50 * 1000
+            result['latency_p99_ms'] = p99 * 1000
+            span = finished[-1] - finished[0]
+            if span > 0:
+                result['recent_requests_per_second'] = (len(finished) - 1) / span
+        return result
+
+
+class Batcher:
+    # Очередь запросов на перевод; run() собирает их в пачки
+
+    def __init__(self, metrics, max_colors=BATCH_COLORS, wait=BATCH_WAIT):
+        self.metrics = metrics
+        self.max_colors = max_colors
+        self.wait = wait
+        self.queue = asyncio.Queue()
+        # Один поток: пачки переводятся по очереди, пока копится следующая
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def convert(self, array, source, target):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((array, source, target, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            count = len(items[0][0])
+            for attempt in range(2):
+                while count < self.max_colors and not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+                    count += len(items[-1][0])
+                # Один раз ждём запросы, которые вот-вот придут
+                if attempt or count >= self.max_colors or self.wait <= 0:
+                    break
+                await asyncio.sleep(self.wait)
+            self.metrics.record_batch(len(items), count)
+            results = await loop.run_in_executor(self.executor, self._convert_batch, items)
+            for (_, _, _, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    @staticmethod
+    def _convert_batch(items):
+        # Запросы с одинаковой парой моделей переводятся одним массивом
+        groups = collections.defaultdict(list)
+        for i, (array, source, target, _) in enumerate(items):
+            groups[(source, target)].append(i)
+        results = [None] * len(items)
+        for (source, target), indices in groups.items():
+            try:
+                arrays = [items[i][0] for i in indices]
+                converted = convert_colors(np.concatenate(arrays), source, target)
+                parts = np.split(converted, np.cumsum([len(a) for a in arrays])[:-1])
+            except Exception as e:
+                parts = [e] * len(indices)
+            for i, part in zip(indices, parts):
+                results[i] = part
+        return results
+
+
+class ColorService:
+
+    def __init__(self, max_colors=BATCH_COLORS, wait=BATCH_WAIT):
+        self.metrics = Metrics()
+        self.batcher = Batcher(self.metrics, max_colors, wait)
+
+    async def handle(self, request):
+        # Словарь запроса -> (код, словарь ответа)
+        started = time.perf_counter()
+        try:
+            array, source, target, as_hex = parse_request(request)
+            result = await self.batcher.convert(array, source, target)
+            response = {'colors': format_colors(result, target, as_hex)}
+            status = 200
+        except (ValueError, TypeError) as e:
+            response, status, array = {'error': str(e)}, 400, ()
+        except Exception as e:
+            # Непредвиденная ошибка одного запроса не должна останавливать сервис
+            response, status, array = {'error': f"внутренняя ошибка: {e!r}"}, 500, ()
+        if 'id' in request:
+            response['id'] = request['id']
+        self.metrics.record(started, len(array), error=status != 200)
+        return status, response
+
+    async def handle_bytes(self, body):
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("запрос должен быть объектом JSON")
+        except ValueError as e:
+            return 400, {'error': f"неверный JSON: {e}"}
+        if request.get('metrics'):
+            return 200, self.metrics.snapshot()
+        return await self.handle(request)
+
+    async def _pipeline(self, read_next, write):
+        # Запросы читаются, не дожидаясь ответов (до PIPELINE_DEPTH сразу),
+        # ответы пишутся в порядке запросов
+        pending = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+
+        async def writer():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    return
+                await write(*await task)
+
+        writer_task = asyncio.create_task(writer())
+        try:
+            while True:
+                request = await read_next()
+                if request is None:
+                    break
+                await pending.put(asyncio.ensure_future(request))
+                if writer_task.done():
+                    break
+        finally:
+            await pending.put(None)
+            await writer_task
+
+    async def serve_connection(self, reader, writer):
+        keep_alive = [True]
+
+        async def read_next():
+            if not keep_alive[0]:
+                return None
+            line = await reader.readline()
+            if not line.strip():
+                return None
+            method, path = line.decode('latin-1').split()[:2]
+            headers = {}
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = header.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            keep_alive[0] = headers.get('connection', '').lower() != 'close'
+            return self._route(method, path, body, keep_alive[0])
+
+        async def write(status, response, close):
+            data = json.dumps(response, ensure_ascii=False).encode()
+            head = f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n" \
+                   f"Content-Length: {len(data)}\r\n"
+            if close:
+                head += "Connection: close\r\n"
+            writer.write((head + "\r\n").encode() + data)
+            await writer.drain()
+
+        try:
+            await self._pipeline(read_next, write)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            # CancelledError - остановка сервера, соединение просто закрывается
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, keep_alive):
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics.snapshot(), not keep_alive
+        if method == 'POST' and path == '/convert':
+            status, response = await self.handle_bytes(body)
+            return status, response, not keep_alive
+        return 404, {'error': f"нет пути {method} {path}"}, not keep_alive
+
+    async def serve_http(self, host, port, ready=None):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        if ready is not None:
+            ready.set_result(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+    async def serve_stdio(self):
+        # Одна строка JSON - один запрос; ответы - строки JSON в том же порядке
+        loop = asyncio.get_running_loop()
+        batcher_task = asyncio.create_task(self.batcher.run())
+
+        async def read_next():
+            # stdin читается в потоке: так работает и с каналом, и с файлом
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+                if not line:
+                    return None
+                if line.strip():
+                    return self.handle_bytes(line)
+
+        async def write(status, response):
+            sys.stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+
+        await self._pipeline(read_next, write)
+        batcher_task.cancel()
+
+
+async def _request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b''):
+            break
+        name, _, value = header.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def bench(clients, requests, colors, max_colors, wait):
+    # Сервер и клиенты в одном процессе на localhost: clients соединений,
+    # по requests запросов из colors случайных цветов каждое
+    from colorspace import rgb_to_cmyk_color, rgb_to_hls_color
+
+    service = ColorService(max_colors, wait)
+    ready = asyncio.get_running_loop().create_future()
+    server_task = asyncio.create_task(service.serve_http('127.0.0.1', 0, ready))
+    port = await ready
+    rng = np.random.default_rng(0)
+    latencies = []
+    mismatches = 0
+
+    async def client(number):
+        nonlocal mismatches
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for i in range(requests):
+            rgb = rng.integers(0, 256, (colors, 3)).tolist()
+            target = ('hls', 'cmyk', 'hex')[(number + i) % 3]
+            start_time = time.perf_counter()
+            response = await _request(reader, writer, 'POST', '/convert', {'from': 'rgb', 'to': target, 'colors': rgb})
+            latencies.append(time.perf_counter() - start_time)
+            if i == 0:
+                # Сверка с функциями одного цвета, как в окне приложения
+                if target == 'hex':
+                    expected = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb]
+                else:
+                    scalar = rgb_to_hls_color if target == 'hls' else rgb_to_cmyk_color
+                    expected = [[round(v, 2) for v in scalar(*color)] for color in rgb]
+                mismatches += response['colors'] != expected
+        writer.close()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start_time
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    metrics = await _request(reader, writer, 'GET', '/metrics')
+    writer.close()
+    server_task.cancel()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"пачки до {max_colors} цветов, ожидание {wait * 1000:.0f} мс: "
+          f"{len(latencies) / elapsed:7.0f} запросов/с, {len(latencies) * colors / elapsed / 1e6:5.2f} млн цветов/с, "
+          f"p50 {p50:6.2f} мс, p99 {p99:6.2f} мс, запросов в пачке {metrics['requests_per_batch']:5.1f}, "
+          f"расхождений: {mismatches}")
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис перевода цветов RGB, HLS, CMYK, hex")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--stdio', action='store_true', help="JSON-строки через stdin/stdout вместо HTTP")
+    parser.add_argument('--batch-colors', type=int, default=BATCH_COLORS, help="наибольшая пачка (цветов)")
+    parser.add_argument('--batch-wait', type=float, default=BATCH_WAIT * 1000, help="ожидание пачки, мс")
+    parser.add_argument('--bench', action='store_true', help="нагрузить сервис на localhost и вывести отчёт")
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=50, help="запросов на клиента в --bench")
+    parser.add_argument('--colors', type=int, default=16, help="цветов в запросе в --bench")
+    args = parser.parse_args(argv)
+    wait = args.batch_wait / 1000
+
+    if args.bench:
+        # Для сравнения - без пачек: каждый запрос переводится отдельно
+        asyncio.run(bench(args.clients, args.requests, args.colors, 1, 0))
+        metrics = asyncio.run(bench(args.clients, args.requests, args.colors, args.batch_colors, wait))
+        print(json.dumps(metrics, indent=2), file=sys.stderr)
+        return 0
+
+    service = ColorService(args.batch_colors, wait)
+    try:
+        if args.stdio:
+            asyncio.run(service.serve_stdio())
+        else:
+            print(f"http://{args.host}:{args.port}/convert, /metrics", file=sys.stderr)
+            asyncio.run(service.serve_http(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from colorspace import cmyk_to_rgb_color, hls_to_rgb_color, rgb_to_cmyk_color, rgb_to_hls_color
+from service import ColorService, hex_to_rgb, parse_request, rgb_to_hex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _handle_all(requests, max_colors=1000, wait=0.01):
+    # Все запросы сразу, чтобы они попали в одну пачку
+    async def run():
+        service = ColorService(max_colors, wait)
+        batcher_task = asyncio.create_task(service.batcher.run())
+        try:
+            return await asyncio.gather(*(service.handle(r) for r in requests)), service.metrics.snapshot()
+        finally:
+            batcher_task.cancel()
+
+    return asyncio.run(run())
+
+
+def test_hex_round_trip():
+    rgb = hex_to_rgb(['#ff0000', '00FF80', '#0a0b0c'])
+    assert rgb.tolist() == [[255, 0, 0], [0, 255, 128], [10, 11, 12]]
+    assert rgb_to_hex(rgb) == ['#ff0000', '#00ff80', '#0a0b0c']
+
+
+def test_parse_request():
+    array, source, target, as_hex = parse_request({'from': 'hex', 'to': 'hls', 'colors': ['#ffffff']})
+    assert (array.tolist(), source, target, as_hex) == ([[255, 255, 255]], 'rgb', 'hls', False)
+    array, source, target, as_hex = parse_request({'from': 'cmyk', 'to': 'hex', 'colors': [[0, 0, 0, 100]]})
+    assert (array.shape, source, target, as_hex) == ((1, 4), 'cmyk', 'rgb', True)
+
+
+@pytest.mark.parametrize('request_', [
+    {'from': 'xyz', 'to': 'rgb', 'colors': []},
+    {'from': 'rgb', 'to': 'hls', 'colors': 'red'},
+    {'from': 'rgb', 'to': 'hls', 'colors': [[1, 2]]},
+    {'from': 'rgb', 'to': 'hls', 'colors': [[1, 'a', 3]]},
+    {'from': 'hex', 'to': 'rgb', 'colors': [1]},
+    {'from': 'hex', 'to': 'rgb', 'colors': ['#zz0000']},
+    {'from': 'hex', 'to': 'rgb', 'colors': ['#fff']},
+    {'from': 'rgb', 'to': 'hex', 'colors': [[300, -5, 0]]},
+    {'from': 'rgb', 'to': 'hls', 'colors': [[float('nan'), 0, 0]]},
+    {'from': 'hls', 'to': 'rgb', 'colors': [[361, 50, 50]]},
+    {'from': 'cmyk', 'to': 'rgb', 'colors': [[0, 0, 0, 101]]},
+])
+def test_parse_request_errors(request_):
+    with pytest.raises(ValueError):
+        parse_request(request_)
+
+
+def test_handle_errors_do_not_stop_service():
+    (bad, good), metrics = _handle_all([
+        {'from': 'hex', 'to': 'rgb', 'colors': [1], 'id': 1},
+        {'from': 'hex', 'to': 'rgb', 'colors': ['#102030'], 'id': 2},
+    ])
+    assert bad[0] == 400 and bad[1]['id'] == 1 and 'error' in bad[1]
+    assert good == (200, {'colors': [[16, 32, 48]], 'id': 2})
+    assert metrics['errors'] == 1
+
+
+def test_batched_results_match_single_colors():
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 256, (50, 3)).tolist()
+    hls = np.round(rng.uniform(0, 1, (50, 3)) * [360, 100, 100], 2).tolist()
+    cmyk = np.round(rng.uniform(0, 100, (50, 4)), 2).tolist()
+    cases = [
+        ('rgb', 'hls', rgb, rgb_to_hls_color),
+        ('rgb', 'cmyk', rgb, rgb_to_cmyk_color),
+        ('hls', 'rgb', hls, hls_to_rgb_color),
+        ('cmyk', 'rgb', cmyk, cmyk_to_rgb_color),
+    ]
+    # По одному цвету в запросе, все запросы одной пачкой
+    requests = [{'from': source, 'to': target, 'colors': [color]}
+                for source, target, colors, _ in cases for color in colors]
+    responses, metrics = _handle_all(requests)
+    assert metrics['batches'] < len(requests)
+    # Как в окне приложения: RGB - целые, HLS и CMYK - округлённые до сотых
+    expected = [[round(v, 2) for v in function(*color)] for _, _, colors, function in cases for color in colors]
+    assert [response for _, response in responses] == [{'colors': [color]} for color in expected]
+
+
+async def _read_response(reader):
+    # (код, тело) одного ответа HTTP
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b''):
+            break
+        name, _, value = header.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _http_request(method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    return f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+
+
+def test_http_pipelining_and_metrics():
+    colors = [[i * 10, 255 - i * 10, i] for i in range(20)]
+    requests = [{'from': 'rgb', 'to': 'hex', 'colors': [color], 'id': i} for i, color in enumerate(colors)]
+    requests.insert(5, {'from': 'hex', 'to': 'rgb', 'colors': [1], 'id': 'bad'})
+
+    async def run():
+        service = ColorService()
+        ready = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(service.serve_http('127.0.0.1', 0, ready))
+        port = await ready
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            # Все запросы одной записью, не дожидаясь ответов
+            writer.write(b''.join(_http_request('POST', '/convert', r) for r in requests))
+            await writer.drain()
+            responses = [await _read_response(reader) for _ in requests]
+            writer.write(_http_request('GET', '/nowhere'))
+            missing = await _read_response(reader)
+            writer.write(_http_request('GET', '/metrics'))
+            metrics = await _read_response(reader)
+            writer.close()
+            return responses, missing, metrics
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+
+    responses, missing, metrics = asyncio.run(run())
+    assert [response.get('id') for _, response in responses] == [r['id'] for r in requests]
+    for (status, response), request in zip(responses, requests):
+        if request['id'] == 'bad':
+            assert status == 400 and 'error' in response
+        else:
+            assert status == 200
+            assert response['colors'] == rgb_to_hex(np.array(request['colors']))
+    assert missing[0] == 404
+    status, metrics = metrics
+    assert status == 200
+    assert metrics['requests'] == len(requests) and metrics['errors'] == 1
+    assert 0 < metrics['latency_p50_ms'] <= metrics['latency_p99_ms']
+
+
+def test_stdio():
+    lines = [
+        {'from': 'hex', 'to': 'rgb', 'colors': ['#ff8000'], 'id': 1},
+        {'from': 'rgb', 'to': 'hex', 'colors': [[300, 0, 0]], 'id': 2},
+        {'from': 'rgb', 'to': 'cmyk', 'colors': [[0, 0, 0]], 'id': 3},
+    ]
+    result = subprocess.run(
+        [sys.executable, os.path.join(HERE, 'service.py'), '--stdio'],
+        input=''.join(json.dumps(line) + '\n' for line in lines) + 'не JSON\n',
+        capture_output=True, text=True, timeout=30, cwd=HERE,
+    )
+    assert result.returncode == 0
+    responses = [json.loads(line) for line in result.stdout.splitlines()]
+    assert responses[:3] == [
+        {'colors': [[255, 128, 0]], 'id': 1},
+        {'error': responses[1].get('error'), 'id': 2},
+        {'colors': [[0, 0, 0, 100]], 'id': 3},
+    ]
+    assert 'error' in responses[1] and 'error' in responses[3]
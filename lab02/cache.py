@@ -0,0 +1,173 @@
+import collections
+import hashlib
+import threading
+
+import numpy as np
+
+from adaptive import local_threshold
+from histogram import apply_thresholds, gray_histogram, histogram_thresholds
+from preview import build_pyramid
+from processing import (blur_radius, decode_image, encode_result, gaussian_blur, is_binary, to_gray, unsharp_combine,
+                        unsharp_mask)
+
+# Кэш результатов обработки с адресацией по содержимому.
+#
+# Ключ - хэш байтов исходного файла плюс операция и её параметры, поэтому
+# одинаковые загрузки и повторные сочетания параметров берутся из кэша
+# независимо от сессии. Вытеснение - LRU с ограничением по памяти;
+# закэшированные массивы доступны только для чтения.
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def content_key(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_size(v) for v in value)
+    return 64
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for v in value:
+            _freeze(v)
+    return value
+
+
+class LRUCache:
+    # Потокобезопасный LRU: Streamlit выполняет сессии в разных потоках
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        # key[0] - вид значения, по нему ведутся счётчики
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits[key[0]] += 1
+                return self.entries[key][0]
+            self.misses[key[0]] += 1
+
+        value = _freeze(compute())
+        size = _size(value)
+        with self.lock:
+            if size > self.max_bytes or key in self.entries:
+                return value
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'by_kind': {k: {'hits': self.hits[k], 'misses': self.misses[k]} for k in kinds},
+            }
+
+
+class CachedProcessing:
+    # Операции из processing.py поверх LRUCache. Исходное изображение
+    # задаётся ключом source = content_key(байты файла); результаты
+    # обозначаются ключами, по которым кэшируется и их кодирование.
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def decode(self, data):
+        source = content_key(data)
+        return source, self.cache.get_or_compute(('decode', source), lambda: decode_image(data))
+
+    def pyramid(self, source, image):
+        return self.cache.get_or_compute(('pyramid', source), lambda: build_pyramid(image))
+
+    def level(self, source, image, level):
+        # Уровень пирамиды как отдельный источник: (source, level) подходит
+        # вместо source во всех методах ниже
+        if level == 0:
+            return source, image
+        return (source, level), self.pyramid(source, image)[level]
+
+    def gray(self, source, image):
+        return self.cache.get_or_compute(('gray', source), lambda: to_gray(image))
+
+    def blur(self, source, image, radius):
+        radius = blur_radius(radius)
+        return self.cache.get_or_compute(('blur', source, radius), lambda: gaussian_blur(image, radius))
+
+    def histogram(self, source, image):
+        return self.cache.get_or_compute(('histogram', source), lambda: gray_histogram(self.gray(source, image)))
+
+    def histogram_thresholds(self, source, image, method, classes=3, percentile=50.0):
+        # Пороги по закэшированной гистограмме - O(256), без прохода по изображению
+        return histogram_thresholds(self.histogram(source, image), method, classes, percentile)
+
+    def thresholds(self, source, image, thresholds):
+        # Результат по готовым порогам - общий для всех методов, давших те же пороги
+        key = ('thresholds', source, tuple(thresholds))
+        return key, self.cache.get_or_compute(key, lambda: apply_thresholds(self.gray(source, image), thresholds))
+
+    def threshold(self, source, image, threshold_value, method_otsu):
+        used = self.histogram_thresholds(source, image, 'otsu')[0] if method_otsu else threshold_value
+        key, result = self.thresholds(source, image, (used,))
+        return key, result, used
+
+    def histogram_threshold(self, source, image, method, classes=3, percentile=50.0):
+        thresholds = self.histogram_thresholds(source, image, method, classes, percentile)
+        key, result = self.thresholds(source, image, thresholds)
+        return key, result, thresholds
+
+    def local_threshold(self, source, image, method, window, k=None):
+        key = ('threshold', source, method, window, k)
+        result = self.cache.get_or_compute(
+            key, lambda: local_threshold(self.gray(source, image), method, window, k))
+        return key, result
+
+    def sharpen(self, source, image, radius, amount, threshold=0, precision='uint8'):
+        # Без порога шума и с точностью uint8 размытие берётся из кэша и общее
+        # для всех значений силы; иначе - один проход unsharp_mask
+        if threshold == 0 and precision == 'uint8':
+            key = ('sharpen', source, blur_radius(radius), amount)
+            compute = lambda: unsharp_combine(image, self.blur(source, image, radius), amount)
+        else:
+            key = ('sharpen', source, blur_radius(radius), amount, threshold, precision)
+            compute = lambda: unsharp_mask(image, radius, amount, threshold, precision)
+        return key, self.cache.get_or_compute(key, compute)
+
+    def is_binary(self, result_key, image):
+        return self.cache.get_or_compute(('binary', result_key), lambda: is_binary(image))
+
+    def encode(self, result_key, image, fmt='png', quality=None):
+        # Байты файла кэшируются по ключу результата, формату и качеству
+        return self.cache.get_or_compute(
+            ('encoded', result_key, fmt, quality), lambda: encode_result(image, fmt, quality))
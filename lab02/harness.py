@@ -0,0 +1,255 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from adaptive import LOCAL_METHODS
+from histogram import HISTOGRAM_METHODS
+from pipeline import iter_images
+from processing import (ENCODE_FORMATS, apply_histogram_threshold, apply_threshold, apply_unsharp_masking,
+                        decode_image, encode_result, unsharp_mask)
+from tiles import tiled_threshold, tiled_unsharp_masking
+
+# Регрессионная проверка и замеры на изображениях из test_images.
+#
+# Для каждого изображения прогоняется сетка параметров всех функций
+# обработки. Хэш результата и найденные пороги сравниваются с эталоном
+# golden.json, так что любое изменение результата заметно. Для каждого
+# случая замеряется время (медиана нескольких запусков) и пик памяти,
+# выделенной через NumPy (tracemalloc; внутренние буферы OpenCV сюда не
+# входят), оба в пересчёте на мегапиксель. Отчёт в JSON можно сравнить с
+# отчётом прошлого запуска (--baseline).
+#
+#   python harness.py --update              # записать эталон
+#   python harness.py --report report.json  # проверить и замерить
+#   python harness.py --baseline old.json --report new.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(HERE, 'golden.json')
+IMAGES_PATH = os.path.join(HERE, 'test_images')
+
+# Размер плитки для проверки tiles.py: меньше тестовых изображений, чтобы были швы
+HARNESS_TILE = 200
+
+
+def _tiled(function, image, *args, gray=False):
+    dst = np.empty(image.shape[:2] if gray else image.shape, dtype=np.uint8)
+    used = function(image, dst, *args, tile=HARNESS_TILE, workers=2)
+    return dst, used
+
+
+def _encoded(image, fmt, quality=None):
+    # Двоичные форматы проверяются на результате порога Оцу
+    if fmt.endswith('_1bit'):
+        image = apply_threshold(image, 0, True)[0]
+    return np.frombuffer(encode_result(image, fmt, quality), dtype=np.uint8), None
+
+
+def cases():
+    # (имя, функция(image) -> (результат, порог или пороги или None))
+    grid = []
+    for value in (64, 127, 192):
+        grid.append((f"threshold/manual/{value}", lambda im, v=value: apply_threshold(im, v, False)))
+    grid.append(("threshold/otsu", lambda im: apply_threshold(im, 0, True)))
+    for method in HISTOGRAM_METHODS:
+        if method == 'multi_otsu':
+            for classes in (2, 3, 4):
+                grid.append((f"histogram/multi_otsu/{classes}",
+                             lambda im, c=classes: apply_histogram_threshold(im, 'multi_otsu', classes=c)))
+        elif method == 'percentile':
+            for percentile in (10, 50):
+                grid.append((f"histogram/percentile/{percentile}",
+                             lambda im, p=percentile: apply_histogram_threshold(im, 'percentile', percentile=p)))
+        else:
+            grid.append((f"histogram/{method}", lambda im, m=method: apply_histogram_threshold(im, m)))
+    for method in LOCAL_METHODS:
+        for window in (15, 31, 61):
+            grid.append((f"local/{method}/{window}",
+                         lambda im, m=method, w=window: apply_threshold(im, 0, False, m, w)))
+    for radius in (1, 5, 11, 21):
+        for amount in (0.5, 1.5, 3.0):
+            grid.append((f"unsharp/{radius}/{amount}",
+                         lambda im, r=radius, a=amount: (apply_unsharp_masking(im, r, a), None)))
+    for precision in ('uint8', 'uint16', 'float32'):
+        for noise in (0, 5):
+            grid.append((f"unsharp_mask/{precision}/{noise}",
+                         lambda im, p=precision, t=noise: (unsharp_mask(im, 5, 1.5, t, p), None)))
+    grid.append(("tiles/threshold/otsu", lambda im: _tiled(tiled_threshold, im, 0, True, gray=True)))
+    grid.append(("tiles/unsharp/11/1.5", lambda im: (_tiled(tiled_unsharp_masking, im, 11, 1.5)[0], None)))
+    for fmt in ENCODE_FORMATS:
+        grid.append((f"encode/{fmt}", lambda im, f=fmt: _encoded(im, f)))
+    grid.append(("encode/png/6", lambda im: _encoded(im, 'png', 6)))
+    return grid
+
+
+# Результаты плиточной обработки должны совпадать с обработкой в памяти
+SAME_AS = {"tiles/threshold/otsu": "threshold/otsu", "tiles/unsharp/11/1.5": "unsharp/11/1.5"}
+
+
+def result_hash(array):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{array.dtype.str}{array.shape}".encode())
+    h.update(np.ascontiguousarray(array).data)
+    return h.hexdigest()
+
+
+def _thresholds(used):
+    if used is None:
+        return None
+    return [int(t) for t in used] if isinstance(used, tuple) else int(used)
+
+
+def measure(function, image, repeat):
+    # Время - медиана repeat запусков; пик памяти - отдельным запуском под tracemalloc
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result, used = function(image)
+        times.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    function(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, used, float(np.median(times)), float(min(times)), peak
+
+
+def environment():
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+        'platform': platform.platform(), 'cpus': os.cpu_count(),
+    }
+
+
+def run(images_path, repeat, only=None):
+    rows = []
+    for path in iter_images(images_path):
+        with open(path, 'rb') as f:
+            image = decode_image(f.read())
+        megapixels = image.shape[0] * image.shape[1] / 1e6
+        name = os.path.relpath(path, images_path)
+        for case, function in cases():
+            if only and not case.startswith(only):
+                continue
+            result, used, median, best, peak = measure(function, image, repeat)
+            rows.append({
+                'image': name, 'case': case, 'width': image.shape[1], 'height': image.shape[0],
+                'hash': result_hash(result), 'thresholds': _thresholds(used),
+                'ms': median * 1000, 'min_ms': best * 1000, 'ms_per_mp': median * 1000 / megapixels,
+                'peak_mb': peak / 2 ** 20, 'peak_mb_per_mp': peak / 2 ** 20 / megapixels,
+            })
+    return rows
+
+
+def check(rows, golden):
+    # Список расхождений с эталоном и между плиточной обработкой и обработкой в памяти
+    problems = []
+    expected = golden.get('results', {})
+    by_key = {(row['image'], row['case']): row for row in rows}
+    for row in rows:
+        key = f"{row['image']}|{row['case']}"
+        if key in expected:
+            want = expected[key]
+            if row['hash'] != want['hash']:
+                problems.append(f"{key}: результат изменился")
+            if row['thresholds'] != want['thresholds']:
+                problems.append(f"{key}: пороги {want['thresholds']} -> {row['thresholds']}")
+        else:
+            problems.append(f"{key}: нет в эталоне")
+        same = by_key.get((row['image'], SAME_AS.get(row['case'])))
+        if same is not None and same['hash'] != row['hash']:
+            problems.append(f"{key}: не совпадает с {same['case']}")
+    return problems
+
+
+def summarize(rows, baseline=None):
+    # По операциям (первая часть имени случая): среднее время и память на мегапиксель
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['case'].split('/')[0], []).append(row)
+    base = {}
+    if baseline is not None:
+        for row in baseline.get('results', []):
+            base[(row['image'], row['case'])] = row['ms_per_mp']
+    summary = {}
+    for operation, items in groups.items():
+        entry = {
+            'cases': len(items),
+            'ms_per_mp': float(np.mean([r['ms_per_mp'] for r in items])),
+            'peak_mb_per_mp': float(np.mean([r['peak_mb_per_mp'] for r in items])),
+        }
+        ratios = [r['ms_per_mp'] / base[(r['image'], r['case'])] for r in items if (r['image'], r['case']) in base]
+        if ratios:
+            # Среднее геометрическое отношения нового времени к прошлому
+            entry['vs_baseline'] = float(np.exp(np.mean(np.log(ratios))))
+        summary[operation] = entry
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Регрессионная проверка и замеры обработки на test_images")
+    parser.add_argument('--images', default=IMAGES_PATH, help="каталог изображений (по умолчанию test_images)")
+    parser.add_argument('--golden', default=GOLDEN_PATH, help="файл эталона")
+    parser.add_argument('--update', action='store_true', help="перезаписать эталон текущими результатами")
+    parser.add_argument('--repeat', type=int, default=5, help="запусков на замер времени")
+    parser.add_argument('--only', help="только случаи, имя которых начинается с этой строки")
+    parser.add_argument('--report', help="файл отчёта .json")
+    parser.add_argument('--baseline', help="отчёт прошлого запуска для сравнения времени")
+    args = parser.parse_args(argv)
+
+    rows = run(args.images, args.repeat, args.only)
+    env = environment()
+
+    if args.update:
+        results = {}
+        if args.only and os.path.exists(args.golden):
+            # Обновляется только часть случаев, остальные остаются из старого эталона
+            with open(args.golden, encoding='utf-8') as f:
+                results = json.load(f)['results']
+        results.update({f"{r['image']}|{r['case']}": {'hash': r['hash'], 'thresholds': r['thresholds']} for r in rows})
+        golden = {'environment': env, 'results': results}
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write('\n')
+        problems = []
+        print(f"Эталон записан: {len(rows)} случаев", file=sys.stderr)
+    else:
+        with open(args.golden, encoding='utf-8') as f:
+            golden = json.load(f)
+        problems = check(rows, golden)
+        if golden.get('environment', {}).get('opencv') != env['opencv']:
+            print(f"Внимание: эталон записан с OpenCV {golden['environment'].get('opencv')}, "
+                  f"сейчас {env['opencv']}; вычисления с плавающей точкой могут отличаться", file=sys.stderr)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    summary = summarize(rows, baseline)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'environment': env, 'summary': summary, 'problems': problems, 'results': rows},
+                      f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    for operation, entry in summary.items():
+        line = (f"{operation:13s} случаев {entry['cases']:4d}: {entry['ms_per_mp']:8.2f} мс/Мпикс, "
+                f"{entry['peak_mb_per_mp']:7.2f} МБ/Мпикс")
+        if 'vs_baseline' in entry:
+            line += f", x{entry['vs_baseline']:.2f} к прошлому"
+        print(line, file=sys.stderr)
+    for problem in problems:
+        print(f"Расхождение: {problem}", file=sys.stderr)
+    print(f"Случаев: {len(rows)}, расхождений: {len(problems)}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import cv2
+import numpy as np
+
+# Пороги по гистограмме яркостей.
+#
+# Гистограмма (256 счётчиков) считается по изображению один раз, а все
+# пороги ниже получаются из неё за O(256) - без нового прохода по пикселям:
+#   otsu        максимум межклассовой дисперсии (как cv2.THRESH_OTSU)
+#   multi_otsu  то же для 2-4 классов, по таблицам накопленных моментов
+#   triangle    наибольшее расстояние от гистограммы до прямой от пика
+#               к краю (как cv2.THRESH_TRIANGLE)
+#   kapur       максимум суммы энтропий фона и объекта
+#   percentile  заданная доля пикселей темнее порога
+# Пиксель белый (255), если его яркость больше порога. Для нескольких
+# порогов пиксели класса c получают яркость 255 * c / (число классов - 1).
+
+HISTOGRAM_METHODS = ('otsu', 'multi_otsu', 'triangle', 'kapur', 'percentile')
+
+
+def gray_histogram(gray_image):
+    # 256 счётчиков яркости; гистограммы частей изображения можно складывать
+    return np.bincount(gray_image.ravel(), minlength=256)
+
+
+def otsu_threshold(hist):
+    # Порог Оцу по гистограмме - тот же расчёт, что в cv2.threshold с
+    # THRESH_OTSU (включая порядок операций в double), поэтому порог
+    # совпадает с OpenCV и для гистограммы, собранной по частям
+    hist = np.asarray(hist, dtype=np.float64)
+    scale = 1.0 / hist.sum()
+    mu = float((np.arange(256) * hist).sum()) * scale
+    q1 = mu1 = max_sigma = 0.0
+    max_val = 0
+    eps = float(np.finfo(np.float32).eps)
+    for i, count in enumerate(hist.tolist()):
+        p_i = count * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < eps or max(q1, q2) > 1.0 - eps:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+
+def _class_variance_table(hist):
+    # table[a, b] = S(a..b)**2 / P(a..b) - вклад класса яркостей a..b в
+    # межклассовую дисперсию (с точностью до константы), где P и S -
+    # накопленные доля пикселей и первый момент
+    p = np.asarray(hist, dtype=np.float64) / max(hist.sum(), 1)
+    cum_p = np.concatenate([[0.0], np.cumsum(p)])
+    cum_s = np.concatenate([[0.0], np.cumsum(np.arange(256) * p)])
+    weight = cum_p[None, 1:] - cum_p[:-1, None]
+    moment = cum_s[None, 1:] - cum_s[:-1, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = np.where(weight > 1e-12, moment * moment / weight, 0.0)
+    # Только a <= b
+    return np.where(np.triu(np.ones((256, 256), dtype=bool)), table, -np.inf)
+
+
+def multi_otsu_thresholds(hist, classes=3):
+    # Пороги t1 < ... < t(classes-1), класс k - яркости (t(k-1), tk].
+    # Сумма вкладов классов максимизируется динамическим программированием
+    # по концу последнего класса: O(classes * 256**2), а не перебор всех
+    # сочетаний порогов
+    if not 2 <= classes <= 4:
+        raise ValueError("многоуровневый Оцу поддерживает от 2 до 4 классов")
+    table = _class_variance_table(hist)
+    best = table[0].copy()
+    choices = []
+    for _ in range(classes - 1):
+        # candidates[i, j]: предыдущие классы заканчиваются на i, новый - i+1..j
+        candidates = best[:-1, None] + table[1:, :]
+        choice = np.argmax(candidates, axis=0)
+        best = np.concatenate([[-np.inf], candidates[choice, np.arange(256)][1:]])
+        choices.append(choice)
+    thresholds = []
+    end = 255
+    for choice in reversed(choices):
+        end = int(choice[end])
+        thresholds.append(end)
+    return tuple(reversed(thresholds))
+
+
+def triangle_threshold(hist):
+    # Метод треугольника, тот же расчёт, что в cv2.threshold с THRESH_TRIANGLE
+    h = np.asarray(hist).astype(np.int64).tolist()
+    nonzero = [i for i, count in enumerate(h) if count > 0]
+    if not nonzero:
+        return 0
+    left, right = max(nonzero[0] - 1, 0), min(nonzero[-1] + 1, 255)
+    peak = max(range(256), key=lambda i: (h[i], -i))
+    flipped = peak - left < right - peak
+    if flipped:
+        h.reverse()
+        left, peak = 255 - right, 255 - peak
+
+    threshold = left
+    a, b = h[peak], left - peak
+    dist = 0
+    for i in range(left + 1, peak + 1):
+        d = a * i + b * h[i]
+        if d > dist:
+            dist = d
+            threshold = i
+    threshold -= 1
+    return 255 - threshold if flipped else threshold
+
+
+def kapur_threshold(hist):
+    # Порог Капура: максимум H(фон) + H(объект), энтропии считаются по
+    # накопленным суммам p и p * log(p)
+    p = np.asarray(hist, dtype=np.float64) / max(hist.sum(), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plogp = np.where(p > 0, p * np.log(p), 0.0)
+    cum_p, cum_plogp = np.cumsum(p), np.cumsum(plogp)
+    back_p, back_plogp = cum_p[:-1], cum_plogp[:-1]
+    fore_p, fore_plogp = 1.0 - back_p, cum_plogp[-1] - back_plogp
+    valid = (back_p > 1e-12) & (fore_p > 1e-12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = (np.log(back_p) - back_plogp / back_p) + (np.log(fore_p) - fore_plogp / fore_p)
+    entropy = np.where(valid, entropy, -np.inf)
+    return int(np.argmax(entropy)) if valid.any() else 0
+
+
+def percentile_threshold(hist, percentile=50.0):
+    # Перцентиль яркости: не меньше percentile % пикселей не ярче порога
+    cum = np.cumsum(hist)
+    return int(np.searchsorted(cum, cum[-1] * percentile / 100.0))
+
+
+def histogram_thresholds(hist, method, classes=3, percentile=50.0):
+    # Пороги метода как кортеж (один порог для всех, кроме multi_otsu)
+    if method == 'otsu':
+        return (otsu_threshold(hist),)
+    if method == 'multi_otsu':
+        return multi_otsu_thresholds(hist, classes)
+    if method == 'triangle':
+        return (triangle_threshold(hist),)
+    if method == 'kapur':
+        return (kapur_threshold(hist),)
+    if method == 'percentile':
+        return (percentile_threshold(hist, percentile),)
+    raise ValueError(f"неизвестный метод: {method}")
+
+
+def apply_thresholds(gray_image, thresholds, out=None):
+    # Один порог - бинаризация, несколько - уровни яркости по классам.
+    # out - необязательный буфер результата того же размера
+    levels = len(thresholds)
+    lut = np.zeros(256, dtype=np.uint8)
+    for c, t in enumerate(thresholds, start=1):
+        lut[t + 1:] = round(255 * c / levels)
+    return cv2.LUT(gray_image, lut, dst=out)
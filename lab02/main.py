@@ -1,30 +1,67 @@
+import collections
+import statistics
+import time
+
+# Время от начала запуска скрипта для отчёта о времени отклика
+script_start = time.perf_counter()
+
 import streamlit as st
-import cv2
-import numpy as np
-from PIL import Image
-import io
 
-def apply_threshold(image, threshold_value, method_otsu):
-    gray_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+# Модули обработки (и вместе с ними OpenCV, около 150 мс импорта)
+# импортируются ниже, только когда есть изображение
+
+# Ширина показа в режиме живого предпросмотра и период опроса фонового задания
+DISPLAY_WIDTH = 1024
+REFINE_POLL_SECONDS = 0.3
+
+# Сколько последних перезапусков сессии учитывается в медиане времени отклика
+RUN_TIMES_WINDOW = 50
+
+LOCAL_METHOD_NAMES = {
+    'mean': "Среднее по окну",
+    'gaussian': "Среднее по Гауссу",
+    'niblack': "Ниблэк",
+    'sauvola': "Саувола",
+    'bradley': "Брэдли",
+}
+
+HISTOGRAM_METHOD_NAMES = {
+    'multi_otsu': "Оцу, несколько классов",
+    'triangle': "Треугольник",
+    'kapur': "Капур (энтропия)",
+    'percentile': "Перцентиль",
+}
 
-    threshold_type = cv2.THRESH_BINARY
-    if method_otsu:
-        threshold_type |= cv2.THRESH_OTSU
+# Параметр k локальных методов: подпись, минимум, максимум, шаг
+LOCAL_K_RANGES = {
+    'mean': ("Сдвиг порога C", -20, 40, 1),
+    'gaussian': ("Сдвиг порога C", -20, 40, 1),
+    'niblack': ("Коэффициент k", -1.0, 1.0, 0.05),
+    'sauvola': ("Коэффициент k", 0.0, 1.0, 0.05),
+    'bradley': ("Доля t", 0.0, 0.5, 0.01),
+}
 
-    otsu_thresh_val, result_image = cv2.threshold(gray_image, threshold_value, 255, threshold_type)
+DOWNLOAD_FORMAT_NAMES = {
+    'png': "PNG",
+    'jpeg': "JPEG",
+    'webp': "WebP",
+    'png_1bit': "PNG, 1 бит на пиксель",
+    'tiff_1bit': "TIFF, 1 бит на пиксель",
+}
 
-    return result_image, int(otsu_thresh_val)
 
-def apply_unsharp_masking(image, radius, amount):
-    if radius % 2 == 0:
-        radius += 1
+@st.cache_resource
+def get_processing():
+    # Один кэш на процесс Streamlit, общий для всех сессий и перезапусков скрипта
+    from cache import CachedProcessing, LRUCache
+    return CachedProcessing(LRUCache())
 
-    blurred = cv2.GaussianBlur(image, (radius, radius), 0)
 
-    # Result = Original + amount * (Original - Blurred)
-    sharpened = cv2.addWeighted(image, 1.0 + amount, blurred, -amount, 0)
+@st.cache_resource
+def get_refine_executor():
+    from preview import make_executor
+    return make_executor()
 
-    return sharpened
 
 st.set_page_config(layout="wide", page_title="Обработка изображений (Вариант 7)")
 
@@ -40,75 +77,242 @@ uploaded_file = st.sidebar.file_uploader("Выберите изображени
 if 'original_image' not in st.session_state:
     st.session_state.original_image = None
     st.session_state.processed_image = None
-    st.session_state.last_otsu_thresh = 127
+    st.session_state.source_key = None
+    st.session_state.processed_key = None
+
+processing = None
+if uploaded_file is not None or st.session_state.original_image is not None:
+    # При перезапусках модули уже загружены, и импорт ничего не стоит
+    from adaptive import DEFAULT_K, LOCAL_METHODS
+    from histogram import HISTOGRAM_METHODS
+    from preview import Refiner, fit_width, level_radius, pick_level
+    from processing import ENCODE_FORMATS, LOCAL_WINDOW, PRECISIONS
+    processing = get_processing()
 
 if uploaded_file is not None:
-    file_bytes = np.asarray(bytearray(uploaded_file.read()), dtype=np.uint8)
-    # Важно: OpenCV читает в формате BGR. PIL/Streamlit работают с RGB.
-    # Поэтому конвертируем сразу после чтения.
-    image_bgr = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-    st.session_state.original_image = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-    st.session_state.processed_image = st.session_state.original_image.copy()
+    # Декодирование (OpenCV читает в BGR, сразу переводим в RGB) кэшируется
+    # по содержимому файла; результат сбрасывается только при новом файле
+    source_key, original_image = processing.decode(uploaded_file.getvalue())
+    if source_key != st.session_state.source_key:
+        st.session_state.source_key = source_key
+        st.session_state.original_image = original_image
+        st.session_state.processed_image = original_image
+        st.session_state.processed_key = ('decode', source_key)
 
 
 if st.session_state.original_image is not None:
+    source_key = st.session_state.source_key
+    original_image = st.session_state.original_image
+
+    live = st.sidebar.toggle(
+        "Живой предпросмотр",
+        help="Фильтр применяется при каждом изменении ползунков к уменьшенной копии, "
+             "полное разрешение считается в фоне."
+    )
+    if live:
+        live_operation = st.sidebar.radio("Показывать:", ("Порог", "Резкость"), horizontal=True)
+        pyramid = processing.pyramid(source_key, original_image)
+        level = pick_level(pyramid, DISPLAY_WIDTH)
+        level_key, level_image = processing.level(source_key, original_image, level)
+
     col1, col2 = st.columns(2)
 
     with col1:
         st.header("Оригинал")
-        st.image(st.session_state.original_image, use_column_width=True)
+        st.image(level_image if live else original_image, width="stretch")
 
-    st.sidebar.header("2. Глобальная пороговая обработка")
-    method = st.sidebar.radio("Метод:", ("Ручной", "Метод Оцу"))
+    st.sidebar.header("2. Пороговая обработка")
+    method = st.sidebar.radio("Метод:", ("Ручной", "Метод Оцу", "По гистограмме", "Локальный"), horizontal=True)
 
     is_otsu = (method == "Метод Оцу")
+    is_hist = (method == "По гистограмме")
+    is_local = (method == "Локальный")
 
     threshold_value = st.sidebar.slider(
         "Значение порога", 0, 255, 127,
-        disabled=is_otsu,
-        help="Этот слайдер неактивен, когда выбран метод Оцу."
+        disabled=method != "Ручной",
+        help="Этот слайдер активен только для ручного порога."
     )
 
-    if st.sidebar.button("Применить порог"):
-        processed, otsu_val = apply_threshold(st.session_state.original_image, threshold_value, is_otsu)
+    hist_method = 'otsu' if is_otsu else None
+    hist_classes, hist_percentile = 3, 50
+    if is_hist:
+        hist_method = st.sidebar.selectbox(
+            "Метод по гистограмме:", HISTOGRAM_METHODS[1:], format_func=lambda m: HISTOGRAM_METHOD_NAMES[m],
+            help="Гистограмма считается один раз на изображение, смена метода её не пересчитывает."
+        )
+        if hist_method == 'multi_otsu':
+            hist_classes = st.sidebar.slider("Число классов", 2, 4, 3)
+        if hist_method == 'percentile':
+            hist_percentile = st.sidebar.slider("Доля тёмных пикселей, %", 1, 99, 50)
+
+    local_method = local_window = local_k = None
+    if is_local:
+        local_method = st.sidebar.selectbox(
+            "Локальный метод:", LOCAL_METHODS, format_func=lambda m: LOCAL_METHOD_NAMES[m],
+            help="Порог считается для каждого пикселя по окну вокруг него, "
+                 "поэтому тени и неравномерное освещение не мешают."
+        )
+        local_window = st.sidebar.slider("Размер окна", 3, 151, LOCAL_WINDOW, 2)
+        k_label, k_min, k_max, k_step = LOCAL_K_RANGES[local_method]
+        local_k = st.sidebar.slider(k_label, k_min, k_max, DEFAULT_K[local_method], k_step)
+
+    def run_threshold(key_source, image, window=local_window):
+        # (key, result, пороги или None) для выбранного метода
+        if is_local:
+            return (*processing.local_threshold(key_source, image, local_method, window, local_k), None)
+        if is_hist:
+            return processing.histogram_threshold(key_source, image, hist_method, hist_classes, hist_percentile)
+        key, result, used = processing.threshold(key_source, image, threshold_value, is_otsu)
+        return key, result, (used,)
+
+    if not live and st.sidebar.button("Применить порог"):
+        key, processed, _ = run_threshold(source_key, original_image)
         st.session_state.processed_image = processed
-        if is_otsu:
-            st.session_state.last_otsu_thresh = otsu_val
+        st.session_state.processed_key = key
 
-    if is_otsu:
-        st.sidebar.info(f"Вычисленный порог Оцу: **{st.session_state.last_otsu_thresh}**")
+    threshold_info = st.sidebar.empty()
 
     st.sidebar.header("3. Увеличение резкости")
     sharpen_amount = st.sidebar.slider("Сила эффекта", 0.1, 3.0, 1.5, 0.1)
     sharpen_radius = st.sidebar.slider("Радиус размытия", 1, 21, 5, 2)
+    sharpen_threshold = st.sidebar.slider(
+        "Порог шума", 0, 50, 0,
+        help="Пиксели, которые отличаются от размытой копии меньше чем на это значение, не усиливаются."
+    )
+    sharpen_precision = st.sidebar.selectbox(
+        "Точность размытия", tuple(PRECISIONS),
+        help="uint8 - как раньше; uint16 и float32 не округляют размытую копию до целых, "
+             "поэтому на плавных переходах меньше ступенек."
+    )
 
-    if st.sidebar.button("Применить резкость"):
-        processed = apply_unsharp_masking(st.session_state.original_image, sharpen_radius, sharpen_amount)
+    if not live and st.sidebar.button("Применить резкость"):
+        key, processed = processing.sharpen(source_key, original_image, sharpen_radius, sharpen_amount,
+                                            sharpen_threshold, sharpen_precision)
         st.session_state.processed_image = processed
+        st.session_state.processed_key = key
+
+    if live:
+        # Предпросмотр считается сразу (и кэшируется), полное разрешение
+        # заказывается в фоне; прежнее фоновое задание при этом отменяется
+        if live_operation == "Порог":
+            params = ('threshold', source_key, method, threshold_value, hist_method, hist_classes, hist_percentile,
+                      local_method, local_window, local_k)
+            # Окно локального порога, как и радиус размытия, уменьшается вместе с уровнем
+            _, preview_image, thresholds = run_threshold(
+                level_key, level_image, local_window and level_radius(local_window, level))
+            compute = lambda: run_threshold(source_key, original_image)
+        else:
+            params = ('sharpen', source_key, sharpen_radius, sharpen_amount, sharpen_threshold, sharpen_precision)
+            _, preview_image = processing.sharpen(
+                level_key, level_image, level_radius(sharpen_radius, level), sharpen_amount,
+                sharpen_threshold, sharpen_precision)
+            compute = lambda: processing.sharpen(source_key, original_image, sharpen_radius, sharpen_amount,
+                                                 sharpen_threshold, sharpen_precision)
+        if 'refiner' not in st.session_state:
+            st.session_state.refiner = Refiner(get_refine_executor())
+        refiner = st.session_state.refiner
+        refiner.request(params, compute)
+
+    if hist_method is not None:
+        if live and live_operation == "Порог":
+            # Пороги уменьшенной копии - приближение, пока нет полного результата
+            full = refiner.result(params)
+            if full is not None:
+                thresholds = full[2]
+        else:
+            # По закэшированной гистограмме: после первого раза O(256)
+            thresholds = processing.histogram_thresholds(
+                source_key, original_image, hist_method, hist_classes, hist_percentile)
+        label = "Вычисленный порог Оцу" if is_otsu else "Вычисленные пороги"
+        threshold_info.info(f"{label}: **{', '.join(map(str, thresholds))}**")
+
+    def show_download():
+        key, image = st.session_state.processed_key, st.session_state.processed_image
+        formats = [fmt for fmt in DOWNLOAD_FORMAT_NAMES
+                   if not fmt.endswith('_1bit') or processing.is_binary(key, image)]
+        format_col, quality_col = st.columns(2)
+        fmt = format_col.selectbox("Формат файла", formats, format_func=DOWNLOAD_FORMAT_NAMES.get,
+                                   key="download_format")
+        ext, mime, _, default = ENCODE_FORMATS[fmt]
+        quality = None
+        if fmt in ('png', 'png_1bit'):
+            quality = quality_col.slider("Уровень сжатия", 0, 9, default, key=f"{fmt}_level")
+        elif default is not None:
+            quality = quality_col.slider("Качество", 1, 100, default, key=f"{fmt}_quality")
+
+        # Файл кодируется только по кнопке: полное разрешение кодируется долго,
+        # а каждый новый результат скачивают не всегда. Байты хранятся в сессии
+        # вместе с тем, для чего они подготовлены, и в кэше processing
+        file_key = (key, fmt, quality)
+        prepared = st.session_state.get('download_file')
+        if prepared is None or prepared[0] != file_key:
+            if not st.button("Подготовить файл", key="prepare_download"):
+                return
+            prepared = st.session_state.download_file = (file_key, processing.encode(key, image, fmt, quality))
+        st.download_button(
+            label="Скачать результат",
+            data=prepared[1],
+            file_name=f"processed_image{ext}",
+            mime=mime
+        )
 
     with col2:
         st.header("Результат")
-        st.image(st.session_state.processed_image, use_column_width=True)
-
-        try:
-            result_pil = Image.fromarray(st.session_state.processed_image.astype('uint8'))
-            buf = io.BytesIO()
-            if len(result_pil.getbands()) == 1:
-                result_pil = result_pil.convert("L")
-            else:
-                result_pil = result_pil.convert("RGB")
-
-            result_pil.save(buf, format="PNG")
-            byte_im = buf.getvalue()
-
-            st.download_button(
-                label="Скачать результат",
-                data=byte_im,
-                file_name="processed_image.png",
-                mime="image/png"
-            )
-        except Exception as e:
-            st.error(f"Не удалось подготовить файл для скачивания: {e}")
+        if not live:
+            st.image(st.session_state.processed_image, width="stretch")
+            show_download()
+        else:
+            # Пока полное разрешение не готово, фрагмент опрашивает задание
+            # сам, без перезапуска всего скрипта; когда готово - один полный
+            # перезапуск, чтобы обновить порог Оцу и прекратить опрос
+            polling = refiner.pending()
+
+            @st.fragment(run_every=REFINE_POLL_SECONDS if polling else None)
+            def show_live_result():
+                error = refiner.error(params)
+                if error is not None:
+                    st.error(f"Не удалось обработать изображение в полном разрешении: {error}")
+                    return
+                full = refiner.result(params)
+                if full is not None and polling:
+                    st.rerun()
+                if full is None:
+                    st.image(preview_image, width="stretch")
+                    st.caption(f"Предпросмотр {preview_image.shape[1]}x{preview_image.shape[0]}, "
+                               f"полное разрешение считается...")
+                    return
+                st.session_state.processed_key, st.session_state.processed_image = full[:2]
+                st.image(fit_width(full[1], DISPLAY_WIDTH), width="stretch")
+                st.caption(f"Полное разрешение {full[1].shape[1]}x{full[1].shape[0]} "
+                           f"(заданий: {refiner.submitted}, отменено: {refiner.cancelled})")
+                show_download()
+
+            show_live_result()
 
 else:
     st.info("Пожалуйста, загрузите изображение, используя панель слева.")
+
+with st.sidebar.expander("Кэш"):
+    if processing is None:
+        st.write("Изображение не загружено, модули обработки ещё не импортированы")
+    else:
+        stats = processing.cache.stats()
+        st.write(f"Записей: {stats['entries']}, память: {stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} МБ")
+        st.write(f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, вытеснено: {stats['evictions']}")
+        st.table({kind: counts for kind, counts in stats['by_kind'].items()})
+
+elapsed = time.perf_counter() - script_start
+if 'run_times' not in st.session_state:
+    # Время запусков хранится в сессии: первый запуск отдельно, перезапуски - последние RUN_TIMES_WINDOW
+    st.session_state.first_run_seconds = elapsed
+    st.session_state.run_times = collections.deque(maxlen=RUN_TIMES_WINDOW)
+else:
+    st.session_state.run_times.append(elapsed)
+reruns = st.session_state.run_times
+with st.sidebar.expander("Время отклика"):
+    # Перезапуски фрагмента живого предпросмотра сюда не входят
+    st.write(f"Первый запуск сессии: {st.session_state.first_run_seconds * 1000:.0f} мс, "
+             f"этот запуск: {elapsed * 1000:.0f} мс")
+    if reruns:
+        st.write(f"Медиана последних {len(reruns)} перезапусков: {statistics.median(reruns) * 1000:.0f} мс")
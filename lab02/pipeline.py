@@ -0,0 +1,200 @@
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from adaptive import LOCAL_METHODS
+from histogram import HISTOGRAM_METHODS
+from processing import (LOCAL_WINDOW, PRECISIONS, apply_histogram_threshold, apply_threshold, decode_image,
+                        encode_image, unsharp_mask)
+
+# Пакетная обработка каталогов изображений без Streamlit.
+#
+# Файлы читаются, обрабатываются и кодируются в процессах пула; основной
+# процесс только раздаёт пути и собирает отчёт. В работе одновременно не
+# больше --queue-depth изображений, поэтому память ограничена глубиной
+# очереди, а не размером каталога. Отчёт пишется по мере готовности, в
+# порядке входных файлов.
+#
+#   python pipeline.py test_images out --operation threshold --otsu
+#   python pipeline.py test_images out --operation threshold --local sauvola --window 41
+#   python pipeline.py test_images out --operation threshold --histogram multi_otsu --classes 3
+#   python pipeline.py photos out --operation sharpen --radius 7 --amount 1.2 --report report.csv
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+FIELDS = (
+    'input', 'output', 'width', 'height', 'threshold', 'otsu_threshold',
+    'read_ms', 'decode_ms', 'process_ms', 'encode_ms', 'write_ms', 'total_ms', 'bytes', 'error',
+)
+
+
+def iter_images(root):
+    # Пути изображений каталога (с подкаталогами) в стабильном порядке, лениво
+    entries = sorted(os.scandir(root), key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from iter_images(entry.path)
+        elif entry.name.lower().endswith(EXTENSIONS):
+            yield entry.path
+
+
+def output_path(path, input_root, output_root, ext):
+    relative = os.path.relpath(path, input_root)
+    return os.path.join(output_root, os.path.splitext(relative)[0] + ext)
+
+
+def process_file(path, destination, options):
+    # Выполняется в процессе пула: одно изображение от чтения до записи
+    row = {'input': path, 'output': destination}
+    timings = {}
+    start_time = time.perf_counter()
+    try:
+        step_start = time.perf_counter()
+        with open(path, 'rb') as f:
+            data = f.read()
+        timings['read_ms'] = time.perf_counter() - step_start
+
+        step_start = time.perf_counter()
+        image = decode_image(data)
+        timings['decode_ms'] = time.perf_counter() - step_start
+        row['height'], row['width'] = image.shape[:2]
+
+        step_start = time.perf_counter()
+        if options['operation'] == 'threshold' and options['histogram']:
+            result, used = apply_histogram_threshold(image, options['histogram'], options['classes'],
+                                                     options['percentile'])
+            row['threshold'] = '/'.join(map(str, used))
+        elif options['operation'] == 'threshold':
+            result, used = apply_threshold(image, options['threshold'], options['otsu'],
+                                           options['local'], options['window'], options['k'])
+            row['threshold'] = used
+            row['otsu_threshold'] = used if options['otsu'] else None
+        else:
+            result = unsharp_mask(image, options['radius'], options['amount'],
+                                  options['noise_threshold'], options['precision'])
+        timings['process_ms'] = time.perf_counter() - step_start
+
+        step_start = time.perf_counter()
+        encoded = encode_image(result, options['ext'])
+        timings['encode_ms'] = time.perf_counter() - step_start
+
+        step_start = time.perf_counter()
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        with open(destination, 'wb') as f:
+            f.write(encoded)
+        timings['write_ms'] = time.perf_counter() - step_start
+        row['bytes'] = len(encoded)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    timings['total_ms'] = time.perf_counter() - start_time
+    row.update({k: v * 1000 for k, v in timings.items()})
+    return row
+
+
+def run_pipeline(input_root, output_root, options, workers=None, queue_depth=None):
+    # Генератор строк отчёта. Очередь - это deque из future: пока она
+    # заполнена, ждём самое старое изображение, поэтому и память, и порядок
+    # отчёта под контролем
+    workers = workers or os.cpu_count() or 1
+    queue_depth = queue_depth or 2 * workers
+    in_flight = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in iter_images(input_root):
+            if len(in_flight) >= queue_depth:
+                yield in_flight.popleft().result()
+            destination = output_path(path, input_root, output_root, options['ext'])
+            in_flight.append(pool.submit(process_file, path, destination, options))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class ReportWriter:
+    # Отчёт по мере поступления строк: CSV построчно, JSON - список строк и сводка
+
+    def __init__(self, path):
+        self.path = path
+        self.json = path is not None and path.endswith('.json')
+        self.stream = open(path, 'w', newline='', encoding='utf-8') if path else sys.stdout
+        self.rows = []
+        if not self.json:
+            self.writer = csv.DictWriter(self.stream, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.json:
+            self.rows.append(row)
+        else:
+            self.writer.writerow(row)
+            self.stream.flush()
+
+    def close(self, summary):
+        if self.json:
+            json.dump({'summary': summary, 'images': self.rows}, self.stream, ensure_ascii=False, indent=2)
+            self.stream.write('\n')
+        if self.path:
+            self.stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная пороговая обработка и повышение резкости")
+    parser.add_argument('input', help="каталог с изображениями")
+    parser.add_argument('output', help="каталог для результатов")
+    parser.add_argument('--operation', choices=('threshold', 'sharpen'), default='threshold')
+    parser.add_argument('--threshold', type=int, default=127, help="ручной порог 0..255")
+    parser.add_argument('--otsu', action='store_true', help="порог по методу Оцу")
+    parser.add_argument('--histogram', choices=HISTOGRAM_METHODS, help="порог по гистограмме указанным методом")
+    parser.add_argument('--classes', type=int, default=3, help="число классов для --histogram multi_otsu (2-4)")
+    parser.add_argument('--percentile', type=float, default=50.0, help="доля тёмных пикселей для --histogram percentile")
+    parser.add_argument('--local', choices=LOCAL_METHODS, help="локальный порог вместо глобального")
+    parser.add_argument('--window', type=int, default=LOCAL_WINDOW, help="окно локального порога")
+    parser.add_argument('--k', type=float, default=None, help="параметр локального метода (по умолчанию свой у метода)")
+    parser.add_argument('--radius', type=int, default=5, help="радиус размытия для резкости")
+    parser.add_argument('--amount', type=float, default=1.5, help="сила эффекта резкости")
+    parser.add_argument('--noise-threshold', type=int, default=0,
+                        help="не усиливать пиксели, отличающиеся от размытых меньше чем на это значение")
+    parser.add_argument('--precision', choices=tuple(PRECISIONS), default='uint8', help="точность размытой копии")
+    parser.add_argument('--format', choices=('png', 'jpg', 'bmp', 'tiff', 'webp'), default='png',
+                        help="формат результатов")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию - по числу ядер)")
+    parser.add_argument('--queue-depth', type=int, default=None,
+                        help="изображений в работе одновременно (по умолчанию 2 x процессов)")
+    parser.add_argument('--report', help="файл отчёта .csv или .json (по умолчанию CSV в stdout)")
+    args = parser.parse_args(argv)
+
+    options = {
+        'operation': args.operation, 'threshold': args.threshold, 'otsu': args.otsu,
+        'histogram': args.histogram, 'classes': args.classes, 'percentile': args.percentile,
+        'local': args.local, 'window': args.window, 'k': args.k,
+        'radius': args.radius, 'amount': args.amount, 'noise_threshold': args.noise_threshold,
+        'precision': args.precision, 'ext': '.' + args.format,
+    }
+    report = ReportWriter(args.report)
+    start_time = time.perf_counter()
+    count = errors = pixels = 0
+    try:
+        for row in run_pipeline(args.input, args.output, options, args.workers, args.queue_depth):
+            report.write(row)
+            count += 1
+            errors += 'error' in row
+            pixels += row.get('width', 0) * row.get('height', 0)
+    finally:
+        elapsed = time.perf_counter() - start_time
+        summary = {
+            'images': count, 'errors': errors, 'seconds': elapsed,
+            'images_per_sec': count / elapsed if elapsed > 0 else 0.0,
+            'megapixels_per_sec': pixels / 1e6 / elapsed if elapsed > 0 else 0.0,
+        }
+        report.close(summary)
+    print(f"Обработано: {count} (ошибок: {errors}) за {elapsed:.2f} с, "
+          f"{summary['images_per_sec']:.1f} изобр./с, {summary['megapixels_per_sec']:.1f} Мпикс/с",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from processing import blur_radius
+
+# Живой предпросмотр для больших изображений.
+#
+# Пирамида уменьшенных копий строится cv2.pyrDown (каждый уровень вдвое
+# меньше предыдущего). При каждом изменении ползунков обрабатывается
+# уровень, ближайший к ширине показа, а полное разрешение считается в
+# фоновом потоке (OpenCV отпускает GIL) и подменяет предпросмотр, когда
+# готово. Устаревшие задания отменяются: ещё не начатые - сразу, а
+# результат уже начатых просто не показывается (он остаётся в кэше).
+
+# Наибольшая сторона самого мелкого уровня пирамиды
+PREVIEW_SIDE = 512
+
+# Фоновых потоков на процесс; полное разрешение одного изображения само
+# по себе многопоточно в OpenCV, поэтому больше обычно не нужно
+REFINE_WORKERS = 2
+
+
+def build_pyramid(image, min_side=PREVIEW_SIDE):
+    # Уровни от полного разрешения (уровень 0) до наибольшей стороны <= 2 * min_side
+    levels = [image]
+    while max(levels[-1].shape[:2]) > 2 * min_side:
+        levels.append(cv2.pyrDown(levels[-1]))
+    return tuple(levels)
+
+
+def pick_level(pyramid, width):
+    # Самый мелкий уровень, который ещё не уже width
+    for level in range(len(pyramid) - 1, -1, -1):
+        if pyramid[level].shape[1] >= width:
+            return level
+    return 0
+
+
+def level_radius(radius, level):
+    # Радиус размытия в пикселях уровня: на уровне k изображение в 2**k раз меньше
+    return blur_radius(max(1, round(radius / 2 ** level)))
+
+
+def fit_width(image, width):
+    # Уменьшение для показа, чтобы не отправлять в браузер полное разрешение
+    h, w = image.shape[:2]
+    if w <= width:
+        return image
+    return cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+class Refiner:
+    # Фоновое вычисление полного разрешения для одной сессии: в каждый
+    # момент актуально только последнее задание
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.key = None
+        self.future = None
+        self.submitted = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def request(self, key, compute):
+        # Ставит compute() в очередь, если key отличается от текущего задания
+        with self.lock:
+            if key == self.key:
+                return self.future
+            if self.future is not None and not self.future.done():
+                self.cancelled += self.future.cancel()
+            self.key = key
+            self.future = self.executor.submit(compute)
+            self.submitted += 1
+            return self.future
+
+    def _finished(self, key):
+        return key == self.key and self.future.done() and not self.future.cancelled()
+
+    def result(self, key):
+        # Результат задания key, если оно актуально и завершилось без ошибки, иначе None
+        with self.lock:
+            if not self._finished(key) or self.future.exception() is not None:
+                return None
+            return self.future.result()
+
+    def error(self, key):
+        with self.lock:
+            return self.future.exception() if self._finished(key) else None
+
+    def pending(self):
+        with self.lock:
+            return self.future is not None and not self.future.done()
+
+
+def make_executor(workers=REFINE_WORKERS):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refine")
@@ -0,0 +1,194 @@
+import functools
+import struct
+import zlib
+
+import cv2
+import numpy as np
+
+from adaptive import local_threshold
+from histogram import apply_thresholds, gray_histogram, histogram_thresholds
+
+# Обработка изображений без Streamlit: используется и приложением (main.py),
+# и пакетной обработкой каталогов (pipeline.py).
+# Изображения - массивы NumPy в RGB (или одноканальные), как в приложении.
+
+# Окно локальной пороговой обработки по умолчанию
+LOCAL_WINDOW = 31
+
+
+def decode_image(data):
+    # Байты файла -> RGB. OpenCV читает в формате BGR, поэтому конвертируем сразу
+    file_bytes = np.frombuffer(data, dtype=np.uint8)
+    image_bgr = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+    if image_bgr is None:
+        raise ValueError("не удалось декодировать изображение")
+    return cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+
+
+def encode_image(image, ext=".png"):
+    # RGB или одноканальное изображение -> байты файла формата ext
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    ok, encoded = cv2.imencode(ext, image)
+    if not ok:
+        raise ValueError(f"не удалось закодировать изображение в {ext}")
+    return encoded.tobytes()
+
+
+# Форматы результата для скачивания: расширение, MIME-тип, параметр качества
+# cv2.imencode и его значение по умолчанию. Форматы *_1bit - 1 бит на пиксель,
+# только для бинарных изображений (яркости 0 и 255)
+ENCODE_FORMATS = {
+    'png': ('.png', 'image/png', cv2.IMWRITE_PNG_COMPRESSION, 1),
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY, 95),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY, 90),
+    'png_1bit': ('.png', 'image/png', cv2.IMWRITE_PNG_COMPRESSION, 9),
+    'tiff_1bit': ('.tif', 'image/tiff', None, None),
+}
+
+
+def is_binary(image):
+    return image.ndim == 2 and not gray_histogram(image)[1:255].any()
+
+
+def bilevel_tiff(binary):
+    # Бинарное изображение -> TIFF 1 бит на пиксель (1 - белый), одна полоса
+    # со сжатием Deflate. cv2.imencode пишет TIFF только по 8 бит на пиксель
+    height, width = binary.shape
+    data = zlib.compress(np.packbits(binary > 0, axis=1).tobytes(), 6)
+    entries = [
+        (256, 4, width), (257, 4, height), (258, 3, 1), (259, 3, 8), (262, 3, 1),
+        (273, 4, None), (277, 3, 1), (278, 4, height), (279, 4, len(data)),
+    ]
+    data_offset = 8 + 2 + 12 * len(entries) + 4
+    header = bytearray(b'II' + struct.pack('<HI', 42, 8) + struct.pack('<H', len(entries)))
+    for tag, kind, value in entries:
+        if tag == 273:
+            value = data_offset
+        header += struct.pack('<HHIHH' if kind == 3 else '<HHII', tag, kind, 1, value, *([0] if kind == 3 else []))
+    header += struct.pack('<I', 0)
+    return bytes(header) + data
+
+
+def encode_result(image, fmt='png', quality=None):
+    # Результат -> байты файла формата fmt из ENCODE_FORMATS. quality -
+    # уровень сжатия PNG (0-9) или качество JPEG и WebP (1-100)
+    ext, _, flag, default = ENCODE_FORMATS[fmt]
+    if fmt.endswith('_1bit') and not is_binary(image):
+        raise ValueError("1 бит на пиксель - только для бинарного изображения")
+    if fmt == 'tiff_1bit':
+        return bilevel_tiff(image)
+    params = [flag, default if quality is None else int(quality)]
+    if fmt == 'png_1bit':
+        params += [cv2.IMWRITE_PNG_BILEVEL, 1]
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    ok, encoded = cv2.imencode(ext, image, params)
+    if not ok:
+        raise ValueError(f"не удалось закодировать изображение в {fmt}")
+    return encoded.tobytes()
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+
+def threshold_gray(gray_image, threshold_value, method_otsu):
+    threshold_type = cv2.THRESH_BINARY
+    if method_otsu:
+        threshold_type |= cv2.THRESH_OTSU
+
+    otsu_thresh_val, result_image = cv2.threshold(gray_image, threshold_value, 255, threshold_type)
+
+    return result_image, int(otsu_thresh_val)
+
+
+def apply_threshold(image, threshold_value, method_otsu, local_method=None, window=LOCAL_WINDOW, k=None):
+    # local_method - один из adaptive.LOCAL_METHODS: порог по окну window
+    # вокруг каждого пикселя; единого порога тогда нет, вместо него None
+    if local_method is not None:
+        return local_threshold(to_gray(image), local_method, window, k), None
+    return threshold_gray(to_gray(image), threshold_value, method_otsu)
+
+
+def apply_histogram_threshold(image, method, classes=3, percentile=50.0):
+    # Пороги из histogram.py: method - один из HISTOGRAM_METHODS; возвращает
+    # изображение и кортеж порогов (несколько - для multi_otsu)
+    gray = to_gray(image)
+    thresholds = histogram_thresholds(gray_histogram(gray), method, classes, percentile)
+    return apply_thresholds(gray, thresholds), thresholds
+
+
+def blur_radius(radius):
+    # Ядро Гаусса должно быть нечётным
+    if radius % 2 == 0:
+        radius += 1
+    return radius
+
+
+def gaussian_blur(image, radius):
+    radius = blur_radius(radius)
+    return cv2.GaussianBlur(image, (radius, radius), 0)
+
+
+def unsharp_combine(image, blurred, amount):
+    # Result = Original + amount * (Original - Blurred)
+    return cv2.addWeighted(image, 1.0 + amount, blurred, -amount, 0)
+
+
+def apply_unsharp_masking(image, radius, amount):
+    return unsharp_combine(image, gaussian_blur(image, radius), amount)
+
+
+# Точность размытой копии в unsharp_mask: тип буфера и масштаб значений.
+# uint8 - как в apply_unsharp_masking, uint16 - 8 дробных бит, float32 - без округления
+PRECISIONS = {'uint8': (np.uint8, 1), 'uint16': (np.uint16, 256), 'float32': (np.float32, 1)}
+
+_CV_DEPTHS = {np.dtype(np.uint8): cv2.CV_8U, np.dtype(np.uint16): cv2.CV_16U, np.dtype(np.float32): cv2.CV_32F}
+
+
+@functools.lru_cache(maxsize=None)
+def gaussian_kernel(radius):
+    # Одномерное ядро Гаусса - одно на строки, столбцы и все каналы
+    return cv2.getGaussianKernel(blur_radius(radius), 0)
+
+
+def _small_difference(image, blurred, threshold, scale):
+    # Маска пикселей, которые отличаются от размытых меньше чем на threshold
+    if blurred.dtype == image.dtype:
+        return cv2.absdiff(image, blurred) < threshold
+    diff = cv2.addWeighted(image, scale, blurred, -1.0, 0, dtype=cv2.CV_32F)
+    return np.abs(diff, out=diff) < threshold * scale
+
+
+def unsharp_mask(image, radius, amount, threshold=0, precision='uint8', out=None, scratch=None):
+    # Нерезкое маскирование за два прохода по кадру: размытие в scratch и
+    # смешивание Original + amount * (Original - Blurred) сразу в out.
+    #
+    # threshold - порог шума: пиксели, отличающиеся от размытых меньше чем
+    # на threshold, остаются как есть. out может быть самим image (на месте)
+    # или буфером другого типа (uint8, uint16, float32); scratch - буфер
+    # размытой копии для повторного использования между кадрами. Каналы
+    # размываются вместе, одним проходом разделимого фильтра.
+    work, scale = PRECISIONS[precision]
+    if scratch is None:
+        scratch = np.empty(image.shape, dtype=work)
+    if precision == 'uint8':
+        # Та же свёртка, что в gaussian_blur, поэтому без порога результат
+        # совпадает с apply_unsharp_masking
+        k = blur_radius(radius)
+        cv2.GaussianBlur(image, (k, k), 0, dst=scratch)
+    else:
+        kernel = gaussian_kernel(radius)
+        cv2.sepFilter2D(image, _CV_DEPTHS[np.dtype(work)], kernel * scale, kernel, dst=scratch)
+
+    if threshold > 0:
+        # Там, где разница мала, размытая копия заменяется оригиналом -
+        # тогда смешивание оставляет пиксель без изменений
+        small = _small_difference(image, scratch, threshold, scale)
+        np.multiply(image, work(scale), out=scratch, where=small, casting='unsafe')
+
+    if out is None:
+        out = np.empty(image.shape, dtype=image.dtype)
+    cv2.addWeighted(image, 1.0 + amount, scratch, -amount / scale, 0, dst=out, dtype=_CV_DEPTHS[out.dtype])
+    return out
@@ -0,0 +1,340 @@
+import argparse
+import collections
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from adaptive import LOCAL_METHODS, local_threshold
+from histogram import HISTOGRAM_METHODS, apply_thresholds, gray_histogram, histogram_thresholds
+from pipeline import iter_images
+from processing import LOCAL_WINDOW, PRECISIONS, unsharp_mask
+
+# Потоковая обработка видео и последовательностей кадров.
+#
+# Кадры читаются из видео (cv2.VideoCapture) или каталога изображений в
+# отдельном потоке с упреждением (--prefetch кадров), обрабатываются в
+# пуле потоков (OpenCV отпускает GIL) и пишутся в порядке номеров в видео
+# (cv2.VideoWriter) или каталог PNG. Как и в pipeline.py, в работе не
+# больше --queue-depth кадров: когда очередь заполнена, ждём самый старый.
+#
+# Кадры, результаты и размытые копии берутся из пулов буферов и
+# возвращаются в них после записи, поэтому в установившемся режиме кадры
+# не выделяют память заново. Кадры остаются в BGR, как их отдаёт OpenCV:
+# резкость от порядка каналов не зависит, а для порога серый кадр
+# получается сразу из BGR.
+#
+#   python stream.py input.mp4 output.mp4 --operation sharpen --radius 7
+#   python stream.py frames/ output.avi --operation threshold --otsu --fps 30 --report stream.json
+
+VIDEO_EXTENSIONS = {'.mp4': 'mp4v', '.avi': 'MJPG', '.mkv': 'XVID', '.mov': 'mp4v'}
+
+STAGES = ('read_ms', 'wait_ms', 'process_ms', 'write_ms', 'latency_ms')
+
+# Как часто печатать текущую скорость, секунд
+PROGRESS_SECONDS = 2.0
+
+
+class BufferPool:
+    # Переиспользуемые массивы: get() отдаёт свободный буфер нужной формы
+    # или создаёт новый, пока их не больше capacity, иначе ждёт put()
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.free = queue.Queue()
+        self.allocated = 0
+        self.lock = threading.Lock()
+
+    def get(self, shape, dtype=np.uint8):
+        with self.lock:
+            if self.free.empty() and self.allocated < self.capacity:
+                self.allocated += 1
+                return np.empty(shape, dtype=dtype)
+        buf = self.free.get()
+        if buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+        return buf
+
+    def put(self, buf):
+        self.free.put(buf)
+
+
+def video_frames(path, pool):
+    # Кадры видео; начиная со второго, cv2 декодирует прямо в буфер из пула
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"не удалось открыть видео {path}")
+    try:
+        shape = None
+        while True:
+            buf = pool.get(shape) if shape is not None else None
+            ok, frame = capture.read(buf)
+            if not ok:
+                if buf is not None:
+                    pool.put(buf)
+                return
+            shape = frame.shape
+            yield frame
+    finally:
+        capture.release()
+
+
+def directory_frames(path):
+    for image_path in iter_images(path):
+        frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"не удалось прочитать {image_path}")
+        yield frame
+
+
+def source_fps(path):
+    if os.path.isdir(path):
+        return None
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    capture.release()
+    return fps or None
+
+
+def prefetch(frames, depth):
+    # Чтение в отдельном потоке: очередь (номер, кадр, время чтения) длиной depth
+    items = queue.Queue(maxsize=depth)
+    done = object()
+
+    def reader():
+        try:
+            index = 0
+            while True:
+                start_time = time.perf_counter()
+                frame = next(frames, None)
+                if frame is None:
+                    break
+                items.put((index, frame, time.perf_counter() - start_time, start_time))
+                index += 1
+            items.put(done)
+        except Exception as e:
+            items.put(e)
+
+    threading.Thread(target=reader, name="prefetch", daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class FrameProcessor:
+    # Обработка одного кадра в буфер out. Размытые копии и серые кадры
+    # живут в буферах своего потока и переиспользуются между кадрами
+
+    def __init__(self, options):
+        self.options = options
+        self.local = threading.local()
+
+    def output_shape(self, frame):
+        return frame.shape if self.options['operation'] == 'sharpen' else frame.shape[:2]
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        buf = getattr(self.local, name, None)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            setattr(self.local, name, buf)
+        return buf
+
+    def __call__(self, frame, out):
+        o = self.options
+        if o['operation'] == 'sharpen':
+            work = PRECISIONS[o['precision']][0]
+            scratch = self._buffer('scratch', frame.shape, work)
+            return unsharp_mask(frame, o['radius'], o['amount'], o['noise_threshold'], o['precision'],
+                                out=out, scratch=scratch)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._buffer('gray', frame.shape[:2]))
+        if o['local']:
+            out[...] = local_threshold(gray, o['local'], o['window'], o['k'])
+            return out
+        if o['histogram'] or o['otsu']:
+            # Порог по гистограмме своего кадра
+            thresholds = histogram_thresholds(gray_histogram(gray), o['histogram'] or 'otsu',
+                                              o['classes'], o['percentile'])
+        else:
+            thresholds = (o['threshold'],)
+        return apply_thresholds(gray, thresholds, out=out)
+
+
+class FrameWriter:
+    # Видео (по расширению) или каталог PNG-кадров
+
+    def __init__(self, path, fps, codec=None):
+        self.path = path
+        self.fps = fps
+        ext = os.path.splitext(path)[1].lower()
+        self.codec = codec or VIDEO_EXTENSIONS.get(ext)
+        self.video = None
+        self.size = None
+        self.count = 0
+        if self.codec is None:
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, frame):
+        if self.codec is None:
+            cv2.imwrite(os.path.join(self.path, f"frame_{self.count:06d}.png"), frame)
+        else:
+            if self.video is None:
+                self.size = (frame.shape[1], frame.shape[0])
+                self.video = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec), self.fps,
+                                             self.size, frame.ndim == 3)
+                if not self.video.isOpened():
+                    raise ValueError(f"не удалось открыть {self.path} для записи ({self.codec})")
+            if (frame.shape[1], frame.shape[0]) != self.size:
+                # Кадры последовательности разного размера приводятся к первому
+                frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            self.video.write(frame)
+        self.count += 1
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+
+
+def run_stream(frames, process, write, workers=None, queue_depth=None, prefetch_depth=None, on_frame=None):
+    # Генератор строк статистики по кадрам в исходном порядке
+    workers = workers or os.cpu_count() or 1
+    queue_depth = queue_depth or 2 * workers
+    prefetch_depth = prefetch_depth or queue_depth
+    # Буферов результата хватает на все кадры в работе плюс записываемый
+    out_pool = BufferPool(queue_depth + 1)
+
+    def task(frame, queued_at):
+        start_time = time.perf_counter()
+        out = out_pool.get(process.output_shape(frame))
+        result = process(frame, out)
+        return result, start_time - queued_at, time.perf_counter() - start_time
+
+    in_flight = collections.deque()
+
+    def finish():
+        index, frame, read_time, read_start, future = in_flight.popleft()
+        result, wait_time, process_time = future.result()
+        if on_frame is not None:
+            on_frame(frame)
+        start_time = time.perf_counter()
+        write(result)
+        end_time = time.perf_counter()
+        out_pool.put(result)
+        return {
+            'frame': index, 'read_ms': read_time * 1000, 'wait_ms': wait_time * 1000,
+            'process_ms': process_time * 1000, 'write_ms': (end_time - start_time) * 1000,
+            'latency_ms': (end_time - read_start) * 1000, 'done': end_time,
+        }
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") as pool:
+        for index, frame, read_time, read_start in prefetch(frames, prefetch_depth):
+            if len(in_flight) >= queue_depth:
+                yield finish()
+            future = pool.submit(task, frame, time.perf_counter())
+            in_flight.append((index, frame, read_time, read_start, future))
+        while in_flight:
+            yield finish()
+
+
+def summarize(rows, elapsed):
+    summary = {'frames': len(rows), 'seconds': elapsed, 'fps': len(rows) / elapsed if elapsed > 0 else 0.0}
+    # Установившаяся скорость - без разгона конвейера до первого записанного кадра
+    if len(rows) > 1:
+        span = rows[-1]['done'] - rows[0]['done']
+        summary['sustained_fps'] = (len(rows) - 1) / span if span > 0 else 0.0
+    for stage in STAGES:
+        values = np.array([row[stage] for row in rows]) if rows else np.zeros(1)
+        summary[stage] = {
+            'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'max': float(values.max()),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пороговая обработка и резкость видео и последовательностей кадров")
+    parser.add_argument('input', help="видеофайл или каталог с кадрами")
+    parser.add_argument('output', help="видео (.mp4, .avi, .mkv, .mov) или каталог для PNG-кадров")
+    parser.add_argument('--operation', choices=('threshold', 'sharpen'), default='threshold')
+    parser.add_argument('--threshold', type=int, default=127, help="ручной порог 0..255")
+    parser.add_argument('--otsu', action='store_true', help="порог по методу Оцу для каждого кадра")
+    parser.add_argument('--histogram', choices=HISTOGRAM_METHODS, help="порог по гистограмме каждого кадра")
+    parser.add_argument('--classes', type=int, default=3, help="число классов для --histogram multi_otsu (2-4)")
+    parser.add_argument('--percentile', type=float, default=50.0, help="доля тёмных пикселей для --histogram percentile")
+    parser.add_argument('--local', choices=LOCAL_METHODS, help="локальный порог вместо глобального")
+    parser.add_argument('--window', type=int, default=LOCAL_WINDOW, help="окно локального порога")
+    parser.add_argument('--k', type=float, default=None, help="параметр локального метода")
+    parser.add_argument('--radius', type=int, default=5, help="радиус размытия для резкости")
+    parser.add_argument('--amount', type=float, default=1.5, help="сила эффекта резкости")
+    parser.add_argument('--noise-threshold', type=int, default=0, help="порог шума для резкости")
+    parser.add_argument('--precision', choices=tuple(PRECISIONS), default='uint8', help="точность размытой копии")
+    parser.add_argument('--fps', type=float, default=None, help="частота кадров результата (по умолчанию как у видео или 25)")
+    parser.add_argument('--codec', default=None, help="FourCC кодека (по умолчанию по расширению)")
+    parser.add_argument('--workers', type=int, default=None, help="число потоков обработки (по умолчанию - по числу ядер)")
+    parser.add_argument('--queue-depth', type=int, default=None,
+                        help="кадров в обработке одновременно (по умолчанию 2 x потоков)")
+    parser.add_argument('--prefetch', type=int, default=None, help="кадров, прочитанных заранее (по умолчанию = --queue-depth)")
+    parser.add_argument('--report', help="файл отчёта .json со сводкой и временем по кадрам")
+    args = parser.parse_args(argv)
+
+    options = {
+        'operation': args.operation, 'threshold': args.threshold, 'otsu': args.otsu,
+        'histogram': args.histogram, 'classes': args.classes, 'percentile': args.percentile,
+        'local': args.local, 'window': args.window, 'k': args.k,
+        'radius': args.radius, 'amount': args.amount,
+        'noise_threshold': args.noise_threshold, 'precision': args.precision,
+    }
+    workers = args.workers or os.cpu_count() or 1
+    queue_depth = args.queue_depth or 2 * workers
+
+    if os.path.isdir(args.input):
+        frames, in_pool = directory_frames(args.input), None
+    else:
+        # Входных буферов хватает на упреждение, кадры в работе и записываемый
+        in_pool = BufferPool((args.prefetch or queue_depth) + queue_depth + 2)
+        frames = video_frames(args.input, in_pool)
+    fps = args.fps or source_fps(args.input) or 25.0
+    writer = FrameWriter(args.output, fps, args.codec)
+
+    rows = []
+    start_time = last_report = time.perf_counter()
+    try:
+        for row in run_stream(frames, FrameProcessor(options), writer.write, workers, queue_depth, args.prefetch,
+                              on_frame=in_pool.put if in_pool is not None else None):
+            rows.append(row)
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_SECONDS:
+                last_report = now
+                print(f"Кадров: {len(rows)}, {len(rows) / (now - start_time):.1f} кадр/с", file=sys.stderr)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start_time
+
+    summary = summarize(rows, elapsed)
+    for row in rows:
+        row['done'] -= start_time
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'frames': rows}, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+    print(f"Кадров: {summary['frames']} за {elapsed:.2f} с, {summary['fps']:.1f} кадр/с"
+          f" (установившаяся {summary.get('sustained_fps', 0.0):.1f})", file=sys.stderr)
+    for stage in STAGES:
+        s = summary[stage]
+        print(f"  {stage[:-3]:8s} p50 {s['p50']:7.2f} мс, p95 {s['p95']:7.2f} мс, max {s['max']:7.2f} мс",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
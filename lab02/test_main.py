@@ -0,0 +1,79 @@
+import glob
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from histogram import HISTOGRAM_METHODS
+from processing import apply_histogram_threshold, decode_image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _app(image):
+    at = AppTest.from_file(os.path.join(HERE, 'main.py'), default_timeout=60)
+    at.session_state['original_image'] = image
+    at.session_state['processed_image'] = image
+    at.session_state['source_key'] = 'test'
+    at.session_state['processed_key'] = ('decode', 'test')
+    return at.run()
+
+
+def _wait_full(at, timeout=30):
+    # Перезапуски, пока фоновое задание не посчитает полное разрешение
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if any(c.value.startswith("Полное разрешение") for c in at.caption):
+            return at
+        time.sleep(0.1)
+        at.run()
+    raise AssertionError("полное разрешение не посчитано")
+
+
+def test_live_histogram_method_switch():
+    # Смена метода по гистограмме в живом режиме показывает новые пороги
+    with open(sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))[0], 'rb') as f:
+        image = decode_image(f.read())
+    at = _app(image)
+    at.sidebar.radio[0].set_value("По гистограмме").run()
+    at.toggle[0].set_value(True).run()
+    for method in HISTOGRAM_METHODS[1:]:
+        at.sidebar.selectbox[0].set_value(method).run()
+        _wait_full(at)
+        assert not at.exception
+        expected, thresholds = apply_histogram_threshold(image, method)
+        assert at.info[0].value == f"Вычисленные пороги: **{', '.join(map(str, thresholds))}**"
+        assert (at.session_state['processed_image'] == expected).all()
+
+
+def _encoded_counts(at):
+    # Кэш общий для процесса, поэтому сравниваются приращения счётчиков
+    stats = at.sidebar.table[0].value
+    if 'encoded' not in stats:
+        return 0, 0
+    return stats.loc['hits', 'encoded'], stats.loc['misses', 'encoded']
+
+
+def test_download_encoded_on_demand():
+    # Файл кодируется только по кнопке «Подготовить файл»
+    with open(sorted(glob.glob(os.path.join(HERE, 'test_images', '*')))[0], 'rb') as f:
+        image = decode_image(f.read())
+    at = _app(image)
+    hits, misses = _encoded_counts(at)
+    at.selectbox(key="download_format").set_value('jpeg').run()
+    at.run()
+    assert not at.exception
+    assert len(at.get('download_button')) == 0
+    assert _encoded_counts(at) == (hits, misses)
+
+    at.button(key="prepare_download").click().run()
+    assert not at.exception
+    assert len(at.get('download_button')) == 1
+    assert _encoded_counts(at) == (hits, misses + 1)
+    at.run()
+    assert len(at.get('download_button')) == 1
+    assert _encoded_counts(at) == (hits, misses + 1)
+
+    # Другой формат - файл снова готовится по кнопке
+    at.selectbox(key="download_format").set_value('png').run()
+    assert len(at.get('download_button')) == 0
@@ -0,0 +1,267 @@
+import argparse
+import collections
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from histogram import gray_histogram, otsu_threshold
+from processing import blur_radius, gaussian_blur, threshold_gray, to_gray, unsharp_combine
+
+# Обработка изображений, которые не помещаются в память, по плиткам.
+#
+# Вход и выход - массивы, отображённые в память (np.memmap): .npy, сырой
+# файл с заданными размерами или несжатый TIFF. Изображение делится на
+# плитки tile x tile; каждая плитка читается с запасом в половину ядра
+# размытия, обрабатывается теми же функциями, что и в processing.py, и её
+# внутренняя часть сразу пишется в выходной файл. На границе изображения
+# запаса нет, и GaussianBlur отражает плитку так же, как всё изображение,
+# поэтому результат совпадает с обработкой в памяти бит в бит.
+#
+# Плитки обрабатываются в потоках (OpenCV отпускает GIL); в работе
+# одновременно не больше queue_depth плиток, так что память ограничена
+# размером плитки, а не изображения. Порог Оцу требует гистограммы всего
+# изображения, поэтому для него два прохода: серое изображение с
+# гистограммами плиток, затем порог по сумме гистограмм прямо в выходном файле.
+#
+#   python tiles.py scan.tif out.tif --operation sharpen --radius 9
+#   python tiles.py scan.raw out.npy --shape 40000 30000 3 --operation threshold --otsu
+
+TILE_SIZE = 1024
+
+# Несжатый TIFF (baseline): теги, которые читаются и пишутся
+_TIFF_TAGS = {
+    'width': 256, 'height': 257, 'bits': 258, 'compression': 259, 'photometric': 262,
+    'strip_offsets': 273, 'samples': 277, 'rows_per_strip': 278, 'strip_counts': 279, 'planar': 284,
+}
+_TIFF_TYPES = {3: 'H', 4: 'I'}
+
+
+def _tiff_tags(f):
+    byte_order = f.read(2)
+    if byte_order not in (b'II', b'MM'):
+        raise ValueError("не TIFF")
+    endian = '<' if byte_order == b'II' else '>'
+    magic, ifd = struct.unpack(endian + 'HI', f.read(6))
+    if magic != 42:
+        raise ValueError("поддерживается только классический TIFF (не BigTIFF)")
+    f.seek(ifd)
+    (count,) = struct.unpack(endian + 'H', f.read(2))
+    entries = [struct.unpack(endian + 'HHII', f.read(12)) for _ in range(count)]
+    tags = {}
+    for tag, kind, n, value in entries:
+        if kind not in _TIFF_TYPES:
+            continue
+        fmt = endian + _TIFF_TYPES[kind] * n
+        size = struct.calcsize(fmt)
+        if size <= 4:
+            raw = struct.pack(endian + 'I', value)[:size]
+        else:
+            f.seek(value)
+            raw = f.read(size)
+        tags[tag] = struct.unpack(fmt, raw)
+    return endian, tags
+
+
+def tiff_memmap(path):
+    # Несжатый TIFF с полосами, лежащими подряд, как массив (H, W) или (H, W, C)
+    with open(path, 'rb') as f:
+        endian, tags = _tiff_tags(f)
+    t = {name: tags.get(tag) for name, tag in _TIFF_TAGS.items()}
+    if 322 in tags:
+        raise ValueError("TIFF с внутренними плитками не поддерживается, нужен TIFF с полосами")
+    if (t['compression'] or (1,))[0] != 1 or (t['planar'] or (1,))[0] != 1:
+        raise ValueError("поддерживается только несжатый TIFF с чередованием каналов")
+    bits = set(t['bits'] or (1,))
+    if len(bits) != 1 or bits - {8, 16}:
+        raise ValueError("поддерживаются только 8 и 16 бит на канал")
+    offsets, counts = t['strip_offsets'], t['strip_counts']
+    if any(o + c != n for o, c, n in zip(offsets, counts, offsets[1:])):
+        raise ValueError("полосы TIFF лежат не подряд")
+    height, width = t['height'][0], t['width'][0]
+    samples = (t['samples'] or (1,))[0]
+    dtype = np.dtype(endian + ('u1' if bits == {8} else 'u2'))
+    shape = (height, width) if samples == 1 else (height, width, samples)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offsets[0], shape=shape)
+
+
+def create_tiff(path, shape, dtype=np.uint8):
+    # Несжатый TIFF одной полосой; возвращает memmap для записи данных
+    dtype = np.dtype(dtype).newbyteorder('<')
+    height, width = shape[:2]
+    samples = shape[2] if len(shape) == 3 else 1
+    data_size = height * width * samples * dtype.itemsize
+    entries = [
+        (256, 4, 1, width), (257, 4, 1, height), (258, 3, samples, None), (259, 3, 1, 1),
+        (262, 3, 1, 2 if samples >= 3 else 1), (273, 4, 1, None), (277, 3, 1, samples),
+        (278, 4, 1, height), (279, 4, 1, data_size), (284, 3, 1, 1),
+    ]
+    ifd_size = 2 + 12 * len(entries) + 4
+    bits_offset = 8 + ifd_size
+    data_offset = bits_offset + 2 * samples
+    data_offset += data_offset % 2
+    if data_offset + data_size >= 2 ** 32:
+        raise ValueError("изображение больше 4 ГБ не помещается в TIFF, используйте .npy")
+
+    header = bytearray(b'II' + struct.pack('<HI', 42, 8) + struct.pack('<H', len(entries)))
+    for tag, kind, count, value in entries:
+        if tag == 258:
+            value = (8 * dtype.itemsize) if samples == 1 else bits_offset
+        elif tag == 273:
+            value = data_offset
+        if kind == 3 and count == 1:
+            header += struct.pack('<HHIHH', tag, kind, count, value, 0)
+        else:
+            header += struct.pack('<HHII', tag, kind, count, value)
+    header += struct.pack('<I', 0)
+    if samples > 1:
+        header += struct.pack('<' + 'H' * samples, *[8 * dtype.itemsize] * samples)
+    header += b'\0' * (data_offset - len(header))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(data_offset + data_size)
+    return np.memmap(path, dtype=dtype, mode='r+', offset=data_offset, shape=tuple(shape))
+
+
+def open_image(path, shape=None, dtype=np.uint8):
+    # Изображение из файла без чтения в память
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+    if ext in ('.tif', '.tiff'):
+        return tiff_memmap(path)
+    if shape is None:
+        raise ValueError("для сырого файла нужно указать размеры (--shape)")
+    return np.memmap(path, dtype=dtype, mode='r', shape=tuple(shape))
+
+
+def create_image(path, shape, dtype=np.uint8):
+    # Выходной файл того же вида, что open_image, открытый на запись
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    if ext in ('.tif', '.tiff'):
+        return create_tiff(path, shape, dtype)
+    return np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+
+
+def tile_grid(height, width, tile=TILE_SIZE):
+    # Прямоугольники плиток (x0, y0, x1, y1) построчно
+    return [
+        (x0, y0, min(x0 + tile, width), min(y0 + tile, height))
+        for y0 in range(0, height, tile)
+        for x0 in range(0, width, tile)
+    ]
+
+
+def run_tiles(process_tile, rects, workers=None, queue_depth=None):
+    # process_tile(rect) для всех плиток в потоках; результаты в порядке rects
+    workers = workers or os.cpu_count() or 1
+    queue_depth = queue_depth or 2 * workers
+    in_flight = collections.deque()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rect in rects:
+            if len(in_flight) >= queue_depth:
+                results.append(in_flight.popleft().result())
+            in_flight.append(pool.submit(process_tile, rect))
+        while in_flight:
+            results.append(in_flight.popleft().result())
+    return results
+
+
+def tiled_threshold(src, dst, threshold_value, method_otsu, tile=TILE_SIZE, workers=None):
+    # Пороговая обработка src (H, W, 3) в dst (H, W); возвращает использованный порог
+    rects = tile_grid(*src.shape[:2], tile)
+    if not method_otsu:
+        def process_tile(rect):
+            x0, y0, x1, y1 = rect
+            dst[y0:y1, x0:x1] = threshold_gray(to_gray(np.asarray(src[y0:y1, x0:x1])), threshold_value, False)[0]
+
+        run_tiles(process_tile, rects, workers)
+        return threshold_value
+
+    # Проход 1: серое изображение в dst и гистограммы плиток
+    def gray_tile(rect):
+        x0, y0, x1, y1 = rect
+        gray = to_gray(np.asarray(src[y0:y1, x0:x1]))
+        dst[y0:y1, x0:x1] = gray
+        return gray_histogram(gray)
+
+    # Проход 2: порог по гистограмме всего изображения на месте
+    def threshold_tile(rect):
+        x0, y0, x1, y1 = rect
+        dst[y0:y1, x0:x1] = threshold_gray(np.asarray(dst[y0:y1, x0:x1]), used, False)[0]
+
+    used = otsu_threshold(sum(run_tiles(gray_tile, rects, workers)))
+    run_tiles(threshold_tile, rects, workers)
+    return used
+
+
+def tiled_unsharp_masking(src, dst, radius, amount, tile=TILE_SIZE, workers=None):
+    # Нерезкое маскирование src в dst; плитка читается с запасом pad
+    # со всех сторон, в dst пишется только её внутренняя часть
+    height, width = src.shape[:2]
+    pad = blur_radius(radius) // 2
+
+    def process_tile(rect):
+        x0, y0, x1, y1 = rect
+        px0, py0 = max(x0 - pad, 0), max(y0 - pad, 0)
+        px1, py1 = min(x1 + pad, width), min(y1 + pad, height)
+        padded = np.asarray(src[py0:py1, px0:px1])
+        result = unsharp_combine(padded, gaussian_blur(padded, radius), amount)
+        dst[y0:y1, x0:x1] = result[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+
+    run_tiles(process_tile, tile_grid(height, width, tile), workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пороговая обработка и резкость больших изображений по плиткам")
+    parser.add_argument('input', help="входной файл: .npy, несжатый .tif или сырой (с --shape)")
+    parser.add_argument('output', help="выходной файл: .npy, .tif или сырой")
+    parser.add_argument('--shape', type=int, nargs='+', help="размеры сырого входа: H W [C]")
+    parser.add_argument('--dtype', default='uint8', help="тип пикселей сырого входа")
+    parser.add_argument('--operation', choices=('threshold', 'sharpen'), default='threshold')
+    parser.add_argument('--threshold', type=int, default=127, help="ручной порог 0..255")
+    parser.add_argument('--otsu', action='store_true', help="порог по методу Оцу")
+    parser.add_argument('--radius', type=int, default=5, help="радиус размытия для резкости")
+    parser.add_argument('--amount', type=float, default=1.5, help="сила эффекта резкости")
+    parser.add_argument('--tile', type=int, default=TILE_SIZE, help="размер плитки")
+    parser.add_argument('--workers', type=int, default=None, help="число потоков (по умолчанию - по числу ядер)")
+    parser.add_argument('--verify', action='store_true',
+                        help="сравнить с обработкой в памяти (только для изображений, которые в неё помещаются)")
+    args = parser.parse_args(argv)
+
+    src = open_image(args.input, args.shape, args.dtype)
+    start_time = time.perf_counter()
+    if args.operation == 'threshold':
+        dst = create_image(args.output, src.shape[:2], np.uint8)
+        used = tiled_threshold(src, dst, args.threshold, args.otsu, args.tile, args.workers)
+        print(f"Порог: {used}", file=sys.stderr)
+    else:
+        dst = create_image(args.output, src.shape, src.dtype)
+        tiled_unsharp_masking(src, dst, args.radius, args.amount, args.tile, args.workers)
+    dst.flush()
+    elapsed = time.perf_counter() - start_time
+    print(f"{src.shape[1]}x{src.shape[0]} за {elapsed:.2f} с, "
+          f"{src.shape[0] * src.shape[1] / 1e6 / elapsed:.1f} Мпикс/с", file=sys.stderr)
+
+    if args.verify:
+        from processing import apply_threshold, apply_unsharp_masking
+
+        image = np.asarray(src)
+        if args.operation == 'threshold':
+            expected = apply_threshold(image, args.threshold, args.otsu)[0]
+        else:
+            expected = apply_unsharp_masking(image, args.radius, args.amount)
+        same = np.array_equal(np.asarray(dst), expected)
+        print(f"Совпадение с обработкой в памяти: {same}", file=sys.stderr)
+        return 0 if same else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+from fill import filled_circle, filled_ellipse, midpoint_ellipse, scanline_polygon_fill
+from wu import wu_fixed_point_line
+
+
+def step_by_step_line(x1, y1, x2, y2, tracer=None):
+    pixels = []
+    if x1 == x2:
+        for y in range(min(y1, y2), max(y1, y2) + 1):
+            if tracer is not None:
+                tracer.step(x=x1, y=y)
+                tracer.pixel(x1, y)
+            pixels.append((x1, y))
+        return pixels
+
+    if x1 > x2:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+
+    dx = x2 - x1
+    dy = y2 - y1
+    m = dy / dx
+
+    if abs(dx) >= abs(dy):
+        for x in range(x1, x2 + 1):
+            y = int(round(y1 + m * (x - x1)))
+            if tracer is not None:
+                tracer.step(x=x, y=y)
+                tracer.pixel(x, y)
+            pixels.append((x, y))
+    else:
+        if y1 > y2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        m_inv = dx / dy
+        for y in range(y1, y2 + 1):
+            x = int(round(x1 + m_inv * (y - y1)))
+            if tracer is not None:
+                tracer.step(x=x, y=y)
+                tracer.pixel(x, y)
+            pixels.append((x, y))
+    return pixels
+
+
+def dda_line(x1, y1, x2, y2, tracer=None):
+    pixels = []
+    dx = x2 - x1
+    dy = y2 - y1
+
+    steps = max(abs(dx), abs(dy))
+
+    if steps == 0:
+        if tracer is not None:
+            tracer.pixel(x1, y1)
+        return [(x1, y1)]
+
+    x_increment = dx / steps
+    y_increment = dy / steps
+
+    x, y = float(x1), float(y1)
+    for _ in range(steps + 1):
+        if tracer is not None:
+            tracer.step(x=x, y=y)
+        pixels.append((round(x), round(y)))
+        x += x_increment
+        y += y_increment
+
+    unique_points = []
+    seen = set()
+    for p in pixels:
+        if p not in seen:
+            if tracer is not None:
+                tracer.pixel(*p)
+            unique_points.append(p)
+            seen.add(p)
+
+    return unique_points
+
+
+def bresenham_line(x0, y0, x1, y1, tracer=None):
+    points = []
+
+    # Разница по осям
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+
+    # Направление шага
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+
+    # Начальная ошибка
+    err = dx + dy
+
+    x, y = x0, y0
+
+    while True:
+        if tracer is not None:
+            tracer.step(x=x, y=y, err=err)
+            tracer.pixel(x, y)
+        points.append((x, y))
+
+        # Проверяем, достигли ли мы конечной точки
+        if x == x1 and y == y1:
+            break
+
+        # Удвоенное значение ошибки для проверки
+        e2 = 2 * err
+
+        # Корректировка ошибки и шаг по X
+        if e2 >= dy:
+            if x == x1: break # Предотвращает выход за пределы
+            err += dy
+            x += sx
+            if tracer is not None:
+                tracer.error_update(err)
+
+        # Корректировка ошибки и шаг по Y
+        if e2 <= dx:
+            if y == y1: break # Предотвращает выход за пределы
+            err += dx
+            y += sy
+            if tracer is not None:
+                tracer.error_update(err)
+
+    return points
+
+
+def bresenham_circle(xc, yc, r, tracer=None):
+    pixels_set = set()
+    x, y = 0, r
+    d = 3 - 2 * r
+
+    def add_symmetric_pixels(cx, cy, dx, dy):
+        pixels_set.add((cx + dx, cy + dy)); pixels_set.add((cx - dx, cy + dy))
+        pixels_set.add((cx + dx, cy - dy)); pixels_set.add((cx - dx, cy - dy))
+        pixels_set.add((cx + dy, cy + dx)); pixels_set.add((cx - dy, cy + dx))
+        pixels_set.add((cx + dy, cy - dx)); pixels_set.add((cx - dy, cy - dx))
+
+    while x <= y:
+        if tracer is not None:
+            tracer.step(x=x, y=y, d=d)
+        add_symmetric_pixels(xc, yc, x, y)
+        if d < 0:
+            d = d + 4 * x + 6
+        else:
+            d = d + 4 * (x - y) + 10
+            y -= 1
+        if tracer is not None:
+            tracer.error_update(d)
+        x += 1
+
+    pixels = list(pixels_set)
+    if tracer is not None:
+        for p in pixels:
+            tracer.pixel(*p)
+    return pixels
+
+def castle_pitteway(x1, y1, x2, y2, tracer=None):
+    dx_total = abs(x2 - x1)
+    dy_total = abs(y2 - y1)
+
+    swapped = False
+    if dy_total > dx_total:
+        dx_total, dy_total = dy_total, dx_total # Меняем оси местами
+        swapped = True
+
+    a = dx_total
+    b = dy_total
+
+    # Шаг 2: Генерация строки движений по алгоритму со слайда 48
+    if b == 0:
+        # Горизонтальная/вертикальная линия
+        move_string = 's' * a
+    elif a == b:
+        # Идеально диагональная линия
+        move_string = 'd' * a
+    else:
+        # Общий случай из лекции
+        y = b
+        x = a - b
+        m1 = "s"
+        m2 = "d"
+        # Подряд идущие вычитания одного и того же числа объединяются в
+        # деление с остатком: строка повторяется q раз одним умножением,
+        # а не наращивается по одному символу (иначе для пологих отрезков
+        # копирование строк квадратично по длине)
+        while x != y:
+            if x > y:
+                q = (x - 1) // y
+                if tracer is not None:
+                    for k in range(1, q + 1):
+                        tracer.error_update((x - k * y, y))
+                x -= q * y
+                m2 = m1 * q + m2
+            else:
+                q = (y - 1) // x
+                if tracer is not None:
+                    for k in range(1, q + 1):
+                        tracer.error_update((x, y - k * x))
+                y -= q * x
+                m1 = m2 * q + m1
+        # После завершения цикла, x-кратная последовательность m2 + m1
+        move_string = (m2 + m1) * x
+
+    # Шаг 3: Преобразование строки движений в пиксели
+    pixels = []
+    curr_x, curr_y = x1, y1
+    if tracer is not None:
+        tracer.pixel(curr_x, curr_y)
+    pixels.append((curr_x, curr_y))
+
+    # Определяем направление движения
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+
+    for move in move_string:
+        if move == 'd':
+            # Диагональное смещение всегда по обеим осям
+            curr_x += sx
+            curr_y += sy
+        else: # move == 's'
+            # Прямое смещение зависит от того, меняли ли мы оси
+            if swapped:
+                curr_y += sy # Шаг 's' делается по доминирующей (теперь Y) оси
+            else:
+                curr_x += sx # Шаг 's' делается по доминирующей (X) оси
+        if tracer is not None:
+            tracer.step(x=curr_x, y=curr_y, move=move)
+            tracer.pixel(curr_x, curr_y)
+        pixels.append((curr_x, curr_y))
+
+    return pixels
+
+def wu_antialiasing_line(x1, y1, x2, y2, tracer=None):
+    pixels = []
+
+    # Функция для добавления пикселя с интенсивностью
+    def plot(x, y, intensity):
+        if tracer is not None:
+            tracer.pixel(int(x), int(y), intensity)
+        pixels.append((int(x), int(y), intensity))
+
+    dx = x2 - x1
+    dy = y2 - y1
+
+    # Проверяем, крутая ли линия (ось Y доминирует)
+    steep = abs(dy) > abs(dx)
+
+    if steep:
+        # Если крутая, меняем x и y местами
+        x1, y1, x2, y2 = y1, x1, y2, x2
+        dx, dy = dy, dx
+
+    if x1 > x2:
+        # Рисуем всегда слева направо
+        x1, x2, y1, y2 = x2, x1, y2, y1
+        dx, dy = -dx, -dy
+
+    gradient = dy / dx if dx != 0 else 1.0
+
+    # Обработка начальной точки
+    y = y1 + gradient
+    if steep:
+        # Концы тоже возвращаем в исходные оси
+        plot(y1, x1, 1.0)
+        plot(y2, x2, 1.0)
+    else:
+        plot(x1, y1, 1.0)
+        plot(x2, y2, 1.0)
+
+    # Основной цикл
+    for x in range(int(x1) + 1, int(x2)):
+        if tracer is not None:
+            tracer.step(x=x, y=y)
+
+        # y - дробная часть. Определяет интенсивность.
+        fractional_part = y - int(y)
+
+        # Два пикселя, между которыми проходит линия
+        p1_y, p2_y = int(y), int(y) + 1
+
+        # Интенсивность обратно пропорциональна расстоянию
+        intensity1 = 1 - fractional_part
+        intensity2 = fractional_part
+
+        if steep:
+            # Если оси были поменяны, рисуем (y, x) вместо (x, y)
+            plot(p1_y, x, intensity1)
+            plot(p2_y, x, intensity2)
+        else:
+            plot(x, p1_y, intensity1)
+            plot(x, p2_y, intensity2)
+
+        y += gradient
+        if tracer is not None:
+            tracer.error_update(y)
+
+    return pixels
+
+# Словарь с алгоритмами
+algorithms = {
+    'Пошаговый': step_by_step_line,
+    'ЦДА (DDA)': dda_line,
+    'Брезенхем (линия)': bresenham_line,
+    'Брезенхем (окружность)': bresenham_circle,
+    'Кастл-Питвей': castle_pitteway,
+    'Алгоритм Ву': wu_antialiasing_line,
+    'Алгоритм Ву (фиксированная точка)': wu_fixed_point_line,
+    'Брезенхем (закрашенная окружность)': filled_circle,
+    'Эллипс (средняя точка)': midpoint_ellipse,
+    'Эллипс (закрашенный)': filled_ellipse,
+    'Многоугольник (AET)': scanline_polygon_fill,
+}
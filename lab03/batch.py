@@ -0,0 +1,334 @@
+import numpy as np
+
+# Пакетная (векторизованная) растеризация отрезков.
+#
+# На вход подаётся массив (N, 4) с концами отрезков (x1, y1, x2, y2).
+# На выходе - упакованные координаты xs, ys и смещения offsets длины N + 1:
+# пиксели i-го отрезка лежат в xs[offsets[i]:offsets[i + 1]].
+# Состав и порядок пикселей совпадают со скалярными функциями из algorithms.py.
+
+# Ниже этого числа активных отрезков ЦДА досчитывает хвосты поотрезочно
+DDA_TAIL_SEGMENTS = 32
+
+
+def _as_segments(segments):
+    seg = np.asarray(segments, dtype=np.int64).reshape(-1, 4)
+    return seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3]
+
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def _pixel_index(offsets):
+    # Номер шага внутри своего отрезка для каждого выходного пикселя
+    counts = np.diff(offsets)
+    return np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1], counts)
+
+
+def line_axes(x1, y1, x2, y2):
+    # Длины по главной (a) и второй (b) осям, направления шагов и признак
+    # того, что главная ось - x
+    adx = np.abs(x2 - x1)
+    ady = np.abs(y2 - y1)
+    sx = np.where(x1 < x2, 1, -1)
+    sy = np.where(y1 < y2, 1, -1)
+    return np.maximum(adx, ady), np.minimum(adx, ady), sx, sy, adx >= ady
+
+
+def major_minor_to_xy(x1, y1, sx, sy, x_major, i, j):
+    # Перевод (шаг по главной оси i, смещение по второй оси j) в координаты
+    xs = x1 + sx * np.where(x_major, i, j)
+    ys = y1 + sy * np.where(x_major, j, i)
+    return xs, ys
+
+
+def bresenham_minor(a, b, i):
+    # Ошибка Брезенхема в замкнутой форме: смещение по второй оси равно
+    # i * b / a, округлённому до ближайшего целого (половина - вверх)
+    return (2 * b * i + a) // np.maximum(2 * a, 1)
+
+
+def castle_pitteway_minor(a, b, i):
+    # Строка ходов (m2 + m1) * x из алгоритма Евклида содержит на первых
+    # i ходах floor((i + 1) * b / a) диагональных шагов, последний ход - 's'
+    j = np.minimum((i + 1) * b // np.maximum(a, 1), b)
+    return np.where(a == b, i, j)
+
+
+def step_by_step_params(x1, y1, x2, y2):
+    # Как и в скалярной версии: рисуем слева направо
+    swap = x1 > x2
+    xa, ya = np.where(swap, x2, x1), np.where(swap, y2, y1)
+    xb, yb = np.where(swap, x1, x2), np.where(swap, y1, y2)
+    dx = xb - xa
+    dy = yb - ya
+
+    vertical = dx == 0
+    x_major = ~vertical & (np.abs(dx) >= np.abs(dy))
+
+    # Пологие отрезки: шаг по x от xa, y = round(ya + m * i).
+    # Крутые: скалярная версия ещё раз меняет концы местами, если y1 > y2,
+    # поэтому шаг по y идёт от min(y1, y2), а m_inv считается по dx, dy до
+    # перестановки. Вертикальные отрезки - частный случай крутых с m_inv = 0.
+    swap_y = ya > yb
+    major_base = np.where(x_major, xa, np.minimum(y1, y2))
+    minor_base = np.where(x_major, ya, np.where(swap_y, xb, xa)).astype(np.float64)
+    safe_dx = np.where(vertical, 1, dx)
+    safe_dy = np.where(dy == 0, 1, dy)
+    slope = np.where(x_major, dy / safe_dx, np.where(vertical, 0.0, dx / safe_dy))
+
+    counts = np.maximum(np.abs(dx), np.abs(dy)) + 1
+    return x_major, major_base, minor_base, slope, counts
+
+
+def step_by_step_pixels(x_major, major_base, minor_base, slope, i):
+    ramp = major_base + i
+    other = np.rint(minor_base + slope * i).astype(np.int64)
+    return np.where(x_major, ramp, other), np.where(x_major, other, ramp)
+
+
+def dda_params(x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    steps = np.maximum(np.abs(dx), np.abs(dy))
+    safe_steps = np.maximum(steps, 1)
+    return steps, dx / safe_steps, dy / safe_steps
+
+
+def step_by_step_line_batch(segments):
+    x1, y1, x2, y2 = _as_segments(segments)
+    x_major, major_base, minor_base, slope, counts = step_by_step_params(x1, y1, x2, y2)
+    offsets = _offsets(counts)
+    i = _pixel_index(offsets)
+
+    xs, ys = step_by_step_pixels(
+        np.repeat(x_major, counts), np.repeat(major_base, counts),
+        np.repeat(minor_base, counts), np.repeat(slope, counts), i,
+    )
+    return xs, ys, offsets
+
+
+def dda_line_batch(segments):
+    x1, y1, x2, y2 = _as_segments(segments)
+    steps, x_inc, y_inc = dda_params(x1, y1, x2, y2)
+
+    offsets = _offsets(steps + 1)
+    xs = np.empty(offsets[-1], dtype=np.int64)
+    ys = np.empty(offsets[-1], dtype=np.int64)
+    if len(steps) == 0:
+        return xs, ys, offsets
+
+    # Координаты в скалярной версии накапливаются сложением, поэтому для
+    # точного совпадения округлений здесь тоже складываем шаг за шагом.
+    # Отрезки сортируются по убыванию длины, и на k-м шаге активен префикс.
+    order = np.argsort(-steps, kind='stable')
+    steps_s = steps[order]
+    start_s = offsets[:-1][order]
+    x_inc_s, y_inc_s = x_inc[order], y_inc[order]
+    x = x1[order].astype(np.float64)
+    y = y1[order].astype(np.float64)
+
+    neg_steps = -steps_s
+    k = 0
+    while True:
+        active = np.searchsorted(neg_steps, -k, side='right')
+        if active < DDA_TAIL_SEGMENTS:
+            break
+        pos = start_s[:active] + k
+        xs[pos] = np.rint(x[:active])
+        ys[pos] = np.rint(y[:active])
+        x[:active] += x_inc_s[:active]
+        y[:active] += y_inc_s[:active]
+        k += 1
+
+    # Хвосты немногих длинных отрезков: add.accumulate складывает
+    # последовательно, так что результат совпадает с циклом
+    for idx in range(active):
+        rest = steps_s[idx] - k + 1
+        pos = start_s[idx] + k
+        for coord, inc, out in ((x, x_inc_s, xs), (y, y_inc_s, ys)):
+            acc = np.full(rest, inc[idx])
+            acc[0] = coord[idx]
+            out[pos:pos + rest] = np.rint(np.add.accumulate(acc))
+
+    # Удаление дубликатов из скалярной версии здесь не нужно: по главной оси
+    # шаг равен ровно ±1, поэтому соседние пиксели всегда различны
+    return xs, ys, offsets
+
+
+def _line_batch(segments, minor):
+    x1, y1, x2, y2 = _as_segments(segments)
+    a, b, sx, sy, x_major = line_axes(x1, y1, x2, y2)
+
+    counts = a + 1
+    offsets = _offsets(counts)
+    i = _pixel_index(offsets)
+
+    j = minor(np.repeat(a, counts), np.repeat(b, counts), i)
+    xs, ys = major_minor_to_xy(
+        np.repeat(x1, counts), np.repeat(y1, counts),
+        np.repeat(sx, counts), np.repeat(sy, counts),
+        np.repeat(x_major, counts), i, j,
+    )
+    return xs, ys, offsets
+
+
+def bresenham_line_batch(segments):
+    return _line_batch(segments, bresenham_minor)
+
+
+def castle_pitteway_batch(segments):
+    return _line_batch(segments, castle_pitteway_minor)
+
+
+def circle_octant_y(r, x):
+    # Первый октант окружности Брезенхема (x от 0, y от r) без цикла.
+    # Параметр решения d = 2(x+1)^2 + y^2 + (y-1)^2 - 2r^2 оставляет y, пока
+    # y(y - 1) <= r^2 - x^2 - 1, поэтому y(x) - наибольшее такое целое:
+    # y = (1 + isqrt(4(r^2 - x^2) - 3)) // 2. При x = 0 это ровно r.
+    # Цикл идёт, пока x <= y, так что нужен только префикс по x.
+    v = np.maximum(4 * (r * r - x * x) - 3, 0)
+    root = np.sqrt(v.astype(np.float64)).astype(np.int64)
+    root -= root * root > v
+    root += (root + 1) * (root + 1) <= v
+    return (1 + root) // 2
+
+
+def circle_reflections(ox, oy):
+    # Восемь симметричных отражений точек октанта. Они совпадают только при
+    # x = 0 или x = y, поэтому дубликаты отбрасываются по маске, без множества
+    dx = np.stack([ox, -ox, ox, -ox, oy, -oy, oy, -oy], axis=1)
+    dy = np.stack([oy, oy, -oy, -oy, ox, ox, -ox, -ox], axis=1)
+    on_axis = ox == 0
+    diagonal = ox == oy
+    keep = np.ones(dx.shape, dtype=bool)
+    keep[:, [1, 3, 6, 7]] &= ~on_axis[:, None]
+    keep[:, 4:] &= ~diagonal[:, None]
+    keep[:, 2] &= ~(on_axis & diagonal)
+    return dx, dy, keep
+
+
+def bresenham_circle_batch(circles):
+    # На вход - массив (N, 3) из строк (xc, yc, r). Набор пикселей каждой
+    # окружности совпадает с bresenham_circle, но порядок задан явно:
+    # по точкам октанта, для каждой - её симметричные отражения.
+    circles = np.asarray(circles, dtype=np.int64).reshape(-1, 3)
+    xc, yc, r = circles[:, 0], circles[:, 1], circles[:, 2]
+
+    # Кандидаты x до r / sqrt(2) + 1, из них берётся префикс с x <= y
+    candidates = (r * 0.7071067811865476).astype(np.int64) + 2
+    cand_offsets = _offsets(candidates)
+    x = _pixel_index(cand_offsets)
+    y = circle_octant_y(np.repeat(r, candidates), x)
+    keep = x <= y
+    circle_id = np.repeat(np.arange(len(r)), candidates)[keep]
+    ox, oy = x[keep], y[keep]
+
+    dx, dy, keep = circle_reflections(ox, oy)
+    counts = np.bincount(circle_id, weights=keep.sum(axis=1), minlength=len(r)).astype(np.int64)
+
+    xs = (dx + xc[circle_id][:, None])[keep]
+    ys = (dy + yc[circle_id][:, None])[keep]
+    return xs, ys, _offsets(counts)
+
+
+def wu_params(x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+
+    steep = abs(dy) > abs(dx)
+    if steep:
+        x1, y1, x2, y2 = y1, x1, y2, x2
+        dx, dy = dy, dx
+
+    if x1 > x2:
+        x1, x2, y1, y2 = x2, x1, y2, y1
+        dx, dy = -dx, -dy
+
+    gradient = dy / dx if dx != 0 else 1.0
+    return steep, x1, y1, x2, y2, gradient
+
+
+def wu_pixels(steep, x, y):
+    # Пары пикселей по обе стороны от y с интенсивностями 1 - frac и frac
+    y_int = np.trunc(y)
+    fractional_part = y - y_int
+    y_int = y_int.astype(np.int64)
+
+    main = np.repeat(x, 2)
+    cross = np.stack([y_int, y_int + 1], axis=1).ravel()
+    intensities = np.stack([1 - fractional_part, fractional_part], axis=1).ravel()
+    if steep:
+        return cross, main, intensities
+    return main, cross, intensities
+
+
+def wu_antialiasing_line_arrays(x1, y1, x2, y2):
+    # Та же последовательность (x, y, intensity), что и у wu_antialiasing_line,
+    # но в виде трёх массивов
+    steep, x1, y1, x2, y2, gradient = wu_params(x1, y1, x2, y2)
+
+    # y накапливается сложением, как в скалярном цикле; add.accumulate
+    # складывает последовательно, поэтому значения совпадают бит в бит
+    n = max(int(x2) - int(x1) - 1, 0)
+    y = np.full(n, gradient)
+    if n:
+        y[0] = y1 + gradient
+    y = np.add.accumulate(y)
+    xs, ys, intensities = wu_pixels(steep, np.arange(int(x1) + 1, int(x2), dtype=np.int64), y)
+
+    ends_x, ends_y = [int(x1), int(x2)], [int(y1), int(y2)]
+    if steep:
+        ends_x, ends_y = ends_y, ends_x
+    xs = np.concatenate([ends_x, xs])
+    ys = np.concatenate([ends_y, ys])
+    intensities = np.concatenate([[1.0, 1.0], intensities])
+    return xs, ys, intensities
+
+
+# Пакетные версии для алгоритмов из реестра algorithms
+batch_algorithms = {
+    'Пошаговый': step_by_step_line_batch,
+    'ЦДА (DDA)': dda_line_batch,
+    'Брезенхем (линия)': bresenham_line_batch,
+    'Брезенхем (окружность)': bresenham_circle_batch,
+    'Кастл-Питвей': castle_pitteway_batch,
+}
+
+
+if __name__ == "__main__":
+    import time
+
+    from algorithms import algorithms
+
+    rng = np.random.default_rng(0)
+    starts = rng.integers(-500, 500, size=(100_000, 2))
+    segments = np.hstack([starts, starts + rng.integers(-50, 51, size=(100_000, 2))])
+    circles = np.hstack([starts[:10_000], rng.integers(0, 50, size=(10_000, 1))])
+
+    for name, batch_func in batch_algorithms.items():
+        algo_func = algorithms[name]
+        is_circle = batch_func is bresenham_circle_batch
+        params = circles if is_circle else segments
+
+        start_time = time.perf_counter()
+        xs, ys, offsets = batch_func(params)
+        batch_ms = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        reference = [algo_func(*map(int, p)) for p in params]
+        scalar_ms = (time.perf_counter() - start_time) * 1000
+
+        packed = list(zip(xs.tolist(), ys.tolist()))
+        # Окружность возвращает list(set), поэтому сравниваем наборы
+        normalize = set if is_circle else list
+        same = all(
+            normalize(packed[offsets[k]:offsets[k + 1]]) == normalize(pixels)
+            and offsets[k + 1] - offsets[k] == len(pixels)
+            for k, pixels in enumerate(reference)
+        )
+        print(f"{name}: пакетно {batch_ms:.1f} мс, поштучно {scalar_ms:.1f} мс, "
+              f"ускорение x{scalar_ms / batch_ms:.1f}, совпадение: {same}")
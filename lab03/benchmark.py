@@ -0,0 +1,243 @@
+import argparse
+import csv
+import functools
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from algorithms import algorithms
+from batch import batch_algorithms
+from streaming import streaming_algorithms
+
+# Бенчмарк алгоритмов растеризации без Streamlit.
+#
+# Каждый алгоритм из реестра algorithms прогоняется по сетке случаев:
+# длины отрезков x наклоны x 8 октантов, для окружностей и эллипсов - набор
+# радиусов, для многоугольников - правильные многоугольники разного размера.
+# Каждый случай повторяется несколько раз после прогрева; отдельным прогоном
+# под tracemalloc снимаются пиковая память (peak_bytes, прирост относительно
+# начала прогона) и retained_blocks - число блоков памяти, которые после
+# прогона заняты его результатом. Временные блоки, освобождённые во время
+# прогона, в retained_blocks не входят.
+#
+#   python benchmark.py --output results.json
+#   python benchmark.py --output new.json --compare results.json
+
+LINE_LENGTHS = (10, 100, 1000)
+LINE_SLOPES = (0.0, 0.25, 0.5, 1.0)
+CIRCLE_RADII = (10, 100, 1000)
+POLYGON_SIDES = (3, 12)
+
+FIELDS = (
+    'algorithm', 'mode', 'case', 'params', 'pixels', 'repeat',
+    'time_min_ms', 'time_median_ms', 'pixels_per_sec', 'peak_bytes', 'retained_blocks',
+)
+
+
+def line_cases(lengths=LINE_LENGTHS, slopes=LINE_SLOPES):
+    # Октант задаётся главной осью и знаками шагов по x и y. При наклоне 0
+    # и 1 разные октанты дают одни и те же отрезки - они берутся один раз
+    seen = set()
+    for length in lengths:
+        for slope in slopes:
+            minor = int(round(length * slope))
+            for octant in range(8):
+                x_major = octant & 4 == 0
+                sx = -1 if octant & 1 else 1
+                sy = -1 if octant & 2 else 1
+                dx, dy = (length, minor) if x_major else (minor, length)
+                params = (0, 0, sx * dx, sy * dy)
+                if params in seen:
+                    continue
+                seen.add(params)
+                yield f"L={length} slope={slope} octant={octant}", params
+
+
+def circle_cases(radii=CIRCLE_RADII):
+    for r in radii:
+        yield f"R={r}", (0, 0, r)
+
+
+def ellipse_cases(radii=CIRCLE_RADII):
+    for r in radii:
+        yield f"Rx={r} Ry={r // 2}", (0, 0, r, r // 2)
+
+
+def polygon_cases(radii=CIRCLE_RADII, sides=POLYGON_SIDES):
+    # Правильные многоугольники, вписанные в окружность радиуса r
+    for r in radii:
+        for n in sides:
+            angles = [2 * math.pi * k / n for k in range(n)]
+            vertices = [(round(r * math.cos(a)), round(r * math.sin(a))) for a in angles]
+            yield f"R={r} sides={n}", (vertices,)
+
+
+def cases_for(name):
+    if 'окружность' in name:
+        return circle_cases()
+    if 'Эллипс' in name:
+        return ellipse_cases()
+    if 'Многоугольник' in name:
+        return polygon_cases()
+    return line_cases()
+
+
+def _run_scalar(func, params):
+    return func(*params)
+
+
+def _run_batch(func, params):
+    return func(np.array([params]))[0]
+
+
+def _run_streaming(func, params):
+    # Порции сохраняются, чтобы их память попала в замер
+    return list(func(*params))
+
+
+def _count_streaming(chunks):
+    return sum(len(chunk[0]) for chunk in chunks)
+
+
+# Режим: реестр алгоритмов, запуск, число пикселей результата
+MODES = {
+    'scalar': (algorithms, _run_scalar, len),
+    'batch': (batch_algorithms, _run_batch, len),
+    'streaming': (streaming_algorithms, _run_streaming, _count_streaming),
+}
+
+
+def measure(run, count, repeat, warmup):
+    for _ in range(warmup):
+        run()
+
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start_time)
+    pixels = count(result)
+    del result
+
+    # Блоки считаются по разнице снимков до запуска и после, пока результат
+    # ещё жив; память самого tracemalloc не учитывается
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        result = run()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    retained_blocks = sum(max(stat.count_diff, 0) for stat in
+                           after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'filename'))
+
+    return pixels, times, peak_bytes - start_memory, retained_blocks
+
+
+def run_benchmarks(names, modes, repeat, warmup):
+    rows = []
+    for mode in modes:
+        registry, runner, count = MODES[mode]
+        for name in names:
+            if name not in registry:
+                continue
+            for case, params in cases_for(name):
+                run = functools.partial(runner, registry[name], params)
+                pixels, times, peak_bytes, retained_blocks = measure(run, count, repeat, warmup)
+                median = statistics.median(times)
+                rows.append({
+                    'algorithm': name,
+                    'mode': mode,
+                    'case': case,
+                    'params': ' '.join(map(str, params)),
+                    'pixels': pixels,
+                    'repeat': repeat,
+                    'time_min_ms': min(times) * 1000,
+                    'time_median_ms': median * 1000,
+                    'pixels_per_sec': pixels / median if median > 0 else float('inf'),
+                    'peak_bytes': peak_bytes,
+                    'retained_blocks': retained_blocks,
+                })
+    return rows
+
+
+def write_results(rows, path, fmt):
+    stream = open(path, 'w', newline='') if path else sys.stdout
+    try:
+        if fmt == 'csv':
+            writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': rows,
+            }, stream, ensure_ascii=False, indent=2)
+            stream.write('\n')
+    finally:
+        if path:
+            stream.close()
+
+
+def read_results(path):
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            return list(csv.DictReader(f))
+        return json.load(f)['results']
+
+
+def compare(rows, baseline_rows, tolerance):
+    # Регрессия - медианное время выросло больше чем в (1 + tolerance) раз
+    baseline = {(r['algorithm'], r['mode'], r['case']): float(r['time_median_ms']) for r in baseline_rows}
+    regressions = []
+    for row in rows:
+        old = baseline.get((row['algorithm'], row['mode'], row['case']))
+        if old and row['time_median_ms'] > old * (1 + tolerance):
+            regressions.append((row, row['time_median_ms'] / old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк алгоритмов растеризации из lab03")
+    parser.add_argument('--algorithms', nargs='+', default=list(algorithms), choices=list(algorithms),
+                        metavar='NAME', help="алгоритмы из реестра (по умолчанию все)")
+    parser.add_argument('--modes', nargs='+', default=['scalar'], choices=list(MODES),
+                        help="реализации: скалярная, пакетная, потоковая")
+    parser.add_argument('--repeat', type=int, default=5, help="число замеров на случай")
+    parser.add_argument('--warmup', type=int, default=1, help="число прогревочных запусков")
+    parser.add_argument('--format', choices=('json', 'csv'), default=None,
+                        help="формат отчёта (по умолчанию - по расширению файла, иначе json)")
+    parser.add_argument('--output', help="файл отчёта (по умолчанию stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="отчёт предыдущего запуска для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое замедление, доля")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output and args.output.endswith('.csv') else 'json')
+    rows = run_benchmarks(args.algorithms, args.modes, args.repeat, args.warmup)
+    write_results(rows, args.output, fmt)
+
+    if args.compare:
+        regressions = compare(rows, read_results(args.compare), args.tolerance)
+        for row, ratio in regressions:
+            print(f"Регрессия: {row['algorithm']} [{row['mode']}] {row['case']}: "
+                  f"x{ratio:.2f} ({row['time_median_ms']:.4f} мс)", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
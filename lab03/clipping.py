@@ -0,0 +1,368 @@
+import math
+
+import numpy as np
+
+from batch import (
+    bresenham_minor,
+    castle_pitteway_minor,
+    circle_octant_y,
+    circle_reflections,
+    dda_params,
+    line_axes,
+    major_minor_to_xy,
+    step_by_step_params,
+    step_by_step_pixels,
+    wu_params,
+    wu_pixels,
+)
+from spans import castle_pitteway_span_rows, span_bounds
+from wu import FRAC_BITS, _prepare, endpoint_pixels, interior_pixels
+
+# Отсечение по прямоугольнику перед растеризацией.
+#
+# Прямоугольник rect = (xmin, ymin, xmax, ymax) задаётся в пикселях, границы
+# включительно. Результат совпадает с пикселями исходного алгоритма, которые
+# попали в прямоугольник, причём в том же порядке, а работа пропорциональна
+# числу видимых пикселей, а не длине отрезка.
+#
+# Сначала отрезок целиком проверяется кодами Коэна-Сазерленда: если оба конца
+# лежат по одну сторону от прямоугольника, рисовать нечего, а если оба внутри -
+# отсекать нечего. Иначе точку пересечения с границей нельзя взять у идеального
+# отрезка (как в Лианге-Барски): растровый отрезок отклоняется от него на
+# полпикселя, и пиксель-в-пиксель совпадения не будет. Вместо этого у каждого
+# алгоритма есть функция «номер шага -> пиксель», обе координаты которой
+# монотонны по номеру шага, и видимый диапазон шагов находится бинарным
+# поиском - за O(log длины) вычислений одного пикселя.
+#
+# ЦДА и алгоритм Ву накапливают координату сложением с плавающей точкой,
+# поэтому значение на k-м шаге отличается от start + k * inc. Его даёт
+# repeated_add: в пределах одного двоичного порядка сложение с inc
+# прибавляет одну и ту же величину, поэтому порядок проходится одним
+# умножением, а число порядков ограничено разрядностью double.
+
+INSIDE, LEFT, RIGHT, BOTTOM, TOP = 0, 1, 2, 4, 8
+
+
+def outcode(x, y, rect):
+    xmin, ymin, xmax, ymax = rect
+    code = INSIDE
+    if x < xmin:
+        code |= LEFT
+    elif x > xmax:
+        code |= RIGHT
+    if y < ymin:
+        code |= BOTTOM
+    elif y > ymax:
+        code |= TOP
+    return code
+
+
+def _trivial(x1, y1, x2, y2, rect, margin=0):
+    # 'reject' - отрезок целиком снаружи, 'accept' - целиком внутри, иначе None.
+    # margin расширяет прямоугольник для алгоритмов, рисующих рядом с отрезком
+    xmin, ymin, xmax, ymax = rect
+    grown = (xmin - margin, ymin - margin, xmax + margin, ymax + margin)
+    code1, code2 = outcode(x1, y1, grown), outcode(x2, y2, grown)
+    if code1 & code2:
+        return 'reject'
+    if outcode(x1, y1, rect) == outcode(x2, y2, rect) == INSIDE:
+        return 'accept'
+    return None
+
+
+def _binade(value):
+    mantissa, exponent = math.frexp(value)
+    return (mantissa > 0) - (mantissa < 0), exponent
+
+
+def repeated_add(start, inc, count):
+    # Значение value после count сложений value += inc, начиная с float(start),
+    # бит в бит как в цикле.
+    #
+    # Если три подряд значения лежат в одном двоичном порядке [2^(e-1), 2^e),
+    # то все следующие сложения, пока результат остаётся в нём, прибавляют
+    # одну и ту же величину d: inc, округлённое к сетке этого порядка (при
+    # округлении половины к чётному - тоже одну и ту же, начиная со второго
+    # шага внутри порядка). Сумма value + n * d тогда точна.
+    value = float(start)
+    streak = 0
+    while count > 0:
+        previous, value = value, value + inc
+        count -= 1
+        streak = streak + 1 if _binade(value) == _binade(previous) else 0
+        if streak < 2 or count == 0:
+            continue
+
+        d = value - previous
+        if d == 0:
+            return value
+        sign, exponent = _binade(value)
+        if d * sign > 0:
+            room = math.ldexp(1.0, exponent) - abs(value)
+        else:
+            room = abs(value) - math.ldexp(1.0, exponent - 1)
+        # Запас в два шага, чтобы не зайти на границу соседнего порядка
+        n = min(int(room // abs(d)) - 2, count)
+        if n > 0:
+            value += n * d
+            count -= n
+    return value
+
+
+def _first(predicate, lo, hi):
+    # Первое i из [lo, hi), для которого predicate(i) истинно (predicate
+    # монотонен: сначала ложен, потом истинен); hi, если такого нет
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if predicate(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def _coord_range(f, count, lo, hi):
+    # Диапазон [first, stop) номеров, для которых lo <= f(i) <= hi;
+    # f монотонна на [0, count)
+    if f(0) <= f(count - 1):
+        first = _first(lambda i: f(i) >= lo, 0, count)
+        return first, _first(lambda i: f(i) > hi, first, count)
+    first = _first(lambda i: f(i) <= hi, 0, count)
+    return first, _first(lambda i: f(i) < lo, first, count)
+
+
+def visible_range(pixel, count, rect):
+    # Видимый диапазон шагов [first, stop) последовательности pixel(i) -> (x, y)
+    # длины count с монотонными координатами
+    if count <= 0:
+        return 0, 0
+    xmin, ymin, xmax, ymax = rect
+    x_first, x_stop = _coord_range(lambda i: pixel(i)[0], count, xmin, xmax)
+    y_first, y_stop = _coord_range(lambda i: pixel(i)[1], count, ymin, ymax)
+    first, stop = max(x_first, y_first), min(x_stop, y_stop)
+    return first, max(first, stop)
+
+
+def _empty(*extra):
+    return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), *extra)
+
+
+def _inside(xs, ys, rect):
+    xmin, ymin, xmax, ymax = rect
+    return (xs >= xmin) & (xs <= xmax) & (ys >= ymin) & (ys <= ymax)
+
+
+def _steps(pixel, count, trivial, rect):
+    if trivial == 'accept':
+        return np.arange(count, dtype=np.int64)
+    first, stop = visible_range(lambda i: tuple(int(v) for v in pixel(i)), count, rect)
+    return np.arange(first, stop, dtype=np.int64)
+
+
+def clip_step_by_step_line(x1, y1, x2, y2, rect):
+    trivial = _trivial(x1, y1, x2, y2, rect)
+    if trivial == 'reject':
+        return _empty()
+    x_major, major_base, minor_base, slope, count = step_by_step_params(x1, y1, x2, y2)
+
+    def pixel(i):
+        return step_by_step_pixels(x_major, major_base, minor_base, slope, i)
+
+    return pixel(_steps(pixel, int(count), trivial, rect))
+
+
+def _clip_line(x1, y1, x2, y2, rect, minor):
+    trivial = _trivial(x1, y1, x2, y2, rect)
+    if trivial == 'reject':
+        return _empty()
+    a, b, sx, sy, x_major = line_axes(x1, y1, x2, y2)
+
+    def pixel(i):
+        return major_minor_to_xy(x1, y1, sx, sy, x_major, i, minor(a, b, i))
+
+    return pixel(_steps(pixel, int(a) + 1, trivial, rect))
+
+
+def clip_bresenham_line(x0, y0, x1, y1, rect):
+    return _clip_line(x0, y0, x1, y1, rect, bresenham_minor)
+
+
+def clip_castle_pitteway(x1, y1, x2, y2, rect):
+    return _clip_line(x1, y1, x2, y2, rect, castle_pitteway_minor)
+
+
+def clip_castle_pitteway_spans(x1, y1, x2, y2, rect):
+    # Серии (xs, ys, lengths, horizontal) из spans.py, пересекающие rect;
+    # сами серии не обрезаются, это делает fill_spans
+    trivial = _trivial(x1, y1, x2, y2, rect)
+    if trivial == 'reject':
+        return _empty(np.empty(0, dtype=np.int64), np.empty(0, dtype=bool))
+    a, b, sx, sy, x_major = (v.item() for v in line_axes(np.int64(x1), np.int64(y1), np.int64(x2), np.int64(y2)))
+    count = (a if a == b else b) + 1
+
+    def row(t):
+        return castle_pitteway_span_rows(x1, y1, a, b, sx, sy, x_major, t)
+
+    if trivial == 'accept':
+        xs, ys, lengths, _ = row(np.arange(count, dtype=np.int64))
+        return xs, ys, lengths, np.full(len(xs), x_major)
+
+    # Номер серии монотонно задаёт её строку (столбец) и оба её конца по
+    # главной оси, поэтому видимые серии идут одним непрерывным диапазоном
+    xmin, ymin, xmax, ymax = rect
+    major_lo, major_hi, minor_lo, minor_hi = (xmin, xmax, ymin, ymax) if x_major else (ymin, ymax, xmin, xmax)
+    major = 0 if x_major else 1
+
+    def low(t):
+        return int(row(t)[major])
+
+    def high(t):
+        span = row(t)
+        return int(span[major] + span[2] - 1)
+
+    ranges = (
+        _coord_range(low, count, -math.inf, major_hi),
+        _coord_range(high, count, major_lo, math.inf),
+        _coord_range(lambda t: int(row(t)[1 - major]), count, minor_lo, minor_hi),
+    )
+    first = max(r[0] for r in ranges)
+    stop = max(first, min(r[1] for r in ranges))
+    xs, ys, lengths, _ = row(np.arange(first, stop, dtype=np.int64))
+    return xs, ys, lengths, np.full(len(xs), x_major)
+
+
+def clip_dda_line(x1, y1, x2, y2, rect):
+    trivial = _trivial(x1, y1, x2, y2, rect)
+    if trivial == 'reject':
+        return _empty()
+    steps, x_inc, y_inc = (v.item() for v in dda_params(np.int64(x1), np.int64(y1), np.int64(x2), np.int64(y2)))
+    if steps == 0:
+        return np.array([x1], dtype=np.int64), np.array([y1], dtype=np.int64)
+
+    def pixel(i):
+        return round(repeated_add(x1, x_inc, i)), round(repeated_add(y1, y_inc, i))
+
+    if trivial == 'accept':
+        first, stop = 0, steps + 1
+    else:
+        first, stop = visible_range(pixel, steps + 1, rect)
+    if first == stop:
+        return _empty()
+
+    # Дальше - последовательное сложение от значения на шаге first
+    xs = np.full(stop - first, x_inc)
+    ys = np.full(stop - first, y_inc)
+    xs[0], ys[0] = repeated_add(x1, x_inc, first), repeated_add(y1, y_inc, first)
+    xs = np.add.accumulate(xs)
+    ys = np.add.accumulate(ys)
+    return np.rint(xs).astype(np.int64), np.rint(ys).astype(np.int64)
+
+
+def _octant_y(r, x):
+    # circle_octant_y для одного целого x
+    return (1 + math.isqrt(max(4 * (r * r - x * x) - 3, 0))) // 2
+
+
+def clip_bresenham_circle(xc, yc, r, rect):
+    # Каждое из восьми отражений октанта - монотонная последовательность по x
+    # октанта, поэтому видимый кусок у каждого свой и ищется бинарным поиском
+    xmin, ymin, xmax, ymax = rect
+    if xc + r < xmin or xc - r > xmax or yc + r < ymin or yc - r > ymax:
+        return _empty()
+    count = _first(lambda x: x > _octant_y(r, x), 0, r + 2)
+    accept = xc - r >= xmin and xc + r <= xmax and yc - r >= ymin and yc + r <= ymax
+
+    def reflection(k):
+        def pixel(x):
+            y = _octant_y(r, x)
+            dx = (x, -x, x, -x, y, -y, y, -y)[k]
+            dy = (y, y, -y, -y, x, x, -x, -x)[k]
+            return xc + dx, yc + dy
+        return pixel
+
+    if accept:
+        x = np.arange(count, dtype=np.int64)
+        dx, dy, keep = circle_reflections(x, circle_octant_y(r, x))
+        return (xc + dx)[keep], (yc + dy)[keep]
+
+    xs, ys = [], []
+    for k in range(8):
+        first, stop = visible_range(reflection(k), count, rect)
+        x = np.arange(first, stop, dtype=np.int64)
+        dx, dy, keep = circle_reflections(x, circle_octant_y(r, x))
+        xs.append(xc + dx[:, k][keep[:, k]])
+        ys.append(yc + dy[:, k][keep[:, k]])
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def _wu_columns(count, column, steep, rect):
+    # Видимые внутренние столбцы алгоритма Ву: column(k) -> (главная, нижний
+    # пиксель второй оси); столбец рисует пиксели cross и cross + 1
+    xmin, ymin, xmax, ymax = rect
+    if steep:
+        major_lo, major_hi, cross_lo, cross_hi = ymin, ymax, xmin - 1, xmax
+    else:
+        major_lo, major_hi, cross_lo, cross_hi = xmin, xmax, ymin - 1, ymax
+    return visible_range(column, count, (major_lo, cross_lo, major_hi, cross_hi))
+
+
+def clip_wu_antialiasing_line(x1, y1, x2, y2, rect):
+    if _trivial(x1, y1, x2, y2, rect, margin=1) == 'reject':
+        return _empty(np.empty(0))
+    steep, x1, y1, x2, y2, gradient = wu_params(x1, y1, x2, y2)
+
+    ends_x, ends_y = [int(x1), int(x2)], [int(y1), int(y2)]
+    if steep:
+        ends_x, ends_y = ends_y, ends_x
+    ends_x, ends_y = np.array(ends_x, dtype=np.int64), np.array(ends_y, dtype=np.int64)
+
+    # y k-го столбца - y1 + gradient, сложенное ещё k раз с gradient
+    count = max(int(x2) - int(x1) - 1, 0)
+    first, stop = _wu_columns(
+        count, lambda k: (int(x1) + 1 + k, int(repeated_add(y1, gradient, k + 1))), steep, rect)
+    y = np.full(stop - first, gradient)
+    if stop > first:
+        y[0] = repeated_add(y1, gradient, first + 1)
+    y = np.add.accumulate(y)
+    xs, ys, intensities = wu_pixels(steep, np.arange(int(x1) + 1 + first, int(x1) + 1 + stop, dtype=np.int64), y)
+
+    xs = np.concatenate([ends_x, xs])
+    ys = np.concatenate([ends_y, ys])
+    intensities = np.concatenate([[1.0, 1.0], intensities])
+    inside = _inside(xs, ys, rect)
+    return xs[inside], ys[inside], intensities[inside]
+
+
+def clip_wu_fixed_point_line(x1, y1, x2, y2, rect):
+    # Результат - (xs, ys, coverage 0..255) в порядке wu_lines_fixed
+    if _trivial(x1, y1, x2, y2, rect, margin=2) == 'reject':
+        return _empty(np.empty(0, dtype=np.uint8))
+    steep, gradient, xend1, xend2, yend1, yend2, xgap1, xgap2, interior = (
+        v[0].item() for v in _prepare((x1, y1, x2, y2)))
+
+    first, stop = _wu_columns(
+        interior, lambda k: (xend1 + 1 + k, (yend1 + gradient * (k + 1)) >> FRAC_BITS), steep, rect)
+    position = np.arange(2 * first, 2 * stop, dtype=np.int64)
+    main, cross, coverage = interior_pixels(gradient, xend1, yend1, position >> 1, position & 1)
+
+    end_main, end_cross, end_coverage = endpoint_pixels(*(
+        np.array([v]) for v in (gradient, xend1, xend2, yend1, yend2, xgap1, xgap2)))
+    main = np.concatenate([end_main.ravel(), main])
+    cross = np.concatenate([end_cross.ravel(), cross])
+    coverage = np.concatenate([end_coverage.ravel(), coverage])
+    xs, ys = (cross, main) if steep else (main, cross)
+    inside = _inside(xs, ys, rect)
+    return xs[inside], ys[inside], coverage[inside]
+
+
+# Версии алгоритмов из реестра algorithms с отсечением:
+# func(*params, rect) -> (xs, ys) или (xs, ys, intensities) для алгоритмов Ву
+clipped_algorithms = {
+    'Пошаговый': clip_step_by_step_line,
+    'ЦДА (DDA)': clip_dda_line,
+    'Брезенхем (линия)': clip_bresenham_line,
+    'Брезенхем (окружность)': clip_bresenham_circle,
+    'Кастл-Питвей': clip_castle_pitteway,
+    'Алгоритм Ву': clip_wu_antialiasing_line,
+    'Алгоритм Ву (фиксированная точка)': clip_wu_fixed_point_line,
+}
@@ -0,0 +1,151 @@
+import numpy as np
+
+from clipping import (
+    clip_bresenham_circle,
+    clip_bresenham_line,
+    clip_castle_pitteway_spans,
+    clip_dda_line,
+    clip_step_by_step_line,
+    clip_wu_antialiasing_line,
+    clip_wu_fixed_point_line,
+)
+from fill import ellipse_quadrant, filled_circle_spans, filled_ellipse_spans, polygon_spans
+from spans import fill_spans
+from wu import accumulate_coverage
+
+# Растеризация сразу в кадровый буфер.
+#
+# Буфер - массив NumPy формы (H, W) или (H, W, C) типа uint8 или float32,
+# пиксель (x, y) соответствует элементу fb[y, x]. Всё, что выходит за
+# пределы буфера, отсекается ещё до растеризации (clipping.py), так что
+# длинные отрезки за краем буфера не обходятся целиком. Пиксели записываются
+# одной векторной операцией, без списков кортежей.
+
+
+def _default_value(fb, value):
+    if value is not None:
+        return value
+    if np.issubdtype(fb.dtype, np.integer):
+        return np.iinfo(fb.dtype).max
+    return 1.0
+
+
+def _rect(fb, origin):
+    # Прямоугольник буфера в координатах сцены
+    h, w = fb.shape[:2]
+    ox, oy = origin
+    return ox, oy, ox + w - 1, oy + h - 1
+
+
+def _clip(fb, xs, ys):
+    h, w = fb.shape[:2]
+    return (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+
+
+def plot_pixels(fb, xs, ys, value=None):
+    inside = _clip(fb, xs, ys)
+    fb[ys[inside], xs[inside]] = _default_value(fb, value)
+    return fb
+
+
+def blend_pixels(fb, xs, ys, intensities, value=None):
+    # Смешивание цвета value с содержимым буфера с коэффициентом intensity:
+    # fb = fb + (value - fb) * intensity
+    inside = _clip(fb, xs, ys)
+    alpha = np.clip(intensities[inside], 0.0, 1.0)
+
+    # Повторяющиеся пиксели смешиваются как при последовательном наложении:
+    # итоговая прозрачность равна произведению (1 - intensity)
+    index, inverse = np.unique(ys[inside] * fb.shape[1] + xs[inside], return_inverse=True)
+    transparency = np.ones(len(index))
+    np.multiply.at(transparency, inverse, 1.0 - alpha)
+    ys, xs = np.divmod(index, fb.shape[1])
+    alpha = (1.0 - transparency).astype(np.float32)
+    if fb.ndim == 3:
+        alpha = alpha[:, None]
+
+    old = fb[ys, xs].astype(np.float32)
+    new = old + (np.float32(_default_value(fb, value)) - old) * alpha
+    if np.issubdtype(fb.dtype, np.integer):
+        info = np.iinfo(fb.dtype)
+        new = np.clip(np.rint(new), info.min, info.max)
+    fb[ys, xs] = new
+    return fb
+
+
+def draw_step_by_step_line(fb, x1, y1, x2, y2, value=None, origin=(0, 0)):
+    xs, ys = clip_step_by_step_line(x1, y1, x2, y2, _rect(fb, origin))
+    return plot_pixels(fb, xs - origin[0], ys - origin[1], value)
+
+
+def draw_dda_line(fb, x1, y1, x2, y2, value=None, origin=(0, 0)):
+    xs, ys = clip_dda_line(x1, y1, x2, y2, _rect(fb, origin))
+    return plot_pixels(fb, xs - origin[0], ys - origin[1], value)
+
+
+def draw_bresenham_line(fb, x0, y0, x1, y1, value=None, origin=(0, 0)):
+    xs, ys = clip_bresenham_line(x0, y0, x1, y1, _rect(fb, origin))
+    return plot_pixels(fb, xs - origin[0], ys - origin[1], value)
+
+
+def draw_bresenham_circle(fb, xc, yc, r, value=None, origin=(0, 0)):
+    xs, ys = clip_bresenham_circle(xc, yc, r, _rect(fb, origin))
+    return plot_pixels(fb, xs - origin[0], ys - origin[1], value)
+
+
+def draw_castle_pitteway(fb, x1, y1, x2, y2, value=None, origin=(0, 0)):
+    # Пиксели не разворачиваются: серии ходов 's' заливаются срезами
+    xs, ys, lengths, horizontal = clip_castle_pitteway_spans(x1, y1, x2, y2, _rect(fb, origin))
+    return fill_spans(fb, xs - origin[0], ys - origin[1], lengths, horizontal, _default_value(fb, value))
+
+
+def draw_wu_antialiasing_line(fb, x1, y1, x2, y2, value=None, origin=(0, 0)):
+    xs, ys, intensities = clip_wu_antialiasing_line(x1, y1, x2, y2, _rect(fb, origin))
+    return blend_pixels(fb, xs - origin[0], ys - origin[1], intensities, value)
+
+
+def draw_wu_fixed_point_line(fb, x1, y1, x2, y2, value=None, origin=(0, 0)):
+    xs, ys, coverage = clip_wu_fixed_point_line(x1, y1, x2, y2, _rect(fb, origin))
+    return accumulate_coverage(fb, xs - origin[0], ys - origin[1], coverage, value)
+
+
+def _fill_rows(fb, xs, ys, lengths, value, origin):
+    return fill_spans(fb, xs - origin[0], ys - origin[1], lengths, np.ones(len(xs), dtype=bool),
+                      _default_value(fb, value))
+
+
+def draw_filled_circle(fb, xc, yc, r, value=None, origin=(0, 0)):
+    return _fill_rows(fb, *filled_circle_spans(xc, yc, r), value, origin)
+
+
+def draw_midpoint_ellipse(fb, xc, yc, rx, ry, value=None, origin=(0, 0)):
+    qx, qy = (np.array(a, dtype=np.int64) for a in ellipse_quadrant(rx, ry))
+    xs = np.concatenate([xc + qx, xc - qx, xc + qx, xc - qx])
+    ys = np.concatenate([yc + qy, yc + qy, yc - qy, yc - qy])
+    return plot_pixels(fb, xs - origin[0], ys - origin[1], value)
+
+
+def draw_filled_ellipse(fb, xc, yc, rx, ry, value=None, origin=(0, 0)):
+    return _fill_rows(fb, *filled_ellipse_spans(xc, yc, rx, ry), value, origin)
+
+
+def draw_polygon_fill(fb, vertices, value=None, origin=(0, 0)):
+    return _fill_rows(fb, *polygon_spans(vertices), value, origin)
+
+
+# Версии алгоритмов из реестра algorithms, рисующие в буфер:
+# func(fb, *params, value=None, origin=(0, 0)). origin - координаты сцены
+# пикселя fb[0, 0], так что буфером может быть и плитка большого холста.
+framebuffer_algorithms = {
+    'Пошаговый': draw_step_by_step_line,
+    'ЦДА (DDA)': draw_dda_line,
+    'Брезенхем (линия)': draw_bresenham_line,
+    'Брезенхем (окружность)': draw_bresenham_circle,
+    'Кастл-Питвей': draw_castle_pitteway,
+    'Алгоритм Ву': draw_wu_antialiasing_line,
+    'Алгоритм Ву (фиксированная точка)': draw_wu_fixed_point_line,
+    'Брезенхем (закрашенная окружность)': draw_filled_circle,
+    'Эллипс (средняя точка)': draw_midpoint_ellipse,
+    'Эллипс (закрашенный)': draw_filled_ellipse,
+    'Многоугольник (AET)': draw_polygon_fill,
+}
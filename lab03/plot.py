@@ -0,0 +1,130 @@
+import io
+import threading
+import time
+
+# График результата растеризации для main.py.
+#
+# Streamlit перезапускает скрипт при каждом действии, и раньше график
+# каждый раз строился заново через pyplot (новая фигура, оси, подписи,
+# которые к тому же не закрывались). Здесь фигура и все её элементы
+# создаются один раз, а при перезапуске у них только меняются данные:
+# координаты точек (set_offsets), цвета, эталонная фигура, пределы осей и
+# заголовок. Фигура рисуется без pyplot сразу в PNG с dpi PLOT_DPI и без
+# bbox_inches='tight' (он требует лишней отрисовки).
+#
+# matplotlib импортируется при создании PixelPlot, а не при импорте модуля:
+# при холодном старте заголовок и боковая панель появляются до этого
+# (импорт matplotlib занимает около половины секунды).
+
+PLOT_WIDTH = 10
+PLOT_DPI = 100
+
+# Цвет пикселей со сглаживанием; прозрачность - интенсивность
+COVERAGE_RGB = (0, 0, 0.7)
+
+
+class PixelPlot:
+    # Одна фигура на процесс; отрисовка под замком, так как сессии Streamlit
+    # выполняются в разных потоках
+
+    def __init__(self):
+        start_time = time.perf_counter()
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Circle, Ellipse, Polygon
+
+        self.lock = threading.Lock()
+        self.figure = Figure(figsize=(PLOT_WIDTH, 8))
+        ax = self.axes = self.figure.add_subplot()
+
+        # Настройка координатной плоскости
+        ax.set_aspect('equal', adjustable='box')
+        ax.set_xlabel("Ось X")
+        ax.set_ylabel("Ось Y")
+        ax.spines['left'].set_position('zero')
+        ax.spines['bottom'].set_position('zero')
+        ax.spines['right'].set_color('none')
+        ax.spines['top'].set_color('none')
+        ax.xaxis.set_ticks_position('bottom')
+        ax.yaxis.set_ticks_position('left')
+        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+        ideal = dict(color='red', fill=False, linestyle='--', linewidth=1)
+        self.ideal = {
+            'line': ax.plot([0, 1], [0, 1], 'r--', linewidth=1, label='Идеальный отрезок')[0],
+            'circle': ax.add_patch(Circle((0, 0), 1, label='Идеальная окружность', **ideal)),
+            'ellipse': ax.add_patch(Ellipse((0, 0), 2, 2, label='Идеальный эллипс', **ideal)),
+            'polygon': ax.add_patch(Polygon([(0, 0), (1, 0), (0, 1)], closed=True,
+                                            label='Идеальный многоугольник', **ideal)),
+        }
+        self.pixels = ax.scatter([0], [0], c='blue', s=50, marker='s', label='Растеризация', zorder=3)
+        self.coverage = ax.scatter([0], [0], s=500, marker='s', label='Растеризация (сглаживание)', zorder=3)
+        # Импорт matplotlib и создание фигуры - для отчёта о времени отклика
+        self.startup_seconds = time.perf_counter() - start_time
+
+    def _set_ideal(self, algo_name, params):
+        if 'окружность' in algo_name:
+            kind = 'circle'
+            xc, yc, r = params
+            self.ideal[kind].set_center((xc, yc))
+            self.ideal[kind].set_radius(r)
+        elif 'Эллипс' in algo_name:
+            kind = 'ellipse'
+            xc, yc, rx, ry = params
+            self.ideal[kind].set_center((xc, yc))
+            self.ideal[kind].set_width(2 * rx)
+            self.ideal[kind].set_height(2 * ry)
+        elif 'Многоугольник' in algo_name:
+            kind = 'polygon'
+            (vertices,) = params
+            self.ideal[kind].set_xy(vertices)
+        else:
+            kind = 'line'
+            x1, y1, x2, y2 = params
+            self.ideal[kind].set_data([x1, x2], [y1, y2])
+        for name, artist in self.ideal.items():
+            artist.set_visible(name == kind)
+        return self.ideal[kind]
+
+    def _set_pixels(self, pixels):
+        # Видимая коллекция точек и их координаты
+        self.pixels.set_visible(False)
+        self.coverage.set_visible(False)
+        if not pixels:
+            return None, None
+        if len(pixels[0]) == 3:
+            # Режим сглаживания: третий элемент - интенсивность
+            px, py, intensities = zip(*pixels)
+            colors = [COVERAGE_RGB + (i,) for i in intensities]
+            self.coverage.set_facecolors(colors)
+            self.coverage.set_edgecolors(colors)
+            artist = self.coverage
+        else:
+            px, py = zip(*pixels)
+            artist = self.pixels
+        artist.set_offsets(list(zip(px, py)))
+        artist.set_visible(True)
+        return artist, (px, py)
+
+    def render(self, pixels, algo_name, params, height):
+        # PNG графика для st.image
+        with self.lock:
+            ax = self.axes
+            self.figure.set_size_inches(PLOT_WIDTH, height)
+            ideal = self._set_ideal(algo_name, params)
+            artist, points = self._set_pixels(pixels)
+            if points is not None:
+                px, py = points
+            else:
+                # Без пикселей пределы - по эталонной фигуре
+                ax.relim(visible_only=True)
+                (x0, y0), (x1, y1) = ax.dataLim.get_points()
+                px, py = (x0, x1), (y0, y1)
+            padding = 5
+            ax.set_xlim(min(px) - padding, max(px) + padding)
+            ax.set_ylim(min(py) - padding, max(py) + padding)
+            ax.legend(handles=[ideal] + ([artist] if artist is not None else []), loc="upper right")
+            ax.set_title(f"Результат работы алгоритма: {algo_name}")
+
+            buf = io.BytesIO()
+            self.figure.savefig(buf, format='png', dpi=PLOT_DPI)
+            return buf.getvalue()
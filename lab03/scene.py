@@ -0,0 +1,178 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from framebuffer import framebuffer_algorithms
+
+# Многопроцессная отрисовка больших сцен по плиткам.
+#
+# Сцена - список примитивов (name, params) или (name, params, value), где
+# name - название из реестра algorithms, а params - его параметры. Холст
+# делится на плитки tile x tile, каждый примитив попадает в корзины тех
+# плиток, которые задевает его ограничивающий прямоугольник. Плитки
+# раздаются процессам ProcessPoolExecutor; холст лежит в общей памяти
+# (multiprocessing.shared_memory), и каждый процесс рисует прямо в свою
+# плитку этого холста функциями из framebuffer_algorithms с origin плитки.
+#
+# Плитки не пересекаются, поэтому отдельной сборки результата не нужно:
+# плитка и есть свой кусок итогового холста. Внутри плитки примитивы
+# рисуются в порядке сцены, а каждая функция отсекает примитив по плитке
+# пиксель-в-пиксель, так что результат не зависит ни от числа процессов,
+# ни от размера плиток и совпадает с последовательной отрисовкой всего
+# холста (в том числе для смешивания в алгоритме Ву).
+
+TILE_SIZE = 256
+
+# Плиток в одном задании: меньше - ровнее нагрузка, больше - меньше накладных расходов
+TILES_PER_TASK = 4
+
+
+def primitive_bounds(name, params):
+    # Ограничивающий прямоугольник (xmin, ymin, xmax, ymax) примитива
+    if 'окружность' in name:
+        xc, yc, r = params
+        return xc - r, yc - r, xc + r, yc + r
+    if 'Эллипс' in name:
+        xc, yc, rx, ry = params
+        return xc - rx, yc - ry, xc + rx, yc + ry
+    if 'Многоугольник' in name:
+        (vertices,) = params
+        v = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        return (math.floor(v[:, 0].min()), math.floor(v[:, 1].min()),
+                math.ceil(v[:, 0].max()), math.ceil(v[:, 1].max()))
+    # Отрезки; алгоритмы Ву рисуют и соседний пиксель, отсюда запас
+    x1, y1, x2, y2 = params
+    return (math.floor(min(x1, x2)) - 2, math.floor(min(y1, y2)) - 2,
+            math.ceil(max(x1, x2)) + 2, math.ceil(max(y1, y2)) + 2)
+
+
+def bin_primitives(scene, width, height, tile=TILE_SIZE):
+    # Корзины плиток: {(tx, ty): номера примитивов по возрастанию}
+    if not scene:
+        return {}
+    bounds = np.array([primitive_bounds(item[0], item[1]) for item in scene], dtype=np.int64)
+    tiles_x, tiles_y = -(-width // tile), -(-height // tile)
+    tx0 = np.clip(bounds[:, 0] // tile, 0, tiles_x)
+    ty0 = np.clip(bounds[:, 1] // tile, 0, tiles_y)
+    tx1 = np.clip(bounds[:, 2] // tile + 1, 0, tiles_x)
+    ty1 = np.clip(bounds[:, 3] // tile + 1, 0, tiles_y)
+    nx = np.maximum(tx1 - tx0, 0)
+    ny = np.maximum(ty1 - ty0, 0)
+
+    # Пары (плитка, примитив) для всех плиток прямоугольников, затем
+    # устойчивая сортировка по плитке сохраняет порядок сцены
+    counts = nx * ny
+    primitive = np.repeat(np.arange(len(scene)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    nx_rep = np.repeat(nx, counts)
+    tile_id = (np.repeat(ty0, counts) + k // np.maximum(nx_rep, 1)) * tiles_x + np.repeat(tx0, counts) + k % np.maximum(nx_rep, 1)
+    order = np.argsort(tile_id, kind='stable')
+    tile_id, primitive = tile_id[order], primitive[order]
+
+    ids, starts = np.unique(tile_id, return_index=True)
+    groups = np.split(primitive, starts[1:])
+    return {(int(t % tiles_x), int(t // tiles_x)): group for t, group in zip(ids, groups)}
+
+
+def _draw_tile(canvas, scene, tile_rect, indices):
+    x0, y0, x1, y1 = tile_rect
+    view = canvas[y0:y1, x0:x1]
+    for i in indices:
+        name, params, *value = scene[i]
+        framebuffer_algorithms[name](view, *params, value=value[0] if value else None, origin=(x0, y0))
+
+
+# Состояние процесса-исполнителя, задаётся один раз в _init_worker
+_worker = {}
+
+
+def _init_worker(shm_name, shape, dtype, scene):
+    # Исполнители разделяют resource_tracker основного процесса, поэтому
+    # сегмент удаляется один раз - владельцем в render_scene
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm
+    _worker['canvas'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker['scene'] = scene
+
+
+def _render_tiles(jobs):
+    for tile_rect, indices in jobs:
+        _draw_tile(_worker['canvas'], _worker['scene'], tile_rect, indices)
+    return len(jobs)
+
+
+def render_scene(scene, width, height, channels=None, dtype=np.uint8, background=0,
+                 tile=TILE_SIZE, workers=None):
+    # Отрисовка сцены в новый холст (height, width) или (height, width, channels).
+    # workers=0 - без процессов, в текущем; None - по числу ядер
+    shape = (height, width) if channels is None else (height, width, channels)
+    bins = bin_primitives(scene, width, height, tile)
+    jobs = [
+        ((tx * tile, ty * tile, min((tx + 1) * tile, width), min((ty + 1) * tile, height)), indices)
+        for (tx, ty), indices in sorted(bins.items())
+    ]
+
+    if workers == 0:
+        canvas = np.full(shape, background, dtype=dtype)
+        for tile_rect, indices in jobs:
+            _draw_tile(canvas, scene, tile_rect, indices)
+        return canvas
+
+    workers = workers or os.cpu_count() or 1
+    nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        canvas = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        canvas[...] = background
+        tasks = [jobs[i:i + TILES_PER_TASK] for i in range(0, len(jobs), TILES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, shape, np.dtype(dtype).str, scene)) as pool:
+            # list() пробрасывает исключения из исполнителей
+            list(pool.map(_render_tiles, tasks))
+        result = canvas.copy()
+        del canvas
+    finally:
+        shm.close()
+        shm.unlink()
+    return result
+
+
+def random_scene(count, width, height, names=None, seed=0):
+    # Случайная сцена для проверки и замеров: отрезки, окружности, эллипсы
+    # и многоугольники из реестра в соотношении по порядку названий
+    rng = np.random.default_rng(seed)
+    names = list(framebuffer_algorithms) if names is None else list(names)
+    scene = []
+    for i in range(count):
+        name = names[i % len(names)]
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        if 'окружность' in name:
+            params = (x, y, int(rng.integers(1, 40)))
+        elif 'Эллипс' in name:
+            params = (x, y, int(rng.integers(1, 40)), int(rng.integers(1, 40)))
+        elif 'Многоугольник' in name:
+            params = ([(x + int(dx), y + int(dy)) for dx, dy in rng.integers(-40, 40, size=(5, 2))],)
+        else:
+            params = (x, y, x + int(rng.integers(-200, 200)), y + int(rng.integers(-200, 200)))
+        scene.append((name, params, int(rng.integers(64, 256))))
+    return scene
+
+
+if __name__ == "__main__":
+    import time
+
+    width, height = 2048, 2048
+    scene = random_scene(50_000, width, height)
+
+    start_time = time.perf_counter()
+    reference = render_scene(scene, width, height, workers=0)
+    print(f"В одном процессе: {time.perf_counter() - start_time:.2f} с")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        start_time = time.perf_counter()
+        canvas = render_scene(scene, width, height, workers=workers)
+        elapsed = time.perf_counter() - start_time
+        print(f"Процессов: {workers}: {elapsed:.2f} с, совпадение: {np.array_equal(canvas, reference)}")
@@ -0,0 +1,136 @@
+import numpy as np
+
+from batch import _as_segments, _offsets, _pixel_index, castle_pitteway_batch, line_axes
+
+# Алгоритм Кастла-Питвея в виде отрезков-серий (spans).
+#
+# Строка ходов состоит из серий 's' (шаг только по главной оси), разделённых
+# ходами 'd'. Каждая серия - это горизонтальный (главная ось x) или
+# вертикальный (главная ось y) отрезок пикселей, поэтому линию можно отдать
+# как набор серий (x, y, length) вместо length пикселей: серия начинается
+# в (x, y) и идёт на length пикселей в сторону возрастания x или y.
+# Для пологих отрезков это сокращает объём данных в длину серии раз.
+#
+# Смещение по второй оси на i-м шаге - floor((i + 1) * b / a) (см.
+# castle_pitteway_minor), поэтому t-я серия начинается с шага
+# ceil(t * a / b) - 1 и строится сразу, без строки ходов и без пикселей.
+
+# Серии короче этого в среднем заливаются поточечно, длинные - срезами
+MIN_SLICE_SPAN = 8
+
+
+def _span_start(a, b, t):
+    # Первый шаг t-й серии; для диагонали каждая серия - один пиксель
+    start = np.maximum((t * a + b - 1) // np.maximum(b, 1) - 1, 0)
+    return np.where(a == b, t, start)
+
+
+def castle_pitteway_spans(segments):
+    # Серии отрезков (N, 4): xs, ys, lengths, horizontal и offsets длины N + 1;
+    # серии i-го отрезка - xs[offsets[i]:offsets[i + 1]], по порядку хода
+    x1, y1, x2, y2 = _as_segments(segments)
+    a, b, sx, sy, x_major = line_axes(x1, y1, x2, y2)
+    counts = np.where(a == b, a, b) + 1
+    offsets = _offsets(counts)
+    t = _pixel_index(offsets)
+    params = (np.repeat(v, counts) for v in (x1, y1, a, b, sx, sy, x_major))
+    return (*castle_pitteway_span_rows(*params, t), offsets)
+
+
+def span_bounds(a, b, t):
+    # Шаги главной оси [start, stop) в t-й серии
+    start = _span_start(a, b, t)
+    stop = np.where(t == b, a + 1, _span_start(a, b, t + 1))
+    return start, stop
+
+
+def castle_pitteway_span_rows(x1, y1, a, b, sx, sy, x_major, t):
+    # Серии с номерами t; параметры отрезка заданы для каждой серии
+    start, stop = span_bounds(a, b, t)
+    lengths = stop - start
+
+    # Начало серии - её пиксель с наименьшей координатой по главной оси
+    major_sign = np.where(x_major, sx, sy)
+    first = np.where(major_sign > 0, start, stop - 1)
+    xs = x1 + sx * np.where(x_major, first, t)
+    ys = y1 + sy * np.where(x_major, t, first)
+    return xs, ys, lengths, x_major
+
+
+def expand_spans(xs, ys, lengths, horizontal):
+    # Развёртка серий в пиксели (по возрастанию координаты внутри серии)
+    k = _pixel_index(_offsets(lengths))
+    horizontal = np.repeat(horizontal, lengths)
+    xs = np.repeat(xs, lengths) + np.where(horizontal, k, 0)
+    ys = np.repeat(ys, lengths) + np.where(horizontal, 0, k)
+    return xs, ys
+
+
+def fill_spans(fb, xs, ys, lengths, horizontal, value=None):
+    # Заливка серий в буфер fb[y, x] с отсечением по его границам
+    h, w = fb.shape[:2]
+    if value is None:
+        value = np.iinfo(fb.dtype).max if np.issubdtype(fb.dtype, np.integer) else 1.0
+
+    # Отсечение: серия обрезается по главной оси и выбрасывается, если
+    # вторая координата вне буфера
+    major = np.where(horizontal, xs, ys)
+    minor = np.where(horizontal, ys, xs)
+    limit = np.where(horizontal, w, h)
+    begin = np.maximum(major, 0)
+    end = np.minimum(major + lengths, limit)
+    keep = (end > begin) & (minor >= 0) & (minor < np.where(horizontal, h, w))
+    begin, end, minor, horizontal = begin[keep], end[keep], minor[keep], horizontal[keep]
+    lengths = end - begin
+    if len(lengths) == 0:
+        return fb
+
+    if lengths.mean() < MIN_SLICE_SPAN:
+        xs = np.where(horizontal, begin, minor)
+        ys = np.where(horizontal, minor, begin)
+        xs, ys = expand_spans(xs, ys, lengths, horizontal)
+        fb[ys, xs] = value
+        return fb
+
+    for s, e, m, hor in zip(begin.tolist(), end.tolist(), minor.tolist(), horizontal.tolist()):
+        if hor:
+            fb[m, s:e] = value
+        else:
+            fb[s:e, m] = value
+    return fb
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    check = rng.integers(-50, 50, size=(20000, 4))
+    xs, ys, lengths, horizontal, _ = castle_pitteway_spans(check)
+    ex, ey = expand_spans(xs, ys, lengths, horizontal)
+    px, py, _ = castle_pitteway_batch(check)
+    same = np.array_equal(np.sort(ey * 1000 + ex), np.sort(py * 1000 + px))
+    print(f"Совпадение с castle_pitteway_batch: {same}")
+
+    # Длинные пологие отрезки в буфер: серии против поточечной записи
+    h, w = 512, 4096
+    segments = np.column_stack([
+        np.zeros(2000, dtype=np.int64), rng.integers(0, h, 2000),
+        np.full(2000, w - 1), rng.integers(0, h, 2000),
+    ])
+    segments[:, 3] = np.clip(segments[:, 1] + rng.integers(-40, 40, 2000), 0, h - 1)
+    fb_pixels = np.zeros((h, w), dtype=np.uint8)
+    fb_spans = np.zeros((h, w), dtype=np.uint8)
+
+    start_time = time.perf_counter()
+    px, py, _ = castle_pitteway_batch(segments)
+    fb_pixels[py, px] = 255
+    pixel_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    xs, ys, lengths, horizontal, _ = castle_pitteway_spans(segments)
+    fill_spans(fb_spans, xs, ys, lengths, horizontal)
+    span_time = time.perf_counter() - start_time
+
+    print(f"Пикселей: {len(px)}, серий: {len(xs)}")
+    print(f"Поточечно: {pixel_time * 1000:.1f} мс, сериями: {span_time * 1000:.1f} мс, "
+          f"совпадение: {np.array_equal(fb_pixels, fb_spans)}")
@@ -0,0 +1,115 @@
+import numpy as np
+
+from batch import (
+    bresenham_minor,
+    castle_pitteway_minor,
+    circle_octant_y,
+    circle_reflections,
+    dda_params,
+    line_axes,
+    major_minor_to_xy,
+    step_by_step_params,
+    step_by_step_pixels,
+    wu_params,
+    wu_pixels,
+)
+
+# Потоковые версии алгоритмов для очень больших примитивов.
+#
+# Каждая функция - генератор, который отдаёт пиксели кусками-массивами
+# (xs, ys), для алгоритма Ву - (xs, ys, intensities), не длиннее chunk_size
+# (кусок окружности содержит хотя бы одну точку октанта, то есть до восьми
+# пикселей, даже при меньшем chunk_size).
+# Память не зависит от длины отрезка или радиуса окружности: между кусками
+# хранится только состояние алгоритма. Пиксели и их порядок совпадают с
+# пакетными версиями из batch.py.
+
+CHUNK_SIZE = 1 << 16
+
+
+def _ranges(start, stop, step):
+    for begin in range(start, stop, step):
+        yield np.arange(begin, min(begin + step, stop), dtype=np.int64)
+
+
+def iter_step_by_step_line(x1, y1, x2, y2, chunk_size=CHUNK_SIZE):
+    x_major, major_base, minor_base, slope, count = step_by_step_params(x1, y1, x2, y2)
+    for i in _ranges(0, int(count), chunk_size):
+        yield step_by_step_pixels(x_major, major_base, minor_base, slope, i)
+
+
+def iter_dda_line(x1, y1, x2, y2, chunk_size=CHUNK_SIZE):
+    steps, x_inc, y_inc = dda_params(x1, y1, x2, y2)
+
+    # Между кусками переносятся текущие x, y, чтобы сложения шли в том же
+    # порядке, что и в скалярном цикле
+    x, y = float(x1), float(y1)
+    for i in _ranges(0, int(steps) + 1, chunk_size):
+        xs = np.full(len(i), x_inc)
+        ys = np.full(len(i), y_inc)
+        xs[0], ys[0] = x, y
+        xs = np.add.accumulate(xs)
+        ys = np.add.accumulate(ys)
+        x, y = xs[-1] + x_inc, ys[-1] + y_inc
+        yield np.rint(xs).astype(np.int64), np.rint(ys).astype(np.int64)
+
+
+def _iter_line(x1, y1, x2, y2, minor, chunk_size):
+    a, b, sx, sy, x_major = line_axes(x1, y1, x2, y2)
+    for i in _ranges(0, int(a) + 1, chunk_size):
+        yield major_minor_to_xy(x1, y1, sx, sy, x_major, i, minor(a, b, i))
+
+
+def iter_bresenham_line(x0, y0, x1, y1, chunk_size=CHUNK_SIZE):
+    return _iter_line(x0, y0, x1, y1, bresenham_minor, chunk_size)
+
+
+def iter_castle_pitteway(x1, y1, x2, y2, chunk_size=CHUNK_SIZE):
+    return _iter_line(x1, y1, x2, y2, castle_pitteway_minor, chunk_size)
+
+
+def iter_bresenham_circle(xc, yc, r, chunk_size=CHUNK_SIZE):
+    # Октант обходится кусками по x; каждая его точка даёт не больше
+    # восьми пикселей, а дубликаты отражений отбрасываются по маске
+    step = max(chunk_size // 8, 1)
+    start = 0
+    while True:
+        x = np.arange(start, start + step, dtype=np.int64)
+        y = circle_octant_y(r, x)
+        inside = x <= y
+        if inside.any():
+            dx, dy, keep = circle_reflections(x[inside], y[inside])
+            yield (dx + xc)[keep], (dy + yc)[keep]
+        if not inside.all():
+            return
+        start += step
+
+
+def iter_wu_antialiasing_line(x1, y1, x2, y2, chunk_size=CHUNK_SIZE):
+    steep, x1, y1, x2, y2, gradient = wu_params(x1, y1, x2, y2)
+
+    ends_x = np.array([int(x1), int(x2)], dtype=np.int64)
+    ends_y = np.array([int(y1), int(y2)], dtype=np.int64)
+    if steep:
+        ends_x, ends_y = ends_y, ends_x
+    yield ends_x, ends_y, np.array([1.0, 1.0])
+
+    y = y1 + gradient
+    for x in _ranges(int(x1) + 1, int(x2), max(chunk_size // 2, 1)):
+        ys = np.full(len(x), gradient)
+        ys[0] = y
+        ys = np.add.accumulate(ys)
+        y = ys[-1] + gradient
+        yield wu_pixels(steep, x, ys)
+
+
+# Потоковые версии алгоритмов из реестра algorithms:
+# func(*params, chunk_size=CHUNK_SIZE)
+streaming_algorithms = {
+    'Пошаговый': iter_step_by_step_line,
+    'ЦДА (DDA)': iter_dda_line,
+    'Брезенхем (линия)': iter_bresenham_line,
+    'Брезенхем (окружность)': iter_bresenham_circle,
+    'Кастл-Питвей': iter_castle_pitteway,
+    'Алгоритм Ву': iter_wu_antialiasing_line,
+}
@@ -0,0 +1,51 @@
+import sys
+
+# Трассировка алгоритмов растеризации.
+#
+# Все функции из algorithms.py принимают необязательный аргумент tracer.
+# Это любой объект с тремя методами:
+#   step(**state)                 - очередная итерация основного цикла
+#                                   (текущие координаты, параметр ошибки и т.п.);
+#   error_update(value)           - изменение параметра ошибки/решения;
+#   pixel(x, y, intensity=None)   - пиксель попал в результат.
+# По умолчанию tracer=None, и алгоритм ничего не вызывает и не печатает.
+
+
+class TraceCounters:
+    # Считает события, не сохраняя их
+
+    def __init__(self):
+        self.steps = 0
+        self.error_updates = 0
+        self.pixels = 0
+
+    def step(self, **state):
+        self.steps += 1
+
+    def error_update(self, value):
+        self.error_updates += 1
+
+    def pixel(self, x, y, intensity=None):
+        self.pixels += 1
+
+    def as_dict(self):
+        return {'steps': self.steps, 'error_updates': self.error_updates, 'pixels': self.pixels}
+
+
+class PrintTracer:
+    # Построчный отладочный вывод, заменяющий прежние print внутри алгоритмов
+
+    def __init__(self, file=None):
+        self.file = file if file is not None else sys.stdout
+
+    def step(self, **state):
+        print("step", *(f"{k}={v}" for k, v in state.items()), file=self.file)
+
+    def error_update(self, value):
+        print("error", value, file=self.file)
+
+    def pixel(self, x, y, intensity=None):
+        if intensity is None:
+            print("pixel", x, y, file=self.file)
+        else:
+            print("pixel", x, y, intensity, file=self.file)
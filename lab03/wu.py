@@ -0,0 +1,176 @@
+import numpy as np
+
+# Алгоритм Ву в целочисленной арифметике с фиксированной точкой 16.16.
+#
+# На вход подаётся массив (N, 4) концов отрезков (x1, y1, x2, y2); концы
+# могут быть дробными. Все вычисления после перевода концов в фиксированную
+# точку целочисленные: градиент считается один раз на отрезок, а y на k-м
+# шаге - это yend + gradient * (k + 1), без накопления ошибки.
+#
+# Дробные концы обрабатываются так же, как в классической версии алгоритма:
+# концевой столбец получает покрытие, пропорциональное доле пикселя, которую
+# отрезок проходит по главной оси (при целых концах - половину).
+#
+# Результат - покрытие 0..255 для каждого пикселя, которое пишется либо в
+# заранее выделенный структурированный массив (WU_PIXEL), либо сразу
+# накапливается в кадровом буфере.
+
+FRAC_BITS = 16
+ONE = 1 << FRAC_BITS
+HALF = ONE >> 1
+FRAC_MASK = ONE - 1
+
+WU_PIXEL = np.dtype([('x', np.int32), ('y', np.int32), ('coverage', np.uint8)])
+
+
+def _to_fixed(v):
+    return np.rint(np.asarray(v, dtype=np.float64) * ONE).astype(np.int64)
+
+
+def _prepare(segments):
+    seg = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = (_to_fixed(seg[:, k]) for k in range(4))
+
+    # Крутые отрезки обрабатываются с переставленными осями
+    steep = np.abs(y2 - y1) > np.abs(x2 - x1)
+    x1, y1 = np.where(steep, y1, x1), np.where(steep, x1, y1)
+    x2, y2 = np.where(steep, y2, x2), np.where(steep, x2, y2)
+
+    # Рисуем всегда слева направо
+    swap = x1 > x2
+    x1, x2 = np.where(swap, x2, x1), np.where(swap, x1, x2)
+    y1, y2 = np.where(swap, y2, y1), np.where(swap, y1, y2)
+
+    # Градиент в формате 16.16, округлённый к ближайшему; считается один раз
+    dx = x2 - x1
+    dy = y2 - y1
+    gradient = np.where(dx != 0, (2 * dy * ONE + dx) // np.maximum(2 * dx, 1), ONE)
+
+    # Концевые столбцы: xend = round(x), y в центре этого столбца и доля
+    # пикселя по главной оси, которую покрывает отрезок
+    xend1 = (x1 + HALF) >> FRAC_BITS
+    xend2 = (x2 + HALF) >> FRAC_BITS
+    yend1 = y1 + ((gradient * ((xend1 << FRAC_BITS) - x1)) >> FRAC_BITS)
+    yend2 = y2 + ((gradient * ((xend2 << FRAC_BITS) - x2)) >> FRAC_BITS)
+    xgap1 = ONE - ((x1 + HALF) & FRAC_MASK)
+    xgap2 = (x2 + HALF) & FRAC_MASK
+
+    interior = np.maximum(xend2 - xend1 - 1, 0)
+    return steep, gradient, xend1, xend2, yend1, yend2, xgap1, xgap2, interior
+
+
+def _coverage8(value):
+    # Покрытие 0..ONE в 0..255
+    return ((value * 255 + HALF) >> FRAC_BITS).astype(np.uint8)
+
+
+def wu_pixel_counts(segments):
+    # Число пикселей каждого отрезка и смещения - чтобы заранее выделить out
+    *_, interior = _prepare(segments)
+    counts = 2 * interior + 4
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return counts, offsets
+
+
+def wu_lines_fixed(segments, out=None):
+    # Пиксели i-го отрезка - out[offsets[i]:offsets[i + 1]]: сначала две
+    # пары концевых пикселей, затем пары по одной на каждый внутренний столбец
+    steep, gradient, xend1, xend2, yend1, yend2, xgap1, xgap2, interior = _prepare(segments)
+    counts = 2 * interior + 4
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    if out is None:
+        out = np.empty(offsets[-1], dtype=WU_PIXEL)
+    elif len(out) < offsets[-1]:
+        raise ValueError(f"out содержит {len(out)} элементов, нужно {offsets[-1]}")
+
+    # Внутренние столбцы считаются сразу для всех позиций out по порядку:
+    # позиция l внутри отрезка - это столбец k = (l - 4) // 2 и пиксель
+    # ipart(y) или ipart(y) + 1 по чётности l.
+    # Первые четыре позиции каждого отрезка затем перезаписываются концами.
+    total = offsets[-1]
+    l = np.arange(total, dtype=np.int64) - np.repeat(offsets[:-1], counts)
+    x, y, coverage = interior_pixels(
+        np.repeat(gradient, counts), np.repeat(xend1, counts), np.repeat(yend1, counts), (l - 4) >> 1, l & 1)
+    _write(out[:total], slice(None), x, y, coverage, np.repeat(steep, counts))
+
+    main, cross, coverage = endpoint_pixels(gradient, xend1, xend2, yend1, yend2, xgap1, xgap2)
+    end_pos = offsets[:-1, None] + np.arange(4)
+    _write(out, end_pos.ravel(), main.ravel(), cross.ravel(), coverage.ravel(), steep.repeat(4))
+    return out, offsets
+
+
+def interior_pixels(gradient, xend1, yend1, k, lower):
+    # Пиксель ipart(y) (lower = 0) или ipart(y) + 1 (lower = 1) внутреннего
+    # столбца k, где y = yend1 + gradient * (k + 1), в осях (главная, вторая)
+    intery = yend1 + gradient * (k + 1)
+    frac = intery & FRAC_MASK
+    return xend1 + 1 + k, (intery >> FRAC_BITS) + lower, _coverage8(np.where(lower, frac, ONE - frac))
+
+
+def endpoint_pixels(gradient, xend1, xend2, yend1, yend2, xgap1, xgap2):
+    # Концы: по два пикселя в столбцах xend1 и xend2, массивы (N, 4)
+    main = np.stack([xend1, xend1, xend2, xend2], axis=1)
+    ipart = np.stack([yend1, yend2], axis=1) >> FRAC_BITS
+    cross = np.stack([ipart[:, 0], ipart[:, 0] + 1, ipart[:, 1], ipart[:, 1] + 1], axis=1)
+    fpart = np.stack([yend1, yend2], axis=1) & FRAC_MASK
+    xgap = np.stack([xgap1, xgap2], axis=1)
+    cover = np.stack([
+        (ONE - fpart[:, 0]) * xgap[:, 0], fpart[:, 0] * xgap[:, 0],
+        (ONE - fpart[:, 1]) * xgap[:, 1], fpart[:, 1] * xgap[:, 1],
+    ], axis=1) >> FRAC_BITS
+    return main, cross, _coverage8(cover)
+
+
+def _write(out, pos, main, cross, coverage, steep):
+    out['x'][pos] = np.where(steep, cross, main)
+    out['y'][pos] = np.where(steep, main, cross)
+    out['coverage'][pos] = coverage
+
+
+def accumulate_wu_coverage(fb, segments, value=None):
+    # Добавляет value * coverage / 255 в буфер fb (H, W) с насыщением.
+    # Покрытия пересекающихся отрезков складываются, поэтому стыки ломаных
+    # (две половины концевого покрытия) получаются без провала.
+    pixels, _ = wu_lines_fixed(segments)
+    return accumulate_coverage(fb, pixels['x'], pixels['y'], pixels['coverage'], value)
+
+
+def accumulate_coverage(fb, xs, ys, coverage, value=None):
+    # То же для уже посчитанных пикселей (x, y, coverage)
+    h, w = fb.shape[:2]
+    x = xs.astype(np.int64)
+    y = ys.astype(np.int64)
+    inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+
+    index, inverse = np.unique(y[inside] * w + x[inside], return_inverse=True)
+    total = np.zeros(len(index), dtype=np.int64)
+    np.add.at(total, inverse, coverage[inside])
+    ys, xs = np.divmod(index, w)
+    if fb.ndim == 3:
+        total = total[:, None]
+
+    if np.issubdtype(fb.dtype, np.integer):
+        top = np.iinfo(fb.dtype).max
+        value = np.asarray(top if value is None else value, dtype=np.int64)
+        fb[ys, xs] = np.minimum(fb[ys, xs] + (total * value + 127) // 255, top)
+    else:
+        value = np.asarray(1.0 if value is None else value, dtype=fb.dtype)
+        fb[ys, xs] = np.minimum(fb[ys, xs] + total * (value / 255), 1.0)
+    return fb
+
+
+def wu_fixed_point_line(x1, y1, x2, y2, tracer=None):
+    # Та же сигнатура и формат результата, что у wu_antialiasing_line.
+    # Ошибка здесь не накапливается, поэтому трассировщику передаются только
+    # столбцы (по одному шагу на пару пикселей) и сами пиксели.
+    pixels, _ = wu_lines_fixed((x1, y1, x2, y2))
+    result = [(x, y, c / 255) for x, y, c in pixels.tolist()]
+    if tracer is not None:
+        for k, (x, y, intensity) in enumerate(result):
+            if k % 2 == 0:
+                tracer.step(x=x, y=y)
+            tracer.pixel(x, y, intensity)
+    return result